@@ -1,22 +1,33 @@
+import asyncio
+import html
 import logging
+import time
+from datetime import timedelta
 from telegram import Update
 from config import BOT_ADMIN_ID, IMPORTANT_LOG_PATH
-from shared import last_posted_link
+from link_history import link_history
+from vote_store import vote_store
+from log_setup import tail_lines, stop_logging
+from profiling import profile_loop, format_recent_traces, loop_watchdog
+from link_checker import link_checker
+import registry
 
 logger = logging.getLogger(__name__)
 
-def log_important(event: str):
-    with open(IMPORTANT_LOG_PATH, "a") as f:
-        f.write(event + "\n")
-
 async def lastlink(update: Update, context):
     message = update.message
     if not message or not hasattr(message, 'reply_text'):
         return
     user = update.effective_user
     if user and user.id == BOT_ADMIN_ID:
-        if last_posted_link:
-            await message.reply_text(f"Last posted link: {last_posted_link}")
+        now = time.time()
+        lines = []
+        for channel in registry.channels:
+            for post in link_history.recent(channel.chat_id, 3):
+                msg = f"#{post.message_id}" if post.message_id is not None else "other replica"
+                lines.append(f"{channel.chat_id}  {timedelta(seconds=int(now - post.posted_at))} ago  {msg}  {post.link}")
+        if lines:
+            await _reply_pre(message, "\n".join(lines))
         else:
             await message.reply_text("No link has been posted yet.")
     else:
@@ -29,9 +40,8 @@ async def logs(update: Update, context):
     user = update.effective_user
     if user and user.id == BOT_ADMIN_ID:
         try:
-            with open(IMPORTANT_LOG_PATH, "r") as f:
-                lines = f.readlines()[-20:]
-            await message.reply_text("Recent important logs:\n" + "".join(lines))
+            lines = await asyncio.to_thread(tail_lines, IMPORTANT_LOG_PATH, 20)
+            await message.reply_text("Recent important logs:\n" + "\n".join(lines))
         except Exception as e:
             await message.reply_text(f"Error reading logs: {e}")
     else:
@@ -47,6 +57,75 @@ async def health(update: Update, context):
     else:
         await message.reply_text("🚫 Unauthorized.")
 
+def _int_arg(context, default, low, high):
+    try:
+        value = int(context.args[0]) if context.args else default
+    except ValueError:
+        value = default
+    return min(max(value, low), high)
+
+async def _reply_pre(message, text):
+    # Telegram caps messages at 4096 chars; keep the newest part of long reports
+    await message.reply_text(f"<pre>{html.escape(text[-3900:])}</pre>", parse_mode="HTML")
+
+async def profile(update: Update, context):
+    message = update.message
+    if not message or not hasattr(message, 'reply_text'):
+        return
+    user = update.effective_user
+    if user and user.id == BOT_ADMIN_ID:
+        seconds = _int_arg(context, 10, 1, 120)
+        await message.reply_text(f"Profiling the event loop for {seconds}s...")
+        await _reply_pre(message, await profile_loop(seconds))
+    else:
+        await message.reply_text("🚫 Unauthorized.")
+
+async def timings(update: Update, context):
+    message = update.message
+    if not message or not hasattr(message, 'reply_text'):
+        return
+    user = update.effective_user
+    if user and user.id == BOT_ADMIN_ID:
+        await _reply_pre(message, format_recent_traces(_int_arg(context, 5, 1, 20)))
+    else:
+        await message.reply_text("🚫 Unauthorized.")
+
+async def looplag(update: Update, context):
+    message = update.message
+    if not message or not hasattr(message, 'reply_text'):
+        return
+    user = update.effective_user
+    if user and user.id == BOT_ADMIN_ID:
+        await _reply_pre(message, loop_watchdog.report())
+    else:
+        await message.reply_text("🚫 Unauthorized.")
+
+async def linkstatus(update: Update, context):
+    message = update.message
+    if not message or not hasattr(message, 'reply_text'):
+        return
+    user = update.effective_user
+    if user and user.id == BOT_ADMIN_ID:
+        await _reply_pre(message, link_checker.report())
+    else:
+        await message.reply_text("🚫 Unauthorized.")
+
+async def checklink(update: Update, context):
+    message = update.message
+    if not message or not hasattr(message, 'reply_text'):
+        return
+    user = update.effective_user
+    if user and user.id == BOT_ADMIN_ID:
+        links = context.args[:5] if context.args else list(dict.fromkeys(
+            channel.last_posted_link for channel in registry.channels if channel.last_posted_link))
+        if not links:
+            await message.reply_text("No link has been posted yet.")
+            return
+        verdicts = await asyncio.gather(*(link_checker.recheck(link) for link in links))
+        await _reply_pre(message, "\n".join(f"{verdict.state:<7} {verdict.detail}  {link}" for link, verdict in zip(links, verdicts)))
+    else:
+        await message.reply_text("🚫 Unauthorized.")
+
 async def restart(update: Update, context):
     message = update.message
     if not message or not hasattr(message, 'reply_text'):
@@ -54,6 +133,9 @@ async def restart(update: Update, context):
     user = update.effective_user
     if user and user.id == BOT_ADMIN_ID:
         await message.reply_text("Restarting bot...")
+        # os._exit skips shutdown hooks, so write pending votes and queued log records first
+        await vote_store.flush()
+        stop_logging()
         import os
         os._exit(0)
     else:
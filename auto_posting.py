@@ -2,9 +2,17 @@ import random
 import secrets
 import asyncio
 import logging
-from scrape_links import get_latest_canva_link
-from config import CHANNEL_ID
-from shared import format_canva_post_message, vote_data, last_posted_link, EMOJI_PAIRS
+import time
+from telegram.error import RetryAfter
+from scrape_links import scrape_sources, forget_dead_link
+from config import FANOUT_PARALLELISM
+from shared import format_canva_post_message, queue_vote_edit, index_message, EMOJI_PAIRS
+from vote_store import vote_store
+from scheduler import AutoPostScheduler
+from polling_policy import make_policy
+from replicas import replicas
+from link_checker import link_checker
+import registry
 
 logger = logging.getLogger(__name__)
 
@@ -12,55 +20,126 @@ logger = logging.getLogger(__name__)
 auto_post_min = 900  # default 15 min
 auto_post_max = 1800  # default 30 min
 
+scheduler = AutoPostScheduler(auto_post_min, auto_post_max, policy=make_policy())
+
 def set_auto_post_interval(min_sec, max_sec):
     global auto_post_min, auto_post_max
     auto_post_min = min_sec
     auto_post_max = max_sec
     logger.info(f"[auto_posting_task] Interval updated: {auto_post_min}-{auto_post_max} seconds")
+    scheduler.set_interval(min_sec, max_sec)
+
+def restore_schedule():
+    # Before replicas.start(), so the initial settings sync compares against the
+    # persisted interval instead of the defaults
+    global auto_post_min, auto_post_max
+    if scheduler.load():
+        auto_post_min, auto_post_max = scheduler.min_sec, scheduler.max_sec
+
+def run_auto_post_now():
+    scheduler.run_now()
+
+def record_link_change():
+    scheduler.record_change()
+
+# --- Settings shared with other replicas ---
+# Admin commands can land on any replica; the leader running the task below
+# picks the changes up from the shared backend.
+replicas.on_setting("auto_post_interval", lambda value: set_auto_post_interval(*value))
+replicas.on_setting("run_now", lambda value: run_auto_post_now(), on_start=False)
+replicas.on_setting("dead_link", forget_dead_link, on_start=False)
+for _channel in registry.channels:
+    replicas.on_setting(_channel.setting_key, _channel.remember)
+
+# --- Dead links ---
+# The link checker found that a channel is showing an expired link: scrape
+# again now instead of waiting out the interval (on whichever replica leads),
+# past the caches that would otherwise hand back the same dead link
+async def _rescrape_now(link):
+    forget_dead_link(link)
+    run_auto_post_now()
+    await replicas.publish("dead_link", link)
+    await replicas.publish("run_now", time.time())
+
+link_checker.on_dead = _rescrape_now
+
+# --- Posting to channels ---
+async def post_link(bot, channel, link, working_votes=0, not_working_votes=0):
+    emoji_pair = secrets.choice(EMOJI_PAIRS)
+    msg, keyboard, emoji_pair = format_canva_post_message(link, working_votes=working_votes, not_working_votes=not_working_votes, emoji_pair=emoji_pair)
+    async with channel.limiter:
+        try:
+            sent_msg = await bot.send_message(chat_id=channel.chat_id, text=msg, parse_mode="HTML", reply_markup=keyboard)
+        except RetryAfter as e:
+            # Flood control for this chat only: hold its sends back, then retry once
+            logger.warning(f"[post_link] Flood control in {channel.chat_id}, retrying in {e.retry_after}s")
+            channel.limiter.pause(e.retry_after)
+            sent_msg = None
+    if sent_msg is None:
+        async with channel.limiter:
+            sent_msg = await bot.send_message(chat_id=channel.chat_id, text=msg, parse_mode="HTML", reply_markup=keyboard)
+    vote_store.create(sent_msg.chat_id, sent_msg.message_id, emoji_pair, working_votes, not_working_votes)
+    index_message(sent_msg.chat_id, sent_msg.message_id, link, emoji_pair)
+    channel.remember(link, sent_msg.message_id)
+    link_checker.watch(link)
+    await replicas.publish(channel.setting_key, link)
+    return sent_msg
+
+def schedule_bump(bot, sent_msg):
+    # Delayed bump of working votes on a fresh post
+    async def delayed_bump(chat_id, msg_id):
+        await asyncio.sleep(10)
+        bump_votes = random.randint(4, 6)
+        vote_store.set_counts(chat_id, msg_id, working=bump_votes)
+        queue_vote_edit(bot, chat_id, msg_id)
+    asyncio.create_task(delayed_bump(sent_msg.chat_id, sent_msg.message_id))
+
+async def fan_out(bot, links_by_source, limit=FANOUT_PARALLELISM):
+    # Posts to each channel the new links from the sources it subscribes to, in
+    # subscription order. Channels are posted to concurrently (at most `limit`
+    # at a time) and paced per chat, so one slow or throttled chat doesn't hold
+    # up the others. Returns [(channel, link, sent message)].
+    semaphore = asyncio.Semaphore(limit)
+    async def deliver(channel):
+        posted = []
+        async with semaphore:
+            for name in channel.sources:
+                link = links_by_source.get(name)
+                if not link or not channel.is_new(link):
+                    continue
+                if link_checker.is_dead(link):
+                    logger.info(f"[fan_out] Skipping {link} for {channel.chat_id}: the link checker found it expired")
+                    continue
+                try:
+                    sent_msg = await post_link(bot, channel, link)
+                except Exception as e:
+                    logger.error(f"[fan_out] Could not post {link} to {channel.chat_id}: {e}")
+                    continue
+                schedule_bump(bot, sent_msg)
+                posted.append((channel, link, sent_msg))
+        return posted
+    results = await asyncio.gather(*(deliver(channel) for channel in registry.channels))
+    return [item for posted in results for item in posted]
 
 async def auto_posting_task(bot):
-    global last_posted_link
-    import logging
+    restore_schedule()
     while True:
         try:
-            # Store the interval range at the start
-            start_min = auto_post_min
-            start_max = auto_post_max
-            sleep_time = random.randint(start_min, start_max)
-            logging.info(f"[auto_posting_task] Next auto-post in {sleep_time} seconds (interval range: {start_min}-{start_max}).")
-            for _ in range(sleep_time):
-                await asyncio.sleep(1)
-                # If interval changed, break and restart sleep with new interval
-                if (auto_post_min, auto_post_max) != (start_min, start_max):
-                    logging.info("[auto_posting_task] Interval changed during sleep, recalculating...")
-                    break
+            logger.info(f"[auto_posting_task] Next auto-post at {scheduler.describe()} (interval range: {auto_post_min}-{auto_post_max}).")
+            reason = await scheduler.wait_until_due()
+            # Schedule the following run first so a failing scrape keeps the cadence
+            scheduler.schedule_next()
+            logger.info(f"[auto_posting_task] Woke up ({reason}). Checking for new link...")
+            links = await scrape_sources()
+            if not any(links.values()):
+                logger.warning("[auto_posting_task] No link could be scraped from any source. Will retry after interval.")
+                continue
+            posted = await fan_out(bot, links)
+            if posted:
+                scheduler.record_change()
+                for channel, link, _ in posted:
+                    logger.info(f"[auto_posting_task] Posted new link to {channel.chat_id}: {link}")
             else:
-                logging.info(f"[auto_posting_task] Woke up after {sleep_time} seconds. Checking for new link...")
-                latest = await get_latest_canva_link()
-                if latest is None:
-                    logger.warning("[auto_posting_task] No link could be scraped (get_latest_canva_link returned None). Will retry after interval.")
-                    continue
-                if latest and latest != last_posted_link:
-                    working_votes = 0
-                    not_working_votes = 0
-                    emoji_pair = secrets.choice(EMOJI_PAIRS)
-                    msg, keyboard, emoji_pair = format_canva_post_message(latest, working_votes=working_votes, not_working_votes=not_working_votes, emoji_pair=emoji_pair)
-                    sent_msg = await bot.send_message(chat_id=CHANNEL_ID, text=msg, parse_mode="HTML", reply_markup=keyboard)
-                    vote_data[sent_msg.message_id] = {'working': working_votes, 'not_working': not_working_votes, 'voters': set(), 'emoji_pair': emoji_pair}
-                    last_posted_link = latest
-                    logger.info(f"[auto_posting_task] Posted new link: {latest}")
-                    # Delayed bump for auto-posts too
-                    async def delayed_bump(msg_id, link, emoji_pair):
-                        await asyncio.sleep(10)
-                        bump_votes = random.randint(4, 6)
-                        vote_data[msg_id]['working'] = bump_votes
-                        msg, keyboard, _ = format_canva_post_message(link, working_votes=bump_votes, not_working_votes=0, emoji_pair=emoji_pair)
-                        try:
-                            await bot.edit_message_reply_markup(chat_id=CHANNEL_ID, message_id=msg_id, reply_markup=keyboard)
-                        except Exception:
-                            pass
-                    asyncio.create_task(delayed_bump(sent_msg.message_id, latest, emoji_pair))
-                else:
-                    logger.info(f"[auto_posting_task] No new link found or already posted.")
+                logger.info(f"[auto_posting_task] No new link found or already posted.")
         except Exception as e:
             logger.error(f"[auto_posting_task] Error: {e}")
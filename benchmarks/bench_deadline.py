@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+# Retry policy and scrape deadline against the local stand-ins (standins.py),
+# fully offline. For each scraping mode and failure scenario it runs full
+# two-stage scrapes with scrape_sources(deadline=...) and reports how many
+# found the link, how long they took (never longer than the deadline), how
+# many requests the stand-ins saw and how many retries the policy made.
+#
+#   healthy  - fast and always up
+#   flaky    - every request fails with a 5xx at --flaky-rate
+#   slow     - answers later than HTTP_READ_TIMEOUT (read timeouts, retried)
+#   down     - every request fails
+#
+#   python benchmarks/bench_deadline.py
+#   python benchmarks/bench_deadline.py --deadline 5 --runs 20 --json
+import argparse
+import asyncio
+import json
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+from standins import SourceSite, FakeScrapeDo, base_env, reset_scrape_state
+
+SCRAPEDO_TOKENS = ["bench-token-a", "bench-token-b"]
+
+def scenarios(args):
+    # name: (latency, error_rate)
+    return {
+        "healthy": (args.latency, 0.0),
+        "flaky": (args.latency, args.flaky_rate),
+        "slow": (args.read_timeout * 2, 0.0),
+        "down": (args.latency, 1.0),
+    }
+
+def configure_env(site, scrapedo, state_dir, args):
+    os.environ.update(base_env(
+        state_dir, MAIN_URL=site.main_url, SCRAPEDO_API_URL=scrapedo.base_url, SCRAPEDO_TOKENS=",".join(SCRAPEDO_TOKENS),
+        SCRAPE_RESULT_TTL=0, HTTP_PREWARM_TIMEOUT=0, LINK_CHECK_INTERVAL=0,
+        HTTP_READ_TIMEOUT=args.read_timeout, SCRAPE_DEADLINE=args.deadline,
+        SCRAPE_RETRY_ATTEMPTS=args.attempts, SCRAPE_RETRY_BASE_DELAY=args.base_delay,
+        # The down scenario would open every token's circuit breaker and end the rounds early
+        TOKEN_FAILURE_THRESHOLD=1000000,
+    ))
+
+def retries_total():
+    from retry_policy import SCRAPE_RETRIES
+    return sum(SCRAPE_RETRIES.values.values())
+
+async def run_scenario(site, scrapedo, mode, latency, error_rate, args):
+    import scrape_links
+    from retry_policy import Deadline
+    site.latency, site.error_rate = latency, error_rate
+    scrapedo.latency = 0.0
+    scrape_links.set_scraping_mode(mode)
+    walls, found = [], 0
+    requests_before = sum(site.requests.values())
+    retries_before = retries_total()
+    for _ in range(args.runs):
+        site.rotate()
+        reset_scrape_state()
+        start = time.perf_counter()
+        links = await scrape_links.scrape_sources(deadline=Deadline(args.deadline))
+        walls.append(time.perf_counter() - start)
+        found += any(link == site.canva_link() for link in links.values())
+    return {
+        "found": found, "runs": args.runs,
+        "p50_s": statistics.median(walls), "max_s": max(walls),
+        "within_deadline": sum(wall <= args.deadline + args.slack for wall in walls),
+        "site_requests": sum(site.requests.values()) - requests_before,
+        "retries": retries_total() - retries_before,
+    }
+
+async def run(args):
+    state_dir = tempfile.mkdtemp(prefix="bench_deadline_")
+    site = await SourceSite().start()
+    scrapedo = await FakeScrapeDo(SCRAPEDO_TOKENS).start()
+    configure_env(site, scrapedo, state_dir, args)
+    import scrape_links
+    if not args.verbose:
+        logging.getLogger().setLevel(logging.CRITICAL)
+    await scrape_links.init_http_session()
+    results = {}
+    try:
+        for mode in args.modes:
+            for name, (latency, error_rate) in scenarios(args).items():
+                results[f"{mode}/{name}"] = await run_scenario(site, scrapedo, mode, latency, error_rate, args)
+    finally:
+        await scrape_links.close_http_session()
+        await scrapedo.stop()
+        await site.stop()
+    return {
+        "benchmark": "deadline",
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "params": {key: value for key, value in vars(args).items() if key not in ("json", "verbose")},
+        "results": results,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the scrape retry policy and deadline under failures")
+    parser.add_argument("--modes", nargs="+", default=["direct", "scrapedo"], choices=["direct", "scrapedo", "both"])
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--deadline", type=float, default=3.0, help="SCRAPE_DEADLINE for the run (s)")
+    parser.add_argument("--read-timeout", type=float, default=0.5, help="HTTP_READ_TIMEOUT for the run (s)")
+    parser.add_argument("--attempts", type=int, default=3, help="SCRAPE_RETRY_ATTEMPTS")
+    parser.add_argument("--base-delay", type=float, default=0.1, help="SCRAPE_RETRY_BASE_DELAY (s)")
+    parser.add_argument("--latency", type=float, default=0.02, help="stand-in latency when healthy (s)")
+    parser.add_argument("--flaky-rate", type=float, default=0.3)
+    parser.add_argument("--slack", type=float, default=0.1, help="allowed overshoot of the deadline (s)")
+    parser.add_argument("--json", action="store_true")
+    parser.add_argument("--verbose", action="store_true", help="keep the bot's own logging")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"deadline {args.deadline}s, read timeout {args.read_timeout}s, {args.attempts} attempts, {args.runs} runs each")
+    print(f"{'mode/scenario':<20} {'found':>7} {'p50 s':>7} {'max s':>7} {'in time':>8} {'requests':>9} {'retries':>8}")
+    for name, r in results["results"].items():
+        print(f"{name:<20} {r['found']:>3}/{r['runs']:<3} {r['p50_s']:>7.2f} {r['max_s']:>7.2f} {r['within_deadline']:>4}/{r['runs']:<3} "
+              f"{r['site_requests']:>9} {r['retries']:>8}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+# Update delivery latency, long polling vs webhook: the fake Bot API from
+# standins.py hands vote callbacks to the real Application either through
+# getUpdates or by POSTing them to bot.run_webhook's endpoint, and we time each
+# click until its answerCallbackQuery arrives. Also checks that a webhook POST
+# with a wrong secret token is rejected. Fully offline.
+#
+#   python benchmarks/bench_delivery.py
+#   python benchmarks/bench_delivery.py --updates 500 --interval 0.01 --json
+import argparse
+import asyncio
+import json
+import logging
+import os
+import socket
+import statistics
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+from aiohttp import ClientSession
+
+from standins import FakeBotAPI
+from load_votes import CHAT_ID, callback_update, configure_env, percentile
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+async def drive(bot_api, updates, interval, timeout):
+    latencies = []
+    answered = bot_api.count("answerCallbackQuery")
+    for update in updates:
+        start = time.perf_counter()
+        await bot_api.deliver(update)
+        answered += 1
+        await bot_api.wait_for("answerCallbackQuery", answered, timeout=timeout)
+        latencies.append(time.perf_counter() - start)
+        if interval:
+            await asyncio.sleep(interval)
+    latencies.sort()
+    return {
+        "updates": len(latencies),
+        "mean_ms": statistics.mean(latencies) * 1000,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "max_ms": latencies[-1] * 1000,
+    }
+
+def make_updates(count, first_id, posts):
+    updates = []
+    for i in range(count):
+        message_id, emoji_pair, link = posts[i % len(posts)]
+        updates.append(callback_update(first_id + i, 500000 + first_id + i, message_id, "vote_working", emoji_pair, link))
+    return updates
+
+async def run(args):
+    state_dir = tempfile.mkdtemp(prefix="bench_delivery_")
+    bot_api = await FakeBotAPI(latency=args.bot_latency).start()
+    configure_env(bot_api, state_dir)
+    port = free_port()
+    os.environ["WEBHOOK_URL"] = f"http://127.0.0.1:{port}"
+
+    import bot as bot_module
+    import config
+    if not args.verbose:
+        logging.getLogger().setLevel(logging.CRITICAL)
+    from shared import EMOJI_PAIRS, index_message
+    from vote_store import vote_store
+
+    posts = [(20000 + i, EMOJI_PAIRS[i % len(EMOJI_PAIRS)], f"https://www.canva.com/brand/join?token=DELIVERY{i}") for i in range(10)]
+    def seed_posts():
+        for message_id, emoji_pair, link in posts:
+            vote_store.create(CHAT_ID, message_id, emoji_pair)
+            index_message(CHAT_ID, message_id, link, emoji_pair)
+
+    results = {}
+    next_update_id = 1
+
+    if "polling" in args.modes:
+        app = bot_module.build_application()
+        await app.initialize()
+        await app.post_init(app)
+        await app.updater.start_polling(poll_interval=0, timeout=10)
+        await app.start()
+        seed_posts()
+        try:
+            results["polling"] = await drive(bot_api, make_updates(args.updates, next_update_id, posts), args.interval, args.timeout)
+        finally:
+            await app.updater.stop()
+            await app.stop()
+            await app.shutdown()
+            await app.post_shutdown(app)
+        next_update_id += args.updates
+
+    if "webhook" in args.modes:
+        app = bot_module.build_application()
+        stop_event = asyncio.Event()
+        server = asyncio.create_task(bot_module.run_webhook(app, port=port, stop_event=stop_event))
+        deadline = time.monotonic() + args.timeout
+        while not bot_api.webhook_url or not app.running:
+            if time.monotonic() > deadline or server.done():
+                raise RuntimeError("webhook mode did not come up")
+            await asyncio.sleep(0.01)
+        seed_posts()
+        try:
+            results["webhook"] = await drive(bot_api, make_updates(args.updates, next_update_id, posts), args.interval, args.timeout)
+            # A POST without the right secret must not reach the handlers
+            async with ClientSession() as session:
+                bad = callback_update(10 ** 9, 1, posts[0][0], "vote_working", posts[0][1], posts[0][2])
+                async with session.post(bot_api.webhook_url, json=bad, headers={"X-Telegram-Bot-Api-Secret-Token": "wrong"}) as resp:
+                    results["webhook"]["wrong_secret_status"] = resp.status
+            results["webhook"]["status_codes"] = {str(code): count for code, count in bot_api.webhook_statuses.items()}
+        finally:
+            stop_event.set()
+            await server
+
+    await bot_api.stop()
+    return {
+        "benchmark": "update_delivery",
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "params": {key: value for key, value in vars(args).items() if key not in ("json", "verbose")},
+        "webhook_path": config.WEBHOOK_PATH,
+        "results": results,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare update delivery latency of long polling and webhook mode")
+    parser.add_argument("--modes", nargs="+", default=["polling", "webhook"], choices=["polling", "webhook"])
+    parser.add_argument("--updates", type=int, default=200)
+    parser.add_argument("--interval", type=float, default=0.0, help="pause between clicks (s)")
+    parser.add_argument("--bot-latency", type=float, default=0.0, help="fake Bot API latency (s)")
+    parser.add_argument("--timeout", type=float, default=10)
+    parser.add_argument("--json", action="store_true")
+    parser.add_argument("--verbose", action="store_true", help="keep the bot's own logging")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    for mode, r in results["results"].items():
+        line = f"{mode:<8} {r['updates']} updates  mean {r['mean_ms']:.2f} ms  p50 {r['p50_ms']:.2f} ms  p99 {r['p99_ms']:.2f} ms  max {r['max_ms']:.2f} ms"
+        if "wrong_secret_status" in r:
+            line += f"  (wrong secret -> HTTP {r['wrong_secret_status']})"
+        print(line)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+# End-to-end benchmark against local stand-ins (benchmarks/standins.py), fully
+# offline: latency/throughput of get_latest_canva_link per scraping mode, the
+# full auto-post cycle (scrape -> sendMessage on a fake Bot API) and peak
+# memory. Results can be written as JSON for tracking regressions.
+#
+#   python benchmarks/bench_e2e.py
+#   python benchmarks/bench_e2e.py --iterations 50 --latency 0.05 --jitter 0.05 --error-rate 0.05
+#   python benchmarks/bench_e2e.py --modes direct scrapedo --json --output results.json
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, REPO_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+from standins import SourceSite, FakeScrapeDo, FakeBotAPI, base_env, forget_recent_scrapes, reset_scrape_state
+
+SCRAPEDO_TOKENS = ["bench-token-0001", "bench-token-0002", "bench-token-0003"]
+
+def summarize(latencies, wall, failures):
+    latencies = sorted(latencies)
+    def pct(p):
+        if not latencies:
+            return None
+        return latencies[min(len(latencies) - 1, int(round((len(latencies) - 1) * p / 100)))] * 1000
+    return {
+        "runs": len(latencies) + failures,
+        "failures": failures,
+        "mean_ms": statistics.mean(latencies) * 1000 if latencies else None,
+        "p50_ms": pct(50),
+        "p95_ms": pct(95),
+        "max_ms": latencies[-1] * 1000 if latencies else None,
+        "throughput_per_s": (len(latencies) + failures) / wall if wall else None,
+    }
+
+def configure_env(site, scrapedo, bot_api, state_dir):
+    os.environ.update(base_env(
+        state_dir, CHANNEL_ID="@benchmark", MAIN_URL=site.main_url,
+        SCRAPEDO_API_URL=scrapedo.base_url, SCRAPEDO_TOKENS=",".join(SCRAPEDO_TOKENS),
+        TELEGRAM_BASE_URL=bot_api.base_url + "/bot",
+        CHAT_SEND_INTERVAL=0,  # auto-post cycles run back to back into one chat
+        LINK_CHECK_INTERVAL=0,  # posted links are fake
+    ))
+
+async def bench_scrape(site, mode, scenario, iterations, expect):
+    # changed:   the link rotates before every run (full two-stage scrape)
+    # unchanged: same link every run (conditional request / redirect memo path)
+    # burst:     `iterations` concurrent callers on a changed link (single-flight)
+    import scrape_links
+    scrape_links.set_scraping_mode(mode)
+    reset_scrape_state()
+    if scenario == "unchanged":
+        await scrape_links.get_latest_canva_link()  # prime the caches
+    latencies, failures = [], 0
+    before = dict(site.requests)
+    wall_start = time.perf_counter()
+    if scenario == "burst":
+        site.rotate()
+        forget_recent_scrapes()
+        async def one():
+            start = time.perf_counter()
+            link = await scrape_links.get_latest_canva_link()
+            return link, time.perf_counter() - start
+        for link, elapsed in await asyncio.gather(*(one() for _ in range(iterations))):
+            if link == expect():
+                latencies.append(elapsed)
+            else:
+                failures += 1
+    else:
+        for _ in range(iterations):
+            if scenario == "changed":
+                site.rotate()
+            forget_recent_scrapes()
+            start = time.perf_counter()
+            link = await scrape_links.get_latest_canva_link()
+            elapsed = time.perf_counter() - start
+            if link == expect():
+                latencies.append(elapsed)
+            else:
+                failures += 1
+    wall = time.perf_counter() - wall_start
+    result = {"mode": mode, "scenario": scenario, **summarize(latencies, wall, failures)}
+    result["source_requests"] = {key: site.requests[key] - before.get(key, 0) for key in site.requests if site.requests[key] - before.get(key, 0)}
+    return result
+
+async def bench_auto_post(site, bot_api, iterations, timeout):
+    # Full cycle through the real auto_posting_task and Application bot:
+    # trigger a run, scrape the rotated link, sendMessage to the fake Bot API
+    import auto_posting
+    import bot as bot_module
+    import scrape_links
+    from scrape_links import set_scraping_mode
+    set_scraping_mode("direct")
+    reset_scrape_state()
+    app = bot_module.build_application()
+    await app.bot.initialize()
+    auto_posting.scheduler.set_interval(86400, 86400)  # only manual runs
+    task = asyncio.create_task(auto_posting.auto_posting_task(app.bot))
+    latencies, failures = [], 0
+    sent = bot_api.count("sendMessage")
+    wall_start = time.perf_counter()
+    try:
+        for _ in range(iterations):
+            site.rotate()
+            forget_recent_scrapes()  # cycles run back to back, well inside SCRAPE_RESULT_TTL
+            start = time.perf_counter()
+            auto_posting.run_auto_post_now()
+            try:
+                await bot_api.wait_for("sendMessage", sent + 1, timeout=timeout)
+                sent += 1
+                latencies.append(time.perf_counter() - start)
+            except asyncio.TimeoutError:
+                failures += 1
+                sent = bot_api.count("sendMessage")
+    finally:
+        task.cancel()
+        await app.bot.shutdown()
+    wall = time.perf_counter() - wall_start
+    return {"scenario": "auto_post_cycle", **summarize(latencies, wall, failures)}
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR, capture_output=True, text=True, timeout=5).stdout.strip() or None
+    except Exception:
+        return None
+
+def peak_rss_kb():
+    # ru_maxrss is KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+async def run(args):
+    state_dir = tempfile.mkdtemp(prefix="bench_e2e_")
+    stand_in = dict(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate, seed=args.seed)
+    site = await SourceSite(**stand_in).start()
+    scrapedo = await FakeScrapeDo(SCRAPEDO_TOKENS, latency=args.scrapedo_latency, jitter=args.jitter, error_rate=args.scrapedo_error_rate, seed=args.seed).start()
+    bot_api = await FakeBotAPI(latency=args.bot_latency, flood_rate=args.flood_rate, seed=args.seed).start()
+    configure_env(site, scrapedo, bot_api, state_dir)
+
+    import bot as bot_module  # noqa: F401  (sets up logging; imported here so env is in place)
+    if not args.verbose:
+        logging.getLogger().setLevel(logging.CRITICAL)
+    from scrape_links import init_http_session, close_http_session
+    from vote_store import vote_store
+    await init_http_session()
+    vote_store.open()
+
+    sections = []
+    if args.tracemalloc:
+        tracemalloc.start()
+    try:
+        for mode in args.modes:
+            for scenario in args.scenarios:
+                if args.tracemalloc:
+                    tracemalloc.reset_peak()
+                result = await bench_scrape(site, mode, scenario, args.iterations, site.canva_link)
+                if args.tracemalloc:
+                    result["py_peak_kb"] = tracemalloc.get_traced_memory()[1] / 1024
+                sections.append(result)
+                if not args.json:
+                    print(format_row(result), flush=True)
+        if args.auto_post_iterations:
+            if args.tracemalloc:
+                tracemalloc.reset_peak()
+            result = await bench_auto_post(site, bot_api, args.auto_post_iterations, args.timeout)
+            if args.tracemalloc:
+                result["py_peak_kb"] = tracemalloc.get_traced_memory()[1] / 1024
+            sections.append(result)
+            if not args.json:
+                print(format_row(result), flush=True)
+    finally:
+        await vote_store.close()
+        await close_http_session()
+        for stand in (bot_api, scrapedo, site):
+            await stand.stop()
+
+    return {
+        "benchmark": "e2e",
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": f"{platform.system()} {platform.release()}",
+        "params": {key: value for key, value in vars(args).items() if key not in ("json", "output", "verbose")},
+        "results": sections,
+        "bot_api_calls": dict(bot_api.requests),
+        "scrapedo_requests": dict(scrapedo.requests),
+        "peak_rss_kb": peak_rss_kb(),
+    }
+
+def format_row(r):
+    fmt = lambda value: f"{value:.1f}" if value is not None else "-"
+    name = f"{r.get('mode', '-')}/{r['scenario']}"
+    return f"{name:<24}{r['runs']:>6}{r['failures']:>6}{fmt(r['mean_ms']):>10}{fmt(r['p50_ms']):>10}{fmt(r['p95_ms']):>10}{fmt(r['throughput_per_s']):>10}"
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline end-to-end benchmark of scraping and auto-posting")
+    parser.add_argument("--modes", nargs="+", default=["direct", "scrapedo", "both"], choices=["direct", "scrapedo", "both"])
+    parser.add_argument("--scenarios", nargs="+", default=["changed", "unchanged", "burst"], choices=["changed", "unchanged", "burst"])
+    parser.add_argument("--iterations", type=int, default=20, help="scrapes per mode and scenario")
+    parser.add_argument("--auto-post-iterations", type=int, default=10, help="auto-post cycles (0 = skip)")
+    parser.add_argument("--latency", type=float, default=0.02, help="source site latency (s)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="extra random latency, uniform 0..jitter (s)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of source site requests answered with 503")
+    parser.add_argument("--scrapedo-latency", type=float, default=0.05, help="Scrape.do overhead on top of the site (s)")
+    parser.add_argument("--scrapedo-error-rate", type=float, default=0.0)
+    parser.add_argument("--bot-latency", type=float, default=0.01, help="Bot API latency (s)")
+    parser.add_argument("--flood-rate", type=float, default=0.0, help="fraction of Bot API calls answered with 429")
+    parser.add_argument("--timeout", type=float, default=10, help="per auto-post cycle timeout (s)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--tracemalloc", action="store_true", help="also report Python heap peak per section (slower)")
+    parser.add_argument("--json", action="store_true", help="print the JSON results instead of a table")
+    parser.add_argument("--output", help="write the JSON results to this file")
+    parser.add_argument("--verbose", action="store_true", help="keep the bot's own logging")
+    args = parser.parse_args()
+
+    if not args.json:
+        print(f"{'mode/scenario':<24}{'runs':>6}{'fail':>6}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}{'per s':>10}")
+    results = asyncio.run(run(args))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(f"peak RSS: {results['peak_rss_kb'] / 1024:.1f} MiB, Bot API calls: {results['bot_api_calls']}")
+
+if __name__ == "__main__":
+    main()
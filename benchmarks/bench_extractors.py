@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+# Per-tier parse time and allocations of the link extractors over saved pages.
+#
+#   python benchmarks/bench_extractors.py
+#   python benchmarks/bench_extractors.py --iterations 200 --json
+#   python benchmarks/bench_extractors.py --main saved_main.html --redirect saved_redirect.html
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import extractors
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+def bench_tier(func, html, iterations):
+    link = func(html)  # warm-up, also the reported result
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func(html)
+    elapsed = (time.perf_counter() - start) / iterations
+    tracemalloc.start()
+    func(html)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"link": link, "ms": elapsed * 1000, "peak_kb": peak / 1024}
+
+def run(pages, iterations):
+    results = []
+    for stage, path in pages:
+        with open(path, encoding="utf-8") as f:
+            html = f.read()
+        tiers = extractors.MAIN_TIERS if stage == "main" else extractors.REDIRECT_TIERS
+        for tier in extractors.TIERS:
+            if tier == "fast" and extractors.FAST_PARSER is None:
+                continue
+            row = bench_tier(tiers[tier], html, iterations)
+            row.update({"page": os.path.basename(path), "stage": stage, "tier": tier, "bytes": len(html)})
+            results.append(row)
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the link extractor tiers")
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--main", action="append", default=[], help="saved main page (repeatable)")
+    parser.add_argument("--redirect", action="append", default=[], help="saved redirect page (repeatable)")
+    parser.add_argument("--json", action="store_true", help="print machine-readable results")
+    args = parser.parse_args()
+
+    pages = [("main", p) for p in args.main] + [("redirect", p) for p in args.redirect]
+    if not pages:
+        pages = [("main", os.path.join(FIXTURES_DIR, "main_page.html"))]
+        pages += [("redirect", p) for p in sorted(glob.glob(os.path.join(FIXTURES_DIR, "redirect_*.html")))]
+
+    results = run(pages, args.iterations)
+    if args.json:
+        print(json.dumps({"fast_parser": extractors.FAST_PARSER, "iterations": args.iterations, "results": results}, indent=2))
+        return
+    print(f"fast parser backend: {extractors.FAST_PARSER or 'not installed'}  iterations: {args.iterations}")
+    print(f"{'page':<22}{'tier':<7}{'time ms':>10}{'peak KiB':>11}  result")
+    for row in results:
+        print(f"{row['page']:<22}{row['tier']:<7}{row['ms']:>10.3f}{row['peak_kb']:>11.1f}  {row['link'] or '-'}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+# Multi-source / multi-channel benchmark: several SourceSite stand-ins and
+# channels from a SOURCES_CONFIG registry, fully offline. Measures scraping all
+# sources concurrently vs one at a time and fanning posts out to all channels
+# concurrently vs one at a time, and checks that each channel is deduplicated
+# on its own, that posts into one chat keep CHAT_SEND_INTERVAL apart, and that
+# votes on equal message ids in different chats are counted separately.
+#
+#   python benchmarks/bench_fanout.py
+#   python benchmarks/bench_fanout.py --sources 8 --channels 20 --latency 0.1 --json
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+from standins import SourceSite, FakeBotAPI, base_env, forget_recent_scrapes
+from load_votes import callback_update
+
+FIRST_CHAT = -1003000000000
+
+def write_registry(path, sites, channel_count):
+    # Channel i subscribes to sources i and i+1, so neighbouring channels share one
+    sources = [{"name": f"site{i}", "url": site.main_url, "rule": "su_button"} for i, site in enumerate(sites)]
+    channels = []
+    for i in range(channel_count):
+        names = sorted({f"site{i % len(sites)}", f"site{(i + 1) % len(sites)}"})
+        channels.append({"chat_id": FIRST_CHAT - i, "sources": names})
+    with open(path, "w") as f:
+        json.dump({"sources": sources, "channels": channels}, f)
+
+def configure_env(bot_api, state_dir, registry_path, spacing):
+    os.environ.update(base_env(
+        state_dir, CHANNEL_ID=FIRST_CHAT, TELEGRAM_BASE_URL=bot_api.base_url + "/bot",
+        SOURCES_CONFIG=registry_path, CHAT_SEND_INTERVAL=spacing, SCRAPE_RESULT_TTL=0, LINK_CHECK_INTERVAL=0,
+    ))
+
+def expected_posts(registry, links):
+    # New links per channel, counting a link two sources share only once
+    return sum(len({links[name] for name in channel.sources if links.get(name) and channel.is_new(links[name])}) for channel in registry.channels)
+
+async def timed(coro):
+    start = time.perf_counter()
+    result = await coro
+    return result, time.perf_counter() - start
+
+async def run(args):
+    state_dir = tempfile.mkdtemp(prefix="bench_fanout_")
+    sites = [await SourceSite(tag=f"S{i}_", latency=args.latency).start() for i in range(args.sources)]
+    bot_api = await FakeBotAPI(latency=args.bot_latency).start()
+    registry_path = os.path.join(state_dir, "sources.json")
+    write_registry(registry_path, sites, args.channels)
+    configure_env(bot_api, state_dir, registry_path, args.spacing)
+
+    import bot as bot_module
+    if not args.verbose:
+        logging.getLogger().setLevel(logging.CRITICAL)
+    import registry
+    import scrape_links
+    from auto_posting import fan_out
+    from vote_store import vote_store
+    scrape_links.set_scraping_mode("direct")
+    await scrape_links.init_http_session()
+    vote_store.open()
+    app = bot_module.build_application()
+    await app.initialize()
+
+    def rotate(selected=None):
+        for i in (range(len(sites)) if selected is None else selected):
+            sites[i].rotate()
+        forget_recent_scrapes()
+
+    def correct(links):
+        return all(links[f"site{i}"] == site.canva_link() for i, site in enumerate(sites))
+
+    results = {}
+    try:
+        # Scraping: one source at a time vs SOURCE_PARALLELISM at once
+        rotate()
+        links, seq_s = await timed(scrape_links.scrape_sources(limit=1))
+        links_ok = correct(links)
+        rotate()
+        links, par_s = await timed(scrape_links.scrape_sources())
+        results["scrape"] = {"sources": len(sites), "sequential_s": seq_s, "parallel_s": par_s,
+                             "speedup": seq_s / par_s, "links_ok": links_ok and correct(links)}
+
+        # Fan-out: one channel at a time vs FANOUT_PARALLELISM at once, fresh links each round
+        rounds = {}
+        for label, limit in (("sequential", 1), ("parallel", None)):
+            rotate()
+            links = await scrape_links.scrape_sources()
+            expected = expected_posts(registry, links)
+            posted, elapsed = await timed(fan_out(app.bot, links) if limit is None else fan_out(app.bot, links, limit=limit))
+            rounds[label] = {"posts": len(posted), "expected": expected, "seconds": elapsed}
+        # Same links again: every channel already has them
+        repeat = await fan_out(app.bot, links)
+        # Only site0 changes: only the channels subscribed to it post
+        rotate([0])
+        links = await scrape_links.scrape_sources()
+        expected = expected_posts(registry, links)
+        partial = await fan_out(app.bot, links)
+        results["fanout"] = {
+            "channels": len(registry.channels), **rounds,
+            "speedup": rounds["sequential"]["seconds"] / rounds["parallel"]["seconds"],
+            "repeat_posts": len(repeat),
+            "site0_change_posts": len(partial), "site0_change_expected": expected,
+        }
+
+        # Per-chat spacing, from the times the fake Bot API saw each sendMessage
+        sent = defaultdict(list)
+        for at, method, params in bot_api.calls:
+            if method == "sendMessage":
+                sent[str(params.get("chat_id"))].append(at)
+        gaps = [b - a for times in sent.values() for a, b in zip(times, times[1:])]
+        results["spacing"] = {"interval_s": args.spacing, "min_gap_s": min(gaps) if gaps else None,
+                              "chats": len(sent), "max_posts_per_chat": max(len(times) for times in sent.values())}
+
+        # Message ids are per chat: the first posts in two channels share an id
+        first_a, first_b = registry.channels[0].chat_id, registry.channels[1].chat_id
+        message_id = 1001  # FakeBotAPI numbers each chat's messages from 1001
+        for chat_id, update_id in ((first_a, 1), (first_b, 2), (first_a, 3)):
+            pair = vote_store.get(chat_id, message_id).emoji_pair
+            await app.process_update(bot_module.Update.de_json(
+                callback_update(update_id, 777, message_id, "vote_working", pair, "https://www.canva.com/x", chat_id=chat_id), app.bot))
+        results["votes"] = {
+            "shared_message_id": message_id,
+            "chat_a_voters": len(vote_store.get(first_a, message_id).voters),
+            "chat_b_voters": len(vote_store.get(first_b, message_id).voters),
+        }
+    finally:
+        await app.shutdown()
+        await vote_store.close()
+        await scrape_links.close_http_session()
+        for stand in (bot_api, *sites):
+            await stand.stop()
+
+    return {
+        "benchmark": "fanout",
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "params": {key: value for key, value in vars(args).items() if key not in ("json", "verbose")},
+        "results": results,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark scraping several sources and fanning posts out to several channels")
+    parser.add_argument("--sources", type=int, default=4)
+    parser.add_argument("--channels", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.05, help="source site latency (s)")
+    parser.add_argument("--bot-latency", type=float, default=0.05, help="fake Bot API latency (s)")
+    parser.add_argument("--spacing", type=float, default=0.2, help="CHAT_SEND_INTERVAL for the run (s)")
+    parser.add_argument("--json", action="store_true")
+    parser.add_argument("--verbose", action="store_true", help="keep the bot's own logging")
+    args = parser.parse_args()
+    if args.sources < 2 or args.channels < 2:
+        parser.error("needs at least 2 sources and 2 channels")
+
+    results = asyncio.run(run(args))
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    r = results["results"]
+    s, f, sp, v = r["scrape"], r["fanout"], r["spacing"], r["votes"]
+    print(f"scrape   {s['sources']} sources  sequential {s['sequential_s']:.3f}s  parallel {s['parallel_s']:.3f}s  "
+          f"x{s['speedup']:.1f}  links {'ok' if s['links_ok'] else 'WRONG'}")
+    print(f"fan-out  {f['channels']} channels  sequential {f['sequential']['posts']}/{f['sequential']['expected']} posts in {f['sequential']['seconds']:.3f}s  "
+          f"parallel {f['parallel']['posts']}/{f['parallel']['expected']} in {f['parallel']['seconds']:.3f}s  x{f['speedup']:.1f}")
+    print(f"dedupe   same links again -> {f['repeat_posts']} posts, site0 changed -> {f['site0_change_posts']}/{f['site0_change_expected']} posts")
+    print(f"spacing  {sp['chats']} chats, up to {sp['max_posts_per_chat']} posts each, min gap {sp['min_gap_s']:.3f}s (interval {sp['interval_s']}s)")
+    print(f"votes    message id {v['shared_message_id']} in two chats: {v['chat_a_voters']} and {v['chat_b_voters']} voter(s) (one user voted in both, then again in the first)")
+
+if __name__ == "__main__":
+    main()
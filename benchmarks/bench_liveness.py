@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+# Link liveness checker against the CanvaSite stand-in (standins.py), fully
+# offline. Sweeps a mix of valid, expired, gone and erroring links and reports
+# verdict accuracy, sweep time at LINK_CHECK_CONCURRENCY vs one probe at a
+# time, the peak number of probes the site saw at once, and cache hits on a
+# repeat sweep. Then lets the current channel link expire and times how long
+# it takes until the auto-post scheduler is woken for a re-scrape, and checks
+# that the re-scrape gets past the scrape caches (304, redirect memo, recent
+# result) and posts the invite that replaced the dead one (SourceSite and
+# FakeBotAPI stand in for the source page and Telegram).
+#
+#   python benchmarks/bench_liveness.py
+#   python benchmarks/bench_liveness.py --links 200 --concurrency 8 --latency 0.2 --json
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+from standins import CanvaSite, SourceSite, FakeBotAPI, base_env
+
+EXPECTED = {"valid": "alive", "expired": "dead", "gone": "dead", "error": "unknown"}
+MIX = (("valid", 0.7), ("expired", 0.15), ("gone", 0.1), ("error", 0.05))
+
+def configure_env(state_dir, pages, args):
+    os.environ.update(base_env(
+        state_dir, MAIN_URL=pages.main_url, CHAT_SEND_INTERVAL=0,
+        LINK_CHECK_CONCURRENCY=args.concurrency, LINK_CHECK_TTL=args.ttl, LINK_CHECK_RECENT=args.links + 1,
+    ))
+
+def make_links(site, count, rng):
+    states = [state for state, share in MIX for _ in range(round(count * share))][:count]
+    states += ["valid"] * (count - len(states))
+    rng.shuffle(states)
+    return {site.add(f"LIVE{i:05d}", state): state for i, state in enumerate(states)}
+
+async def timed_sweep(checker):
+    start = time.perf_counter()
+    verdicts = await checker.sweep()
+    return verdicts, time.perf_counter() - start
+
+async def run(args):
+    rng = random.Random(args.seed)
+    state_dir = tempfile.mkdtemp(prefix="bench_liveness_")
+    site = await CanvaSite(latency=args.latency, jitter=args.jitter, seed=args.seed).start()
+    pages = await SourceSite().start()
+    bot_api = await FakeBotAPI().start()
+    configure_env(state_dir, pages, args)
+
+    import auto_posting
+    import config
+    import registry
+    import scrape_links
+    from link_checker import LinkChecker, Verdict, link_checker
+    from telegram import Bot
+    if not args.verbose:
+        logging.getLogger().setLevel(logging.CRITICAL)
+    await scrape_links.init_http_session()
+    results = {}
+    try:
+        links = make_links(site, args.links, rng)
+
+        # One probe at a time, for comparison
+        serial = LinkChecker(concurrency=1, recent=args.links)
+        for link in links:
+            serial.watch(link)
+        _, serial_s = await timed_sweep(serial)
+
+        # Cold sweep at the configured concurrency, then a repeat served from the cache
+        for link in links:
+            link_checker.watch(link)
+        site.peak_in_flight = 0
+        before = sum(site.requests.values())
+        verdicts, cold_s = await timed_sweep(link_checker)
+        cold_requests = sum(site.requests.values()) - before
+        wrong = {link: (state, verdicts[link].state) for link, state in links.items() if verdicts[link].state != EXPECTED[state]}
+        before = sum(site.requests.values())
+        _, warm_s = await timed_sweep(link_checker)
+        results["sweep"] = {
+            "links": len(links), "concurrency": args.concurrency,
+            "serial_s": serial_s, "cold_s": cold_s, "speedup": serial_s / cold_s,
+            "cold_requests": cold_requests, "peak_in_flight": site.peak_in_flight,
+            "wrong_verdicts": len(wrong), "examples": dict(list(wrong.items())[:3]),
+            "warm_s": warm_s, "warm_requests": sum(site.requests.values()) - before,
+        }
+
+        # The link a channel shows expires: the next sweep after the TTL wakes the auto-poster
+        channel = registry.channels[0]
+        token = "CURRENT"
+        current = site.add(token, "valid")
+        channel.remember(current)
+        link_checker.watch(current)
+        await link_checker.check(current)
+        scheduler = auto_posting.scheduler
+        scheduler.schedule_next(86400)  # far away: only a run_now() wakes it
+        waiter = asyncio.create_task(scheduler.wait_until_due())
+        site.tokens[token] = "expired"
+        await asyncio.sleep(args.ttl)  # the cached "alive" verdict runs out
+        start = time.perf_counter()
+        await link_checker.sweep()
+        reason = await asyncio.wait_for(waiter, timeout=10)
+        wake_s = time.perf_counter() - start
+        # A second sweep must not trigger again for the same link
+        waiter = asyncio.create_task(scheduler.wait_until_due())
+        await link_checker.sweep()
+        await asyncio.sleep(0.05)
+        retriggered = waiter.done()
+        waiter.cancel()
+
+        # Posting skips links the checker already knows are dead
+        dead = next(link for link, state in links.items() if state == "expired")
+        skipped = not await auto_posting.fan_out(None, {source: dead for source in channel.sources})
+        results["dead_link"] = {"wake_reason": reason, "wake_s": wake_s, "retriggered": retriggered, "post_skipped": skipped}
+
+        # The channel's scraped link dies while the source page still points at
+        # the same redirect page, which now carries a new invite. Within
+        # SCRAPE_RESULT_TTL and the redirect memo's TTL, only dropping the
+        # cached results lets the re-scrape find it.
+        bot = Bot(config.BOT_TOKEN, base_url=bot_api.base_url + "/bot")
+        await bot.initialize()
+        scrape_links.set_scraping_mode("direct")
+        first = await auto_posting.fan_out(bot, await scrape_links.scrape_sources())
+        expired = pages.canva_link()
+        pages.reissue()
+        # Canva itself can't be probed offline: store the verdict a probe of the expired invite gives
+        link_checker._verdicts[expired] = Verdict("dead", "page says 'expired'", time.monotonic())
+        waiter = asyncio.create_task(scheduler.wait_until_due())
+        await link_checker.sweep()
+        await asyncio.wait_for(waiter, timeout=10)
+        before = dict(pages.requests)
+        start = time.perf_counter()
+        posted = [link for _, link, _ in await auto_posting.fan_out(bot, await scrape_links.scrape_sources())]
+        results["rescrape"] = {
+            "first_posted": [link for _, link, _ in first] == [expired],
+            "posted": posted, "replacement": pages.canva_link(),
+            "replacement_posted": posted == [pages.canva_link()],
+            "cycle_s": time.perf_counter() - start,
+            "source_requests": {key: pages.requests[key] - before.get(key, 0) for key in pages.requests if pages.requests[key] - before.get(key, 0)},
+        }
+        await bot.shutdown()
+    finally:
+        await scrape_links.close_http_session()
+        await bot_api.stop()
+        await pages.stop()
+        await site.stop()
+
+    return {
+        "benchmark": "liveness",
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "params": {key: value for key, value in vars(args).items() if key not in ("json", "verbose")},
+        "site_requests": dict(site.requests),
+        "results": results,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the link liveness checker against a local Canva stand-in")
+    parser.add_argument("--links", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=4, help="LINK_CHECK_CONCURRENCY")
+    parser.add_argument("--ttl", type=float, default=4.0, help="LINK_CHECK_TTL for the run (s)")
+    parser.add_argument("--latency", type=float, default=0.05, help="stand-in latency (s)")
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", action="store_true")
+    parser.add_argument("--verbose", action="store_true", help="keep the bot's own logging")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    s, d, r = results["results"]["sweep"], results["results"]["dead_link"], results["results"]["rescrape"]
+    print(f"sweep    {s['links']} links  serial {s['serial_s']:.2f}s  concurrency {s['concurrency']} {s['cold_s']:.2f}s  x{s['speedup']:.1f}  "
+          f"peak in flight {s['peak_in_flight']}  wrong verdicts {s['wrong_verdicts']}")
+    print(f"cache    repeat sweep {s['warm_s'] * 1000:.1f} ms, {s['warm_requests']} requests")
+    print(f"expiry   scheduler woken ({d['wake_reason']}) {d['wake_s'] * 1000:.1f} ms after the sweep started, "
+          f"re-triggered: {d['retriggered']}, dead link posted: {not d['post_skipped']}")
+    print(f"rescrape replacement invite posted: {r['replacement_posted']} ({r['cycle_s'] * 1000:.1f} ms, source requests {r['source_requests']})")
+    print(f"site     {results['site_requests']}")
+    if not (r["first_posted"] and r["replacement_posted"]):
+        sys.exit(f"re-scrape after a dead link posted {r['posted']}, expected {r['replacement']}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,342 @@
+#!/usr/bin/env python3
+# Multi-replica check: starts several `bot.py` processes in webhook mode that
+# share one SQLite state file (STATE_BACKEND_URL), with the source site and Bot
+# API stand-ins from standins.py, and plays load balancer by spreading updates
+# over the replicas. Verifies that exactly one replica posts, that admin
+# settings and the last posted link propagate, that votes taken by different
+# replicas add up, and measures leader failover after a crash and a clean
+# shutdown. Fully offline.
+#
+#   python benchmarks/bench_replicas.py
+#   python benchmarks/bench_replicas.py --replicas 4 --lease-ttl 2 --votes 2000 --json
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import signal
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+from aiohttp import ClientSession
+
+from standins import SourceSite, FakeBotAPI, base_env
+from load_votes import callback_update
+
+CHANNEL_ID = "@bench_replicas"
+ADMIN_ID = 4242
+WEBHOOK_PATH = "/telegram/webhook"
+WEBHOOK_SECRET = "bench-replicas-secret"
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def command_update(update_id, text):
+    command = text.split()[0]
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": ADMIN_ID, "type": "private", "first_name": "admin"},
+            "from": {"id": ADMIN_ID, "is_bot": False, "first_name": "admin"},
+            "text": text,
+            "entities": [{"type": "bot_command", "offset": 0, "length": len(command)}],
+        },
+    }
+
+class Replica:
+    def __init__(self, index, env, state_dir):
+        self.index = index
+        self.name = f"replica-{index}"
+        self.port = free_port()
+        self.url = f"http://127.0.0.1:{self.port}"
+        self.log_path = os.path.join(state_dir, f"{self.name}.out")
+        self.env = dict(env, PORT=str(self.port), WEBHOOK_URL=self.url, REPLICA_ID=self.name,
+                        LOG_PATH=os.path.join(state_dir, f"{self.name}.log"),
+                        IMPORTANT_LOG_PATH=os.path.join(state_dir, f"{self.name}.important.log"),
+                        VOTE_DB_PATH=os.path.join(state_dir, f"{self.name}.votes.db"),
+                        TOKEN_POOL_STATE_PATH=os.path.join(state_dir, f"{self.name}.token_pool.json"))
+        self.proc = None
+
+    def start(self):
+        with open(self.log_path, "ab") as out:
+            self.proc = subprocess.Popen([sys.executable, "bot.py"], cwd=REPO_DIR, env=self.env, stdout=out, stderr=subprocess.STDOUT)
+
+    @property
+    def alive(self):
+        return self.proc is not None and self.proc.poll() is None
+
+    async def get(self, session, path):
+        async with session.get(self.url + path) as resp:
+            return resp.status, await resp.text()
+
+    async def is_leader(self, session):
+        try:
+            _, text = await self.get(session, "/metrics")
+        except Exception:
+            return False
+        return 'bot_replica_leader{lease="auto_poster"} 1' in text
+
+    async def deliver(self, session, update):
+        async with session.post(self.url + WEBHOOK_PATH, json=update, headers={"X-Telegram-Bot-Api-Secret-Token": WEBHOOK_SECRET}) as resp:
+            return resp.status
+
+async def wait_until(predicate, timeout, interval=0.05):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if await predicate():
+            return True
+        await asyncio.sleep(interval)
+    return False
+
+class Harness:
+    def __init__(self, args, site, bot_api, replicas):
+        self.args = args
+        self.site = site
+        self.bot_api = bot_api
+        self.replicas = replicas
+        self.session = None
+        self.update_ids = itertools.count(1)
+        self.rng = random.Random(args.seed)
+
+    def alive(self):
+        return [replica for replica in self.replicas if replica.alive]
+
+    async def leaders(self):
+        return [replica for replica in self.alive() if await replica.is_leader(self.session)]
+
+    async def wait_for_single_leader(self, timeout):
+        found = []
+        async def check():
+            found[:] = await self.leaders()
+            return len(found) == 1
+        if not await wait_until(check, timeout):
+            raise RuntimeError(f"expected one leader, found {[r.name for r in found]}")
+        return found[0]
+
+    def channel_posts(self):
+        return [params for _, method, params in self.bot_api.calls if method == "sendMessage" and params.get("chat_id") == CHANNEL_ID]
+
+    def replies(self):
+        return [params.get("text", "") for _, method, params in self.bot_api.calls if method == "sendMessage" and str(params.get("chat_id")) == str(ADMIN_ID)]
+
+    async def command(self, replica, text):
+        return await replica.deliver(self.session, command_update(next(self.update_ids), text))
+
+    async def post_cycle(self, via, rotate):
+        # /runnow on a (usually non-leader) replica; returns (new channel posts, seconds until the post)
+        before = len(self.channel_posts())
+        if rotate:
+            self.site.rotate()
+        start = time.perf_counter()
+        await self.command(via, "/runnow")
+        posted = await wait_until(lambda: self._posted(before), self.args.timeout)
+        elapsed = time.perf_counter() - start if posted else None
+        await asyncio.sleep(self.args.grace)  # anything else posting would show up by now
+        return len(self.channel_posts()) - before, elapsed
+
+    async def _posted(self, before):
+        return len(self.channel_posts()) > before
+
+    async def interval_propagation(self, via, min_sec, max_sec):
+        # /setinterval on one replica, then /stats on every replica until all report it
+        start = time.perf_counter()
+        await self.command(via, f"/setinterval {min_sec} {max_sec}")
+        expected = f"{min_sec}-{max_sec} sec"
+        pending = set(self.alive())
+        async def check():
+            for replica in list(pending):
+                before = len(self.replies())
+                await self.command(replica, "/stats")
+                await wait_until(lambda: self._replied(before), 2)
+                reply = next((text for text in reversed(self.replies()) if "Auto-post interval" in text), "")
+                if expected in reply:
+                    pending.discard(replica)
+            return not pending
+        ok = await wait_until(check, self.args.timeout, interval=0.2)
+        return ok, time.perf_counter() - start
+
+    async def _replied(self, before):
+        return len(self.replies()) > before
+
+    async def votes(self, state_path):
+        # Votes for a few posts spread over every replica; some users click twice
+        # (on different replicas) and must be turned away as already voted
+        posts = [(30000 + i, ("\U0001F7E2", "\U0001F534"), f"https://www.canva.com/brand/join?token=REPLICA{i}") for i in range(self.args.vote_posts)]
+        clicks, expected = [], {message_id: set() for message_id, _, _ in posts}
+        while len(clicks) < self.args.votes:
+            message_id, emoji_pair, link = self.rng.choice(posts)
+            user_id = self.rng.randint(1, self.args.votes)
+            clicks.append((message_id, emoji_pair, link, user_id))
+            expected[message_id].add(user_id)
+        answered = self.bot_api.count("answerCallbackQuery")
+        alive = self.alive()
+        queue = asyncio.Queue()
+        for i, click in enumerate(clicks):
+            queue.put_nowait((alive[i % len(alive)], click))
+        async def worker():
+            while not queue.empty():
+                replica, (message_id, emoji_pair, link, user_id) = queue.get_nowait()
+                await replica.deliver(self.session, callback_update(next(self.update_ids), user_id, message_id, "vote_working", emoji_pair, link))
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(self.args.concurrency)))
+        await self.bot_api.wait_for("answerCallbackQuery", answered + len(clicks), timeout=self.args.timeout)
+        elapsed = time.perf_counter() - start
+        await asyncio.sleep(2)  # queued writes are flushed every VOTE_FLUSH_INTERVAL
+        with sqlite3.connect(state_path) as conn:
+            counts = dict(conn.execute("SELECT message_id, working FROM votes WHERE message_id >= 30000"))
+        duplicates = sum(1 for _, method, params in self.bot_api.calls[-len(clicks) * 3:]
+                         if method == "answerCallbackQuery" and "already voted" in params.get("text", ""))
+        mismatched = {message_id: (counts.get(message_id, 0), len(users)) for message_id, users in expected.items() if counts.get(message_id, 0) != len(users)}
+        return {
+            "clicks": len(clicks),
+            "replicas": len(alive),
+            "callbacks_per_s": len(clicks) / elapsed,
+            "expected_votes": sum(len(users) for users in expected.values()),
+            "counted_votes": sum(counts.values()),
+            "already_voted_answers": duplicates,
+            "expected_duplicates": len(clicks) - sum(len(users) for users in expected.values()),
+            "mismatched_posts": mismatched,
+        }
+
+    async def failover(self, leader, hard):
+        # hard: SIGKILL (lease has to expire), otherwise SIGTERM (lease released on shutdown)
+        start = time.perf_counter()
+        leader.proc.send_signal(signal.SIGKILL if hard else signal.SIGTERM)
+        await asyncio.to_thread(leader.proc.wait, 30)
+        new_leader = await self.wait_for_single_leader(self.args.lease_ttl * 3 + self.args.timeout)
+        return new_leader, time.perf_counter() - start
+
+async def run(args):
+    state_dir = tempfile.mkdtemp(prefix="bench_replicas_")
+    state_path = os.path.join(state_dir, "state.db")
+    site = await SourceSite(latency=args.latency).start()
+    bot_api = await FakeBotAPI(latency=args.bot_latency).start()
+    env = dict(os.environ, **base_env(
+        state_dir, CHANNEL_ID=CHANNEL_ID, BOT_ADMIN_ID=ADMIN_ID,
+        MAIN_URL=site.main_url, TELEGRAM_BASE_URL=bot_api.base_url + "/bot",
+        WEBHOOK_PATH=WEBHOOK_PATH, WEBHOOK_SECRET=WEBHOOK_SECRET,
+        STATE_BACKEND_URL=f"sqlite:///{state_path}", LEADER_LEASE_TTL=args.lease_ttl, STATE_SYNC_INTERVAL=args.sync_interval,
+        SCRAPE_RESULT_TTL=0, CHAT_SEND_INTERVAL=0, LINK_CHECK_INTERVAL=0,  # back-to-back cycles must scrape and post again
+    ))
+    replicas = [Replica(i, env, state_dir) for i in range(args.replicas)]
+    results = {"state_dir": state_dir}
+    harness = Harness(args, site, bot_api, replicas)
+    async with ClientSession() as session:
+        harness.session = session
+        try:
+            start = time.perf_counter()
+            for replica in replicas:
+                replica.start()
+            for replica in replicas:
+                async def up(replica=replica):
+                    try:
+                        return (await replica.get(session, "/health"))[0] == 200
+                    except Exception:
+                        return False
+                if not await wait_until(up, args.timeout * 3, interval=0.1):
+                    raise RuntimeError(f"{replica.name} did not start, see {replica.log_path}")
+            leader = await harness.wait_for_single_leader(args.lease_ttl * 2 + args.timeout)
+            results["startup"] = {"seconds": time.perf_counter() - start, "leader": leader.name}
+
+            followers = lambda: [r for r in harness.alive() if r is not leader]
+            cycles = []
+            for i in range(args.cycles):
+                posts, seconds = await harness.post_cycle(followers()[i % len(followers())], rotate=True)
+                cycles.append({"rotated": True, "posts": posts, "seconds": seconds})
+            posts, seconds = await harness.post_cycle(followers()[0], rotate=False)
+            cycles.append({"rotated": False, "posts": posts, "seconds": seconds})
+            results["post_cycles"] = cycles
+
+            ok, seconds = await harness.interval_propagation(followers()[0], 600, 1200)
+            results["interval_propagation"] = {"ok": ok, "seconds": seconds}
+
+            results["votes"] = await harness.votes(state_path)
+
+            for hard in (True, False):
+                if len(harness.alive()) < 2:
+                    break
+                old = leader
+                leader, seconds = await harness.failover(leader, hard)
+                # Same link as before: the new leader must not post it again
+                same_posts, _ = await harness.post_cycle(followers()[0] if followers() else leader, rotate=False)
+                new_posts, new_seconds = await harness.post_cycle(followers()[0] if followers() else leader, rotate=True)
+                results["failover_" + ("kill" if hard else "term")] = {
+                    "from": old.name, "to": leader.name, "seconds": seconds,
+                    "reposted_same_link": same_posts, "new_link_posts": new_posts, "new_link_seconds": new_seconds,
+                }
+        finally:
+            for replica in replicas:
+                if replica.alive:
+                    replica.proc.send_signal(signal.SIGTERM)
+            for replica in replicas:
+                if replica.proc is not None:
+                    try:
+                        await asyncio.to_thread(replica.proc.wait, 15)
+                    except subprocess.TimeoutExpired:
+                        replica.proc.kill()
+            await bot_api.stop()
+            await site.stop()
+    results["channel_posts"] = len(harness.channel_posts())
+    return {
+        "benchmark": "replicas",
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "params": {key: value for key, value in vars(args).items() if key != "json"},
+        "results": results,
+    }
+
+def print_report(report):
+    r = report["results"]
+    print(f"startup      {report['params']['replicas']} replicas up, leader {r['startup']['leader']} after {r['startup']['seconds']:.2f}s")
+    for cycle in r["post_cycles"]:
+        seconds = f"{cycle['seconds']:.2f}s" if cycle["seconds"] is not None else "-"
+        print(f"/runnow      {'new link' if cycle['rotated'] else 'same link':<9} -> {cycle['posts']} channel post(s) {seconds}")
+    prop = r["interval_propagation"]
+    print(f"/setinterval {'reached every replica' if prop['ok'] else 'did NOT reach every replica'} in {prop['seconds']:.2f}s")
+    votes = r["votes"]
+    print(f"votes        {votes['clicks']} clicks over {votes['replicas']} replicas, {votes['callbacks_per_s']:.0f}/s, "
+          f"counted {votes['counted_votes']}/{votes['expected_votes']}, already-voted {votes['already_voted_answers']}/{votes['expected_duplicates']}"
+          + (f", MISMATCHED {votes['mismatched_posts']}" if votes["mismatched_posts"] else ""))
+    for key, label in (("failover_kill", "crash"), ("failover_term", "shutdown")):
+        if key in r:
+            f = r[key]
+            print(f"failover     {label:<8} {f['from']} -> {f['to']} in {f['seconds']:.2f}s, same link reposted {f['reposted_same_link']}x, new link posted {f['new_link_posts']}x")
+    print(f"state        {r['state_dir']}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Run several bot replicas against local stand-ins and check coordination")
+    parser.add_argument("--replicas", type=int, default=3)
+    parser.add_argument("--lease-ttl", type=float, default=3, help="LEADER_LEASE_TTL for the replicas (s)")
+    parser.add_argument("--sync-interval", type=float, default=0.5, help="STATE_SYNC_INTERVAL for the replicas (s)")
+    parser.add_argument("--cycles", type=int, default=3, help="/runnow cycles with a new link")
+    parser.add_argument("--votes", type=int, default=600, help="vote clicks spread over the replicas")
+    parser.add_argument("--vote-posts", type=int, default=5)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.01, help="source site latency (s)")
+    parser.add_argument("--bot-latency", type=float, default=0.0, help="fake Bot API latency (s)")
+    parser.add_argument("--grace", type=float, default=1.0, help="wait after a post for duplicates (s)")
+    parser.add_argument("--timeout", type=float, default=10)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+# Cold start benchmark, fully offline. Measures:
+#   import  - `import bot` in a fresh interpreter, and which heavy optional
+#             modules (bs4, lxml, ...) got imported eagerly anyway
+#   startup - `python bot.py` against FakeBotAPI (standins.py): time from
+#             process launch until /health answers, until the bot starts
+#             receiving updates (first getUpdates / setWebhook) and until
+#             /ready turns 200, plus how long SIGTERM takes to exit
+# Medians over --runs. /ready must never answer 200 before updates flow.
+#
+#   python benchmarks/bench_startup.py
+#   python benchmarks/bench_startup.py --runs 10 --mode webhook --bot-latency 0.3 --json
+import argparse
+import asyncio
+import json
+import os
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from aiohttp import ClientSession, ClientTimeout
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+from standins import SourceSite, FakeBotAPI, base_env
+
+LAZY_MODULES = ("bs4", "lxml", "selectolax")
+IMPORT_PROBE = (
+    "import sys, time, json\n"
+    "start = time.perf_counter()\n"
+    "import bot\n"
+    "elapsed = time.perf_counter() - start\n"
+    f"print(json.dumps({{'import_s': elapsed, 'eager': [m for m in {LAZY_MODULES!r} if m in sys.modules]}}))\n"
+)
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def bot_env(state_dir, port, bot_api=None, site=None, webhook=False):
+    env = dict(os.environ, **base_env(state_dir, PORT=port, PYTHONPATH=REPO_DIR))
+    if bot_api is not None:
+        env["TELEGRAM_BASE_URL"] = bot_api.base_url + "/bot"
+    if site is not None:
+        env["MAIN_URL"] = site.main_url
+    if webhook:
+        env.update({"WEBHOOK_URL": f"http://127.0.0.1:{port}", "WEBHOOK_SECRET": "bench-secret"})
+    else:
+        env.pop("WEBHOOK_URL", None)
+    return env
+
+def measure_import(state_dir, runs):
+    env = bot_env(state_dir, free_port())
+    samples, eager = [], set()
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, "-c", IMPORT_PROBE], env=env, cwd=state_dir,
+                             capture_output=True, text=True, check=True)
+        result = json.loads(out.stdout.strip().splitlines()[-1])
+        samples.append(result["import_s"])
+        eager.update(result["eager"])
+    return {"median_ms": statistics.median(samples) * 1000, "min_ms": min(samples) * 1000, "eager_modules": sorted(eager)}
+
+async def poll(session, url):
+    try:
+        async with session.get(url) as resp:
+            return resp.status
+    except Exception:
+        return None
+
+async def one_start(args, state_dir, bot_api, site):
+    port = free_port()
+    env = bot_env(state_dir, port, bot_api, site, webhook=args.mode == "webhook")
+    log = open(os.path.join(state_dir, "stdout.log"), "ab")
+    bot_api.calls.clear()
+    start = time.monotonic()
+    proc = subprocess.Popen([sys.executable, os.path.join(REPO_DIR, "bot.py")], env=env, cwd=state_dir,
+                            stdout=log, stderr=subprocess.STDOUT)
+    marks = {}
+    ready_before_updates = False
+    base = f"http://127.0.0.1:{port}"
+    async with ClientSession(timeout=ClientTimeout(total=1)) as session:
+        try:
+            while "ready" not in marks:
+                if proc.poll() is not None:
+                    raise RuntimeError(f"bot.py exited with {proc.returncode}, see {log.name}")
+                if time.monotonic() - start > args.timeout:
+                    raise RuntimeError(f"not ready after {args.timeout}s, see {log.name}")
+                now = time.monotonic()
+                if "health" not in marks and await poll(session, base + "/health") == 200:
+                    marks["health"] = now - start
+                if "health" in marks and await poll(session, base + "/ready") == 200:
+                    marks["ready"] = now - start
+                    ready_before_updates = not any(method in ("getUpdates", "setWebhook") for _, method, _ in bot_api.calls)
+                await asyncio.sleep(0.005)
+            updates = [at for at, method, _ in bot_api.calls if method in ("getUpdates", "setWebhook")]
+            marks["updates"] = updates[0] - start
+            stop_start = time.monotonic()
+            proc.send_signal(signal.SIGTERM)
+            while proc.poll() is None and time.monotonic() - stop_start < args.timeout:
+                await asyncio.sleep(0.01)
+            marks["shutdown"] = time.monotonic() - stop_start
+        finally:
+            if proc.poll() is None:
+                proc.kill()
+                proc.wait()
+            log.close()
+    marks["ready_before_updates"] = ready_before_updates
+    return marks
+
+async def measure_startup(args, state_dir):
+    bot_api = await FakeBotAPI(latency=args.bot_latency).start()
+    site = await SourceSite().start()
+    runs = []
+    try:
+        for _ in range(args.runs):
+            runs.append(await one_start(args, state_dir, bot_api, site))
+    finally:
+        await site.stop()
+        await bot_api.stop()
+    result = {key: statistics.median(run[key] for run in runs) * 1000 for key in ("health", "updates", "ready", "shutdown")}
+    result["ready_before_updates"] = sum(run["ready_before_updates"] for run in runs)
+    return {f"{key}_ms" if key != "ready_before_updates" else key: value for key, value in result.items()}
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark bot import time and time to ready")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--mode", choices=("polling", "webhook"), default="polling")
+    parser.add_argument("--bot-latency", type=float, default=0.02, help="fake Bot API latency (s)")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    state_dir = tempfile.mkdtemp(prefix="bench_startup_")
+    results = {
+        "benchmark": "startup",
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "params": {key: value for key, value in vars(args).items() if key != "json"},
+        "results": {"import": measure_import(state_dir, args.runs), "startup": asyncio.run(measure_startup(args, state_dir))},
+    }
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    i, s = results["results"]["import"], results["results"]["startup"]
+    print(f"import   median {i['median_ms']:.0f} ms (min {i['min_ms']:.0f} ms)  eager optional modules: {', '.join(i['eager_modules']) or 'none'}")
+    print(f"startup  ({args.mode}, median of {args.runs})  /health {s['health_ms']:.0f} ms  updates {s['updates_ms']:.0f} ms  "
+          f"/ready {s['ready_ms']:.0f} ms  shutdown {s['shutdown_ms']:.0f} ms")
+    print(f"readiness  /ready answered 200 before updates flowed in {s['ready_before_updates']}/{args.runs} runs")
+
+if __name__ == "__main__":
+    main()
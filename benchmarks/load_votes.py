@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+# Vote callback load generator: synthesizes callback-query updates from many
+# users across many posts and feeds them through the real Application handlers
+# (bot.build_application) against the fake Bot API from standins.py. Reports
+# callbacks/s, handler latency, Bot API calls (edits, answers) and memory per
+# tracked message. Fully offline.
+#
+#   python benchmarks/load_votes.py
+#   python benchmarks/load_votes.py --callbacks 50000 --messages 200 --users 20000 --concurrency 8
+#   python benchmarks/load_votes.py --bot-latency 0.05 --flood-rate 0.01 --json
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+from standins import FakeBotAPI, base_env
+
+CHAT_ID = -1001234567890
+
+def configure_env(bot_api, state_dir):
+    os.environ.update(base_env(
+        state_dir, CHANNEL_ID=CHAT_ID, TELEGRAM_BASE_URL=bot_api.base_url + "/bot",
+        LINK_CHECK_INTERVAL=0,  # "not working" votes would probe the (fake) links
+    ))
+
+def callback_update(update_id, user_id, message_id, action, emoji_pair, link, chat_id=CHAT_ID):
+    good, bad = emoji_pair
+    return {
+        "update_id": update_id,
+        "callback_query": {
+            "id": str(update_id),
+            "chat_instance": "load-test",
+            "from": {"id": user_id, "is_bot": False, "first_name": f"user{user_id}"},
+            "data": f"{action}|{good}|{bad}",
+            "message": {
+                "message_id": message_id,
+                "date": int(time.time()),
+                "chat": {"id": chat_id, "type": "channel", "title": "load test"},
+                "text": f"{good} New Canva Pro Team Link:\n{link}\n",
+            },
+        },
+    }
+
+def percentile(values, pct):
+    if not values:
+        return None
+    return values[min(len(values) - 1, int(round((len(values) - 1) * pct / 100)))]
+
+async def run(args):
+    rng = random.Random(args.seed)
+    state_dir = tempfile.mkdtemp(prefix="load_votes_")
+    bot_api = await FakeBotAPI(latency=args.bot_latency, flood_rate=args.flood_rate, seed=args.seed).start()
+    configure_env(bot_api, state_dir)
+
+    import bot as bot_module
+    if not args.verbose:
+        logging.getLogger().setLevel(logging.CRITICAL)
+    from telegram import Update
+    from shared import EMOJI_PAIRS, index_message
+    from vote_store import vote_store
+    from edit_queue import edit_queue
+
+    app = bot_module.build_application()
+    await app.initialize()
+    vote_store.open()
+    flusher = asyncio.create_task(vote_store.run_flusher())
+
+    # Posts as the bot would have created them
+    if args.tracemalloc:
+        tracemalloc.start()
+    posts = []
+    for i in range(args.messages):
+        message_id = 10000 + i
+        emoji_pair = rng.choice(EMOJI_PAIRS)
+        link = f"https://www.canva.com/brand/join?token=LOAD{i}"
+        vote_store.create(CHAT_ID, message_id, emoji_pair)
+        index_message(CHAT_ID, message_id, link, emoji_pair)
+        posts.append((message_id, emoji_pair, link))
+
+    # Newest posts draw most of the clicks
+    weights = [1 / (rank + 1) for rank in range(len(posts))]
+    updates = []
+    for update_id in range(1, args.callbacks + 1):
+        message_id, emoji_pair, link = rng.choices(posts, weights)[0]
+        action = "vote_not_working" if rng.random() < args.not_working_ratio else "vote_working"
+        data = callback_update(update_id, rng.randint(1, args.users), message_id, action, emoji_pair, link)
+        updates.append(Update.de_json(data, app.bot))
+
+    latencies = []
+    errors = 0
+    queue = asyncio.Queue()
+    for update in updates:
+        queue.put_nowait(update)
+
+    async def worker():
+        nonlocal errors
+        while True:
+            try:
+                update = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            start = time.perf_counter()
+            try:
+                await app.process_update(update)
+            except Exception:
+                errors += 1
+            latencies.append(time.perf_counter() - start)
+
+    calls_before = dict(bot_api.requests)
+    wall_start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+    wall = time.perf_counter() - wall_start
+    # Let the coalesced edits go out before counting them
+    await asyncio.sleep(edit_queue.window + args.bot_latency + 0.5)
+    while edit_queue._tasks:
+        await asyncio.sleep(0.1)
+
+    tracked_memory = None
+    if args.tracemalloc:
+        # Live allocations made by the per-message structures (vote entries,
+        # voter sets, LRU, message index), not by the harness itself
+        snapshot = tracemalloc.take_snapshot().filter_traces([
+            tracemalloc.Filter(True, "*vote_store.py"),
+            tracemalloc.Filter(True, "*shared.py"),
+        ])
+        tracked_memory = sum(stat.size for stat in snapshot.statistics("filename")) / max(1, args.messages)
+        tracemalloc.stop()
+
+    flusher.cancel()
+    for task in asyncio.all_tasks():
+        if task is not asyncio.current_task() and not task.done():
+            task.cancel()  # pending not-working corrections etc.
+    await vote_store.close()
+    await app.shutdown()
+    await bot_api.stop()
+
+    calls = {method: count - calls_before.get(method, 0) for method, count in bot_api.requests.items() if count - calls_before.get(method, 0)}
+    latencies.sort()
+    return {
+        "benchmark": "vote_callbacks",
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "params": {key: value for key, value in vars(args).items() if key not in ("json", "output", "verbose")},
+        "callbacks": len(latencies),
+        "errors": errors,
+        "wall_s": wall,
+        "callbacks_per_s": len(latencies) / wall if wall else None,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "max_ms": latencies[-1] * 1000,
+        "edit_calls": calls.get("editMessageReplyMarkup", 0),
+        "edits_per_message": calls.get("editMessageReplyMarkup", 0) / args.messages,
+        "bot_api_calls": calls,
+        "edit_queue": dict(edit_queue.stats),
+        "bytes_per_message": tracked_memory,
+        "peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test vote callbacks through the real handlers")
+    parser.add_argument("--callbacks", type=int, default=10000)
+    parser.add_argument("--messages", type=int, default=50, help="posts receiving votes")
+    parser.add_argument("--users", type=int, default=5000, help="distinct voters (repeats become 'already voted')")
+    parser.add_argument("--not-working-ratio", type=float, default=0.1)
+    parser.add_argument("--concurrency", type=int, default=1, help="updates processed at once (1 = like run_polling's default)")
+    parser.add_argument("--bot-latency", type=float, default=0.0, help="fake Bot API latency (s)")
+    parser.add_argument("--flood-rate", type=float, default=0.0, help="fraction of Bot API calls answered with 429")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--tracemalloc", action="store_true", help="measure bytes per tracked message (slower)")
+    parser.add_argument("--json", action="store_true")
+    parser.add_argument("--output", help="write the JSON results to this file")
+    parser.add_argument("--verbose", action="store_true", help="keep the bot's own logging")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{results['callbacks']} callbacks on {args.messages} messages from {args.users} users, concurrency {args.concurrency}")
+    print(f"throughput   {results['callbacks_per_s']:.0f} callbacks/s ({results['errors']} errors)")
+    print(f"latency      p50 {results['p50_ms']:.2f} ms, p99 {results['p99_ms']:.2f} ms, max {results['max_ms']:.2f} ms")
+    print(f"edits        {results['edit_calls']} editMessageReplyMarkup ({results['edits_per_message']:.1f}/message), queue {results['edit_queue']}")
+    print(f"bot api      {results['bot_api_calls']}")
+    if results["bytes_per_message"] is not None:
+        print(f"memory       {results['bytes_per_message'] / 1024:.1f} KiB per tracked message")
+    print(f"peak RSS     {results['peak_rss_kb'] / 1024:.1f} MiB")
+
+if __name__ == "__main__":
+    main()
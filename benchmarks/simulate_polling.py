@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+# Replays a timeline of source link changes through the real auto_posting_task
+# on a virtual clock (a simulated week runs in seconds) and reports detection
+# latency against scrape cost for each polling policy.
+#
+#   python benchmarks/simulate_polling.py --days 7 --changes-per-day 3
+#   python benchmarks/simulate_polling.py --timeline link_changes.json --policies uniform adaptive --json
+#   python benchmarks/simulate_polling.py --interval 300 900 --mode scrapedo
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+from standins import base_env
+
+# The bot modules read their configuration at import time
+for key, value in base_env(tempfile.mkdtemp(prefix="simulate_polling_"), CHANNEL_ID="@simulation").items():
+    os.environ.setdefault(key, value)
+
+import logging
+
+import auto_posting
+import registry
+from link_history import link_history
+from polling_policy import POLICIES
+from scheduler import AutoPostScheduler
+
+DAY = 86400
+
+# --- Virtual clock ---
+# The selector never blocks: when nothing is ready it jumps the loop clock
+# forward by the requested timeout instead of waiting for it.
+class _VirtualSelector:
+    def __init__(self, selector, loop):
+        self._selector = selector
+        self._loop = loop
+
+    def select(self, timeout=None):
+        events = self._selector.select(0)
+        if not events and timeout is not None and timeout > 0:
+            self._loop.virtual_now += timeout
+        return events
+
+    def __getattr__(self, name):
+        return getattr(self._selector, name)
+
+class VirtualClockLoop(asyncio.SelectorEventLoop):
+    def __init__(self):
+        super().__init__()
+        self.virtual_now = 0.0
+        self._selector = _VirtualSelector(self._selector, self)
+
+    def time(self):
+        return self.virtual_now
+
+# --- Stand-ins for the scraper and the Bot API ---
+class Timeline:
+    def __init__(self, changes):
+        self.changes = sorted(changes)  # unix timestamps at which the source link changed
+
+    def link_at(self, ts):
+        # Link index = number of changes so far (sim0 is the link live at the start)
+        lo, hi = 0, len(self.changes)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.changes[mid] <= ts:
+                lo = mid + 1
+            else:
+                hi = mid
+        return f"https://www.canva.com/brand/join?token=sim{lo}"
+
+class StubMessage:
+    def __init__(self, message_id, chat_id):
+        self.message_id = message_id
+        self.chat_id = chat_id
+
+class StubBot:
+    def __init__(self, clock):
+        self.clock = clock
+        self.posts = []  # (time, link)
+        self._next_id = 1
+
+    async def send_message(self, chat_id, text, **kwargs):
+        link = text.split("<a href='", 1)[1].split("'", 1)[0]
+        self.posts.append((self.clock(), link))
+        self._next_id += 1
+        return StubMessage(self._next_id, chat_id)
+
+    async def edit_message_reply_markup(self, **kwargs):
+        pass
+
+def synthetic_timeline(days, changes_per_day, start, seed, hours=None, spread=1800):
+    # Changes cluster around a few hours of the day (like a human updating the
+    # source page), each with some jitter; a few land at random times
+    rng = random.Random(seed)
+    hours = hours or sorted(rng.sample(range(24), changes_per_day))
+    changes = []
+    for day in range(days):
+        for hour in hours:
+            if rng.random() < 0.85:
+                changes.append(start + day * DAY + hour * 3600 + rng.gauss(0, spread))
+            else:
+                changes.append(start + day * DAY + rng.uniform(0, DAY))
+    return sorted(c for c in changes if start <= c < start + days * DAY)
+
+def percentile(values, pct):
+    if not values:
+        return None
+    values = sorted(values)
+    k = (len(values) - 1) * pct / 100
+    f = int(k)
+    c = min(f + 1, len(values) - 1)
+    return values[f] + (values[c] - values[f]) * (k - f)
+
+def run_policy(policy_name, timeline, start, duration, interval, mode, warmup):
+    loop = VirtualClockLoop()
+    asyncio.set_event_loop(loop)
+    clock = lambda: start + loop.time()
+    scrapes = []
+
+    async def fake_scrape_sources():
+        scrapes.append(clock())
+        return {registry.default_source().name: timeline.link_at(clock())}
+
+    policy = POLICIES[policy_name]()
+    if hasattr(policy, "path"):
+        policy.path = None
+    auto_posting.scrape_sources = fake_scrape_sources
+    channel = registry.channels[0]
+    link_history.clear(channel.chat_id)
+    channel.remember(timeline.link_at(start))
+    channel.limiter = registry.ChatRateLimiter()  # its clock belonged to the previous run's loop
+    auto_posting.auto_post_min, auto_posting.auto_post_max = interval
+    auto_posting.scheduler = AutoPostScheduler(interval[0], interval[1], state_path=None, clock=clock, policy=policy)
+    bot = StubBot(clock)
+
+    async def main():
+        task = asyncio.create_task(auto_posting.auto_posting_task(bot))
+        await asyncio.sleep(duration)
+        task.cancel()
+
+    wall = time.perf_counter()
+    try:
+        loop.run_until_complete(main())
+    finally:
+        asyncio.set_event_loop(None)
+        loop.close()
+    wall = time.perf_counter() - wall
+
+    # Detection latency per change: first post of that change's link
+    posted_at = {}
+    for ts, link in bot.posts:
+        posted_at.setdefault(link, ts)
+    measured_from = start + warmup
+    latencies, missed = [], 0
+    for change in timeline.changes:
+        if not measured_from <= change < start + duration:
+            continue
+        link = timeline.link_at(change)
+        if link in posted_at:
+            latencies.append(posted_at[link] - change)
+        else:
+            missed += 1
+    measured_scrapes = [s for s in scrapes if s >= measured_from]
+    # Scrape.do credits: one main-page request per poll, plus one redirect
+    # request whenever the link is new (known redirects come from the memo)
+    credits = 0
+    if mode in ("scrapedo", "both"):
+        credits = len(measured_scrapes) + len(latencies)
+    measured_days = (duration - warmup) / DAY
+    return {
+        "policy": policy_name,
+        "changes": len(latencies) + missed,
+        "detected": len(latencies),
+        "missed": missed,
+        "median_latency_s": statistics.median(latencies) if latencies else None,
+        "p95_latency_s": percentile(latencies, 95),
+        "scrapes": len(measured_scrapes),
+        "scrapes_per_day": len(measured_scrapes) / measured_days if measured_days else None,
+        "scrapedo_credits": credits,
+        "wall_time_s": wall,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare auto-post polling policies on a replayed timeline")
+    parser.add_argument("--timeline", help="JSON list of change timestamps (e.g. the CHANGE_HISTORY_PATH file)")
+    parser.add_argument("--days", type=float, default=7, help="length of a synthetic timeline")
+    parser.add_argument("--changes-per-day", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--interval", type=int, nargs=2, default=[900, 1800], metavar=("MIN", "MAX"))
+    parser.add_argument("--policies", nargs="+", default=sorted(POLICIES), choices=sorted(POLICIES))
+    parser.add_argument("--mode", choices=("direct", "scrapedo", "both"), default="scrapedo", help="scraping mode used for credit accounting")
+    parser.add_argument("--warmup-days", type=float, default=2, help="leading days excluded from the stats (learning period)")
+    parser.add_argument("--json", action="store_true", help="print machine-readable results")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    if args.timeline:
+        with open(args.timeline) as f:
+            changes = sorted(json.load(f))
+        start = changes[0] - DAY * min(args.warmup_days, 1)
+        duration = changes[-1] - start + 3600
+    else:
+        start = int(time.time()) // DAY * DAY - int(args.days * DAY)
+        duration = args.days * DAY
+        changes = synthetic_timeline(int(args.days), args.changes_per_day, start, args.seed)
+    timeline = Timeline(changes)
+    warmup = min(args.warmup_days * DAY, duration / 2)
+
+    results = [run_policy(name, timeline, start, duration, tuple(args.interval), args.mode, warmup) for name in args.policies]
+    if args.json:
+        print(json.dumps({"interval": args.interval, "mode": args.mode, "days": duration / DAY, "results": results}, indent=2))
+        return
+    print(f"timeline: {len(changes)} changes over {duration / DAY:.1f} days, interval {args.interval[0]}-{args.interval[1]}s, mode {args.mode}")
+    print(f"{'policy':<10}{'detected':>10}{'median s':>10}{'p95 s':>10}{'scrapes':>9}{'/day':>7}{'credits':>9}{'wall s':>8}")
+    for r in results:
+        median = f"{r['median_latency_s']:.0f}" if r["median_latency_s"] is not None else "-"
+        p95 = f"{r['p95_latency_s']:.0f}" if r["p95_latency_s"] is not None else "-"
+        print(f"{r['policy']:<10}{r['detected']:>6}/{r['changes']:<3}{median:>10}{p95:>10}{r['scrapes']:>9}{r['scrapes_per_day']:>7.0f}{r['scrapedo_credits']:>9}{r['wall_time_s']:>8.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,379 @@
+# Local stand-ins for the services the bot talks to, so benchmarks run offline:
+#   SourceSite    - MAIN_URL and its redirect pages, built from the saved fixtures
+#   FakeScrapeDo  - api.scrape.do: fetches the requested URL from the SourceSite
+#   CanvaSite     - Canva join links that are valid, expired, gone or erroring
+#   FakeBotAPI    - Telegram Bot API (point ApplicationBuilder.base_url / TELEGRAM_BASE_URL at it)
+# Each one has configurable latency, jitter and error rate and counts its requests.
+# FakeBotAPI.deliver() hands an update to the bot the way Telegram would: POSTed
+# to the registered webhook (with its secret token) or returned by getUpdates.
+import asyncio
+import base64
+import json
+import os
+import random
+import time
+from collections import Counter, defaultdict
+
+from aiohttp import ClientSession, web
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+MAIN_PATH = "/best-social-media-platforms/"
+FIXTURE_REDIRECT_HREF = "https://bingotingo.com/go/canva-team-7f3a9c/"
+FIXTURE_CANVA_TOKEN = "Qk9HVVNfVE9LRU5fRk9SX0JFTkNI"
+
+# --- Bot environment ---
+# config.py reads the environment at import time, so a benchmark builds it
+# with base_env() before it imports any bot module (or passes it to bot.py in
+# a subprocess). State files go to state_dir, nothing outside the stand-ins
+# is configured, and each benchmark only passes its own settings as overrides.
+def base_env(state_dir, **overrides):
+    env = {
+        "BOT_TOKEN": "123456:BENCHMARK", "CHANNEL_ID": "-1001234567890", "ADMIN_GROUP_ID": "1", "BOT_ADMIN_ID": "1",
+        "SCRAPEDO_TOKENS": "", "STATE_BACKEND_URL": "", "SOURCES_CONFIG": "",
+        "SCHEDULER_STATE_PATH": "", "CHANGE_HISTORY_PATH": "", "LINK_HISTORY_PATH": "",
+        "TOKEN_POOL_STATE_PATH": os.path.join(state_dir, "token_pool.json"),
+        "VOTE_DB_PATH": os.path.join(state_dir, "votes.db"),
+        "LOG_PATH": os.path.join(state_dir, "bot.log"),
+        "IMPORTANT_LOG_PATH": os.path.join(state_dir, "important.log"),
+    }
+    env.update({key: str(value) for key, value in overrides.items()})
+    return env
+
+def _read_fixture(name):
+    with open(os.path.join(FIXTURES_DIR, name), encoding="utf-8") as f:
+        return f.read()
+
+class _StandIn:
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rng = random.Random(seed)
+        self.requests = Counter()
+        self.base_url = None
+        self._runner = None
+
+    async def _delay(self):
+        delay = self.latency + (self.rng.uniform(0, self.jitter) if self.jitter else 0)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def _fail(self):
+        return self.error_rate > 0 and self.rng.random() < self.error_rate
+
+    def make_app(self):
+        raise NotImplementedError
+
+    async def start(self, host="127.0.0.1", port=0):
+        self._runner = web.AppRunner(self.make_app(), access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.base_url = f"http://{host}:{port}"
+        return self
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+class SourceSite(_StandIn):
+    # The link changes with every rotate(): the main page points at a new
+    # redirect page, which carries a new Canva token. ETag follows the
+    # generation, so conditional requests get 304 while nothing changed.
+    # reissue() replaces only the invite behind the current redirect page.
+    # `tag` keeps the tokens of several sites apart.
+    def __init__(self, tag="", **kwargs):
+        super().__init__(**kwargs)
+        self.tag = tag
+        self.generation = 0
+        self.reissued = 0
+        self._main_html = _read_fixture("main_page.html")
+        self._redirect_html = _read_fixture("redirect_page.html")
+
+    def rotate(self):
+        self.generation += 1
+
+    def reissue(self):
+        # Same main page (and ETag), same redirect page URL, new Canva token
+        self.reissued += 1
+
+    @property
+    def main_url(self):
+        return self.base_url + MAIN_PATH
+
+    def redirect_url(self, generation=None):
+        return f"{self.base_url}/go/canva-team-{self.generation if generation is None else generation}/"
+
+    def canva_token(self, generation=None):
+        generation = self.generation if generation is None else generation
+        reissued = f"R{self.reissued}" if self.reissued else ""
+        return base64.urlsafe_b64encode(f"BENCH_TOKEN_{self.tag}{generation}{reissued}".encode()).decode().rstrip("=")
+
+    def canva_link(self, generation=None):
+        return f"https://www.canva.com/brand/join?token={self.canva_token(generation)}&referrer=team-invite"
+
+    async def main_page(self, request):
+        self.requests["main"] += 1
+        await self._delay()
+        if self._fail():
+            self.requests["main_error"] += 1
+            return web.Response(status=503, text="Service Unavailable")
+        etag = f'"gen-{self.generation}"'
+        if request.headers.get("If-None-Match") == etag:
+            self.requests["main_304"] += 1
+            return web.Response(status=304, headers={"ETag": etag})
+        body = self._main_html.replace(FIXTURE_REDIRECT_HREF, self.redirect_url())
+        return web.Response(text=body, content_type="text/html", headers={"ETag": etag})
+
+    async def redirect_page(self, request):
+        self.requests["redirect"] += 1
+        await self._delay()
+        if self._fail():
+            self.requests["redirect_error"] += 1
+            return web.Response(status=503, text="Service Unavailable")
+        generation = int(request.match_info["generation"])
+        body = self._redirect_html.replace(FIXTURE_CANVA_TOKEN, self.canva_token(generation))
+        return web.Response(text=body, content_type="text/html")
+
+    def make_app(self):
+        app = web.Application()
+        app.router.add_get(MAIN_PATH, self.main_page)
+        app.router.add_get("/go/canva-team-{generation:\\d+}/", self.redirect_page)
+        return app
+
+class FakeScrapeDo(_StandIn):
+    # GET /?token=...&url=... fetches `url` itself and relays status and body,
+    # adding the remaining-credits header the token pool reads
+    def __init__(self, tokens, credits=100000, **kwargs):
+        super().__init__(**kwargs)
+        self.credits = {token: credits for token in tokens}
+        self._session = None
+
+    async def proxy(self, request):
+        self.requests["total"] += 1
+        token = request.query.get("token")
+        if token not in self.credits:
+            self.requests["unauthorized"] += 1
+            return web.Response(status=401, text="Unauthorized")
+        await self._delay()
+        if self._fail():
+            self.requests["error"] += 1
+            return web.Response(status=502, text="Bad Gateway")
+        if self.credits[token] <= 0:
+            return web.Response(status=429, text="No credits", headers={"Scrape.do-Remaining-Credits": "0"})
+        self.credits[token] -= 1
+        if self._session is None:
+            self._session = ClientSession()
+        async with self._session.get(request.query["url"]) as resp:
+            body = await resp.read()
+            status = resp.status
+        return web.Response(body=body, status=status, content_type="text/html",
+                            headers={"Scrape.do-Remaining-Credits": str(self.credits[token])})
+
+    def make_app(self):
+        app = web.Application()
+        app.router.add_get("/", self.proxy)
+        return app
+
+    async def stop(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+        await super().stop()
+
+CANVA_JOIN_PAGE = "<html><head><title>Join team on Canva</title></head><body><h1>You've been invited to join a team</h1>"
+CANVA_EXPIRED_PAGE = "<html><head><title>Canva</title></head><body><h1>This invite link has expired</h1><p>Ask the team owner for a new link.</p>"
+CANVA_FILLER = "<script>/* app bundle */" + "x" * (200 * 1024) + "</script></body></html>"
+
+class CanvaSite(_StandIn):
+    # /brand/join?token=... answers by the token's state: valid (join page),
+    # expired (200 with an "expired" notice, like a real expired invite), gone
+    # (404) or error (503). Pages carry a large script so a probe that reads
+    # the whole body shows up. Tracks the peak number of concurrent requests.
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.tokens = {}  # token: state
+        self.in_flight = 0
+        self.peak_in_flight = 0
+
+    def add(self, token, state="valid"):
+        self.tokens[token] = state
+        return self.link(token)
+
+    def link(self, token):
+        return f"{self.base_url}/brand/join?token={token}"
+
+    async def join(self, request):
+        state = self.tokens.get(request.query.get("token", ""), "gone")
+        self.requests[state] += 1
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        try:
+            await self._delay()
+        finally:
+            self.in_flight -= 1
+        if state == "error" or self._fail():
+            return web.Response(status=503, text="Service Unavailable")
+        if state == "gone":
+            return web.Response(status=404, text="Not Found")
+        page = CANVA_EXPIRED_PAGE if state == "expired" else CANVA_JOIN_PAGE
+        return web.Response(text=page + CANVA_FILLER, content_type="text/html")
+
+    def make_app(self):
+        app = web.Application()
+        app.router.add_get("/brand/join", self.join)
+        return app
+
+class FakeBotAPI(_StandIn):
+    # Minimal Bot API: answers the methods the bot uses with well-formed
+    # results and can inject flood control (429 with retry_after)
+    def __init__(self, flood_rate=0.0, retry_after=1, **kwargs):
+        super().__init__(**kwargs)
+        self.flood_rate = flood_rate
+        self.retry_after = retry_after
+        self.calls = []  # (monotonic time, method, params)
+        self._next_message_ids = defaultdict(lambda: 1000)  # message ids are per chat, like Telegram's
+        self._chat_ids = {}  # "@username" -> made-up numeric id
+        self._waiters = []
+        self.webhook_url = None
+        self.webhook_secret = None
+        self.webhook_statuses = Counter()
+        self._pending_updates = []
+        self._updates_ready = asyncio.Event()
+        self._session = None
+
+    async def deliver(self, update):
+        if self.webhook_url:
+            if self._session is None:
+                self._session = ClientSession()
+            headers = {"X-Telegram-Bot-Api-Secret-Token": self.webhook_secret} if self.webhook_secret else {}
+            async with self._session.post(self.webhook_url, json=update, headers=headers) as resp:
+                self.webhook_statuses[resp.status] += 1
+                return resp.status
+        self._pending_updates.append(update)
+        self._updates_ready.set()
+        return None
+
+    async def _get_updates(self, params):
+        offset = int(params.get("offset", 0) or 0)
+        self._pending_updates = [u for u in self._pending_updates if u["update_id"] >= offset]
+        if not self._pending_updates:
+            self._updates_ready.clear()
+            try:
+                await asyncio.wait_for(self._updates_ready.wait(), timeout=float(params.get("timeout", 0) or 0))
+            except asyncio.TimeoutError:
+                pass
+        return self._pending_updates[:int(params.get("limit", 100) or 100)]
+
+    def count(self, method):
+        return self.requests[method]
+
+    async def wait_for(self, method, count, timeout=30):
+        # Waits until `method` has been called `count` times in total
+        deadline = time.monotonic() + timeout
+        while self.requests[method] < count:
+            if time.monotonic() > deadline:
+                raise asyncio.TimeoutError(f"{method} called {self.requests[method]}/{count} times")
+            event = asyncio.Event()
+            self._waiters.append(event)
+            try:
+                await asyncio.wait_for(event.wait(), timeout=max(0.0, deadline - time.monotonic()))
+            except asyncio.TimeoutError:
+                pass
+
+    def chat_id(self, chat_id):
+        # Numeric ids are used as given, usernames get a stable made-up id
+        try:
+            return int(chat_id)
+        except (TypeError, ValueError):
+            return self._chat_ids.setdefault(chat_id, -1002000000000 - len(self._chat_ids))
+
+    def _message(self, chat_id, text=None, reply_markup=None, message_id=None):
+        chat_id = self.chat_id(chat_id)
+        if message_id is None:
+            self._next_message_ids[chat_id] += 1
+            message_id = self._next_message_ids[chat_id]
+        message = {
+            "message_id": message_id,
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "channel", "title": str(chat_id)},
+        }
+        if text is not None:
+            message["text"] = text
+        if reply_markup:
+            message["reply_markup"] = json.loads(reply_markup) if isinstance(reply_markup, str) else reply_markup
+        return message
+
+    async def handle(self, request):
+        method = request.match_info["method"]
+        if request.content_type == "application/json":
+            params = await request.json()
+        else:
+            params = dict(await request.post())
+        self.requests[method] += 1
+        self.calls.append((time.monotonic(), method, params))
+        for event in self._waiters:
+            event.set()
+        self._waiters.clear()
+        await self._delay()
+        if self.flood_rate > 0 and method != "getUpdates" and self.rng.random() < self.flood_rate:
+            self.requests["flood"] += 1
+            return web.json_response({
+                "ok": False, "error_code": 429,
+                "description": f"Too Many Requests: retry after {self.retry_after}",
+                "parameters": {"retry_after": self.retry_after},
+            }, status=429)
+        if method == "getMe":
+            result = {"id": 1, "is_bot": True, "first_name": "Bench", "username": "bench_bot",
+                      "can_join_groups": True, "can_read_all_group_messages": False, "supports_inline_queries": False}
+        elif method == "sendMessage":
+            result = self._message(params.get("chat_id"), params.get("text"), params.get("reply_markup"))
+        elif method in ("editMessageReplyMarkup", "editMessageText"):
+            result = self._message(params.get("chat_id"), params.get("text"), params.get("reply_markup"),
+                                   message_id=int(params.get("message_id", 0)))
+        elif method == "getUpdates":
+            if self.webhook_url:
+                return web.json_response({"ok": False, "error_code": 409, "description": "Conflict: can't use getUpdates method while webhook is active"}, status=409)
+            result = await self._get_updates(params)
+        elif method == "setWebhook":
+            self.webhook_url = params.get("url")
+            self.webhook_secret = params.get("secret_token")
+            result = True
+        elif method == "deleteWebhook":
+            self.webhook_url = self.webhook_secret = None
+            result = True
+        else:
+            # answerCallbackQuery, deleteWebhook, setMyCommands, ...
+            result = True
+        return web.json_response({"ok": True, "result": result})
+
+    def make_app(self):
+        app = web.Application()
+        app.router.add_post("/bot{token}/{method}", self.handle)
+        return app
+
+    async def stop(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+        await super().stop()
+
+# --- Resetting the bot's scrape state between runs ---
+# The bot modules are imported inside: they read config at import time, so
+# only after the benchmark has set up its environment.
+def forget_recent_scrapes():
+    import registry
+    for source in registry.sources.values():
+        source.last_scrape = None
+
+def reset_scrape_state():
+    # Cold caches: no page validators, no memoized redirects, no recent results
+    import registry
+    import scrape_links
+    from scrape_cache import MainPageCache, RedirectMemo
+    for source in registry.sources.values():
+        source.page_cache = MainPageCache()
+    scrape_links.redirect_memo = RedirectMemo()
+    forget_recent_scrapes()
@@ -1,68 +1,41 @@
 #!/usr/bin/env python3
 import logging
-import sys
 import platform
 import random
 import os
 import asyncio
-from datetime import datetime, timedelta
-import secrets
-import json
+from datetime import timedelta
 import time
+import html
+import hmac
+import signal
 
-import pytz
 from aiohttp import web
-from telegram import Bot, Update
+from telegram import Update
 from telegram.ext import ApplicationBuilder, CommandHandler, ContextTypes, CallbackQueryHandler
 
-from scrape_links import get_latest_canva_link, set_scraping_mode, get_scraping_mode
-from config import BOT_TOKEN, CHANNEL_ID, BOT_ADMIN_ID, IMPORTANT_LOG_PATH
-from auto_posting import auto_posting_task, set_auto_post_interval
-from shared import vote_data, last_posted_link, format_canva_post_message, EMOJI_PAIRS
+from scrape_links import scrape_sources, set_scraping_mode, get_scraping_mode, init_http_session, close_http_session, prewarm_http_pool
+from token_pool import token_pool
+from config import BOT_TOKEN, CHANNEL_ID, BOT_ADMIN_ID, TELEGRAM_BASE_URL, WEBHOOK_URL, WEBHOOK_PATH, WEBHOOK_SECRET, PORT, STATE_BACKEND_URL, SCRAPE_DEADLINE
+from auto_posting import auto_posting_task, set_auto_post_interval, run_auto_post_now, record_link_change, restore_schedule, scheduler, post_link, fan_out
+from shared import queue_vote_edit, get_message_meta
+import registry
+from vote_store import vote_store
+from replicas import replicas
+from link_checker import link_checker
+from link_history import link_history
+from retry_policy import Deadline
 from strings import HELP_MSG, START_MSG, UNAUTHORIZED_MSG, USAGE_SETINTERVAL, INVALID_INTERVAL, ERROR_GENERIC, USAGE_SET_SCRAPE_MODE
-
-import aiohttp
-from bs4 import BeautifulSoup
-from admin_commands import lastlink, logs, health, restart
+from admin_commands import lastlink, logs, health, restart, profile, timings, looplag, linkstatus, checklink
+from profiling import loop_watchdog
+from log_setup import setup_logging, log_important
+import metrics
+from metrics import Gauge, InstrumentedRequest, observe_handler, VOTE_CALLBACK_SECONDS
 
 # --- Logging Setup ---
-logging.basicConfig(
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    level=logging.INFO,
-    handlers=[
-        logging.FileHandler("bot.log"),
-        logging.StreamHandler(sys.stdout)
-    ]
-)
+setup_logging()
 logger = logging.getLogger(__name__)
 
-# --- Truncate old logs on startup ---
-for log_file in ("bot.log", IMPORTANT_LOG_PATH):
-    try:
-        lines = open(log_file, "r").read().splitlines()
-        if len(lines) > 1000:
-            open(log_file, "w").write("\n".join(lines[-1000:]) + "\n")
-    except FileNotFoundError:
-        pass
-
-# --- Clean up voting data on startup ---
-def cleanup_vote_data(max_entries=200):
-    global vote_data
-    if len(vote_data) > max_entries:
-        # Keep only the most recent max_entries by message_id (assuming higher = newer)
-        sorted_ids = sorted(vote_data.keys(), reverse=True)
-        keep_ids = set(sorted_ids[:max_entries])
-        vote_data = {k: v for k, v in vote_data.items() if k in keep_ids}
-
-cleanup_vote_data()
-
-# --- Globals ---
-bot = Bot(token=BOT_TOKEN)
-
-def log_important(event: str):
-    with open(IMPORTANT_LOG_PATH, "a") as f:
-        f.write(event + "\n")
-
 # --- Navigation Keyboard Helper ---
 def get_help_keyboard():
     from telegram import InlineKeyboardMarkup, InlineKeyboardButton
@@ -107,11 +80,17 @@ async def help_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
         text = (
             "<b>🛠 Admin Commands</b>\n"
             "/post - Scrape & post the latest link\n"
-            "/now &lt;canva_link&gt; - Manually post a Canva link\n"
+            "/now &lt;canva_link&gt; [force] - Manually post a Canva link (force reposts where it was already posted)\n"
             "/setinterval &lt;min_seconds&gt; &lt;max_seconds&gt; - Set auto-post interval\n"
-            "/lastlink - Show the last posted Canva link\n"
+            "/runnow - Run the auto-poster check right away\n"
+            "/lastlink - Show the last posted Canva links per channel\n"
             "/logs - Show recent important logs\n"
             "/health - Check bot health\n"
+            "/profile [seconds] - Sample the event loop and show the hottest functions\n"
+            "/timings [n] - Per-stage timings of the last n scrapes\n"
+            "/looplag - Coroutines that blocked the event loop longest\n"
+            "/linkstatus - Liveness verdicts of recently posted links\n"
+            "/checklink [link] - Check the current (or given) link right now\n"
             "/restart - Restart the bot\n"
             "/setscrapemode &lt;code&gt;scrapedo&lt;/code&gt;|&lt;code&gt;direct&lt;/code&gt;|&lt;code&gt;both&lt;/code&gt; - Scraping methods.\n"
         )
@@ -131,14 +110,14 @@ async def help_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
         )
     elif query.data == "help_stats":
         from auto_posting import auto_post_min, auto_post_max
-        import platform, time, os
+        import platform, time
         text = (
             f"<b>📊 Bot Stats & Settings</b>\n"
             f"<b>Scraping Mode:</b> <code>{get_scraping_mode()}</code>\n"
             f"<b>Auto-post interval:</b> <code>{auto_post_min}-{auto_post_max} sec</code>\n"
             f"<b>Python version:</b> <code>{platform.python_version()}</code>\n"
             f"<b>Platform:</b> <code>{platform.system()} {platform.release()}</code>\n"
-            f"<b>Uptime:</b> <code>{int(time.time() - os.getpid())} sec (PID as start)</code>\n"
+            f"<b>Uptime:</b> <code>{timedelta(seconds=int(metrics.uptime()))}</code>\n"
             f"<b>Channel ID:</b> <code>{CHANNEL_ID}</code>\n"
             f"<b>Admin ID:</b> <code>{BOT_ADMIN_ID}</code>\n"
         )
@@ -151,6 +130,7 @@ async def help_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 # --- Voting Callback Handler ---
 import telegram
+@observe_handler(VOTE_CALLBACK_SECONDS)
 async def vote_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     logger.info("vote_callback triggered")
     query = getattr(update, 'callback_query', None)
@@ -168,13 +148,12 @@ async def vote_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     good_emoji = parts[1] if len(parts) > 1 else "🟢"
     bad_emoji = parts[2] if len(parts) > 2 else "🔴"
     emoji_pair = (good_emoji, bad_emoji)
-    # Initialize vote data if not present
-    if msg_id not in vote_data:
-        vote_data[msg_id] = {'working': 0, 'not_working': 0, 'voters': set(), 'emoji_pair': emoji_pair}
-    votes = vote_data[msg_id]
-    if 'emoji_pair' not in votes:
-        votes['emoji_pair'] = emoji_pair
-    if user_id in votes['voters']:
+    # Message ids are per chat, so posts are keyed by (chat_id, message_id)
+    chat_id = msg.chat_id
+    # Post-time data is indexed when posting; only older posts fall back to the text
+    meta = get_message_meta(chat_id, msg_id, getattr(msg, 'text', None), emoji_pair)
+    # Record the vote (initializes the post's vote data if not present)
+    if not await vote_store.vote(chat_id, msg_id, user_id, action, emoji_pair):
         try:
             await query.answer("You already voted on this link!", show_alert=True)
         except telegram.error.BadRequest as e:
@@ -184,8 +163,6 @@ async def vote_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 logger.error(f"[vote_callback] Unexpected error: {e}")
         return
     if action == "vote_working":
-        votes['working'] += 1
-        votes['voters'].add(user_id)
         try:
             await query.answer("Thanks for your feedback!", show_alert=False)
         except telegram.error.BadRequest as e:
@@ -194,8 +171,6 @@ async def vote_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
             else:
                 logger.error(f"[vote_callback] Unexpected error: {e}")
     elif action == "vote_not_working":
-        votes['not_working'] += 1
-        votes['voters'].add(user_id)
         try:
             await query.answer("We'll post a new link soon!", show_alert=True)
         except telegram.error.BadRequest as e:
@@ -207,121 +182,67 @@ async def vote_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
             await context.bot.send_message(chat_id=user_id, text="Thanks for reporting! Please wait for a new Canva link to be posted soon.")
         except Exception:
             pass
+        # Have the link checker look at it now rather than at its next sweep
+        if meta is not None and meta.link.startswith("http"):
+            link_checker.nudge(meta.link)
         # If not_working > working, schedule a correction
-        async def correct_not_working(msg_id, link, emoji_pair):
+        async def correct_not_working(msg_id):
             await asyncio.sleep(random.randint(120, 240))
-            if msg_id in vote_data:
-                votes = vote_data[msg_id]
-                if votes['not_working'] > votes['working']:
-                    votes['not_working'] = votes['working']
-                    msg, keyboard, _ = format_canva_post_message(link, working_votes=votes['working'], not_working_votes=votes['not_working'], emoji_pair=emoji_pair)
-                    try:
-                        await context.bot.edit_message_reply_markup(chat_id=CHANNEL_ID, message_id=msg_id, reply_markup=keyboard)
-                    except Exception:
-                        pass
-        canva_link = None
-        msg_text = getattr(msg, 'text', None)
-        if msg_text:
-            lines = msg_text.split('\n')
-            for line in lines:
-                if line.startswith('https://www.canva.com/'):
-                    canva_link = line.strip()
-                    break
-                if '<a href=' in line and 'canva.com' in line:
-                    import re
-                    m = re.search(r"<a href='([^']+canva.com[^']*)'", line)
-                    if m:
-                        canva_link = m.group(1)
-                        break
-            if not canva_link and len(lines) > 1:
-                canva_link = lines[1].strip()
-        asyncio.create_task(correct_not_working(msg_id, canva_link or "[link hidden]", emoji_pair))
-    # Extract the Canva link from the message text robustly
-    canva_link = None
-    msg_text = getattr(msg, 'text', None)
-    if msg_text:
-        lines = msg_text.split('\n')
-        for line in lines:
-            if line.startswith('https://www.canva.com/'):
-                canva_link = line.strip()
-                break
-            if '<a href=' in line and 'canva.com' in line:
-                import re
-                m = re.search(r"<a href='([^']+canva.com[^']*)'", line)
-                if m:
-                    canva_link = m.group(1)
-                    break
-        if not canva_link and len(lines) > 1:
-            canva_link = lines[1].strip()
-    formatted_msg, keyboard, _ = format_canva_post_message(
-        latest_link=canva_link or "[link hidden]",
-        working_votes=votes['working'],
-        not_working_votes=votes['not_working'],
-        emoji_pair=votes['emoji_pair']
-    )
-    try:
-        await query.edit_message_reply_markup(reply_markup=keyboard)
-    except Exception:
-        pass
+            votes = await vote_store.fetch(chat_id, msg_id)
+            if votes is not None:
+                if votes.not_working > votes.working:
+                    vote_store.set_counts(chat_id, msg_id, not_working=votes.working)
+                    queue_vote_edit(context.bot, chat_id, msg_id)
+        asyncio.create_task(correct_not_working(msg_id))
+    # Coalesced with other clicks on this message into one edit
+    queue_vote_edit(context.bot, chat_id, msg_id)
 
 # --- Patch posting logic to include voting ---
 async def post(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    global last_posted_link
     user = update.effective_user
     message = update.message
     if not (user and user.id == BOT_ADMIN_ID):
         if message and hasattr(message, 'reply_text'):
             return await message.reply_text("🚫 Unauthorized.")
         return
-    try_count = 0
-    max_tries = 3
-    latest = None
+    if message and hasattr(message, 'date'):
+        log_important(f"/post at {message.date}")
+    # Retries and backoff happen per request inside the scrape (retry_policy);
+    # the deadline bounds how long the admin waits for an answer
+    deadline = Deadline(SCRAPE_DEADLINE)
     error_msg = None
-    while try_count < max_tries:
-        try:
-            if message and hasattr(message, 'date'):
-                if try_count == 0:
-                    log_important(f"/post at {message.date}")
-            await asyncio.sleep(random.uniform(1, 2.5))
-            latest = await get_latest_canva_link()
-            if latest and latest != last_posted_link:
-                working_votes = 0
-                not_working_votes = 0
-                emoji_pair = secrets.choice(EMOJI_PAIRS)
-                msg, keyboard, _ = format_canva_post_message(latest, working_votes=working_votes, not_working_votes=not_working_votes, emoji_pair=emoji_pair)
-                sent_msg = await context.bot.send_message(chat_id=CHANNEL_ID, text=msg, parse_mode="HTML", reply_markup=keyboard)
-                vote_data[sent_msg.message_id] = {'working': working_votes, 'not_working': not_working_votes, 'voters': set(), 'emoji_pair': emoji_pair}
-                last_posted_link = latest
-                if message and hasattr(message, 'reply_text'):
-                    await message.reply_text("✅ Link posted.")
-                log_important(f"Posted link: {latest}")
-                # --- Delayed bump of working votes ---
-                async def delayed_bump(msg_id, link, emoji_pair):
-                    await asyncio.sleep(10)
-                    bump_votes = random.randint(4, 6)
-                    vote_data[msg_id]['working'] = bump_votes
-                    msg, keyboard, _ = format_canva_post_message(link, working_votes=bump_votes, not_working_votes=0, emoji_pair=emoji_pair)
-                    try:
-                        await context.bot.edit_message_reply_markup(chat_id=CHANNEL_ID, message_id=msg_id, reply_markup=keyboard)
-                    except Exception:
-                        pass
-                asyncio.create_task(delayed_bump(sent_msg.message_id, latest, emoji_pair))
-                return
-            elif latest == last_posted_link:
-                if message and hasattr(message, 'reply_text'):
-                    await message.reply_text("ℹ️ No new link.")
-                log_important("No new link found.")
-                return
-            else:
-                error_msg = "Fetch returned no valid link."
-        except Exception as e:
-            error_msg = str(e)
-        try_count += 1
+    try:
+        links = await scrape_sources(deadline=deadline)
+        if replicas.enabled:
+            # The leader may have posted since our last settings sync; pull its
+            # channel links in first so the dedupe below sees them
+            try:
+                await replicas.sync()
+            except Exception as e:
+                logger.warning(f"[Replicas] Settings sync before /post failed: {e}")
+        posted = await fan_out(context.bot, links) if any(links.values()) else None
+        if posted:
+            record_link_change()
+            if message and hasattr(message, 'reply_text'):
+                await message.reply_text("✅ Link posted." if len(posted) == 1 else f"✅ Posted {len(posted)} links.")
+            for channel, link, _ in posted:
+                log_important(f"Posted link to {channel.chat_id}: {link}")
+            return
+        elif posted is not None:
+            if message and hasattr(message, 'reply_text'):
+                await message.reply_text("ℹ️ No new link.")
+            log_important("No new link found.")
+            return
+        else:
+            error_msg = "Fetch returned no valid link."
+    except Exception as e:
+        error_msg = str(e)
+    elapsed = deadline.seconds - deadline.remaining()
     if message and hasattr(message, 'reply_text'):
-        await message.reply_text(f"❌ Could not fetch a new Canva link after {max_tries} tries. Last error: {error_msg}")
-    logger.error(f"Error in /post after {max_tries} tries: {error_msg}")
-    await context.bot.send_message(chat_id=BOT_ADMIN_ID, text=f"Error in /post after {max_tries} tries: {error_msg}")
-    log_important(f"ERROR in /post after {max_tries} tries: {error_msg}")
+        await message.reply_text(f"❌ Could not fetch a new Canva link ({elapsed:.0f}s of {deadline.seconds:.0f}s budget). Last error: {error_msg}")
+    logger.error(f"Error in /post after {elapsed:.1f}s: {error_msg}")
+    await context.bot.send_message(chat_id=BOT_ADMIN_ID, text=f"Error in /post after {elapsed:.0f}s: {error_msg}")
+    log_important(f"ERROR in /post after {elapsed:.1f}s: {error_msg}")
 
 async def setinterval(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user = update.effective_user
@@ -343,10 +264,24 @@ async def setinterval(update: Update, context: ContextTypes.DEFAULT_TYPE):
             await message.reply_text(INVALID_INTERVAL)
             return
         set_auto_post_interval(min_sec, max_sec)
+        await replicas.publish("auto_post_interval", [min_sec, max_sec])
         await message.reply_text(f"✅ Auto-posting interval set to {min_sec}-{max_sec} seconds.")
     except Exception as e:
         await message.reply_text(f"{ERROR_GENERIC} Error: {e}")
 
+async def runnow(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    user = update.effective_user
+    message = update.message
+    if not (user and user.id == BOT_ADMIN_ID):
+        if message and hasattr(message, 'reply_text'):
+            return await message.reply_text(UNAUTHORIZED_MSG)
+        return
+    run_auto_post_now()
+    # Wakes the leader when it's another replica
+    await replicas.publish("run_now", time.time())
+    if message and hasattr(message, 'reply_text'):
+        await message.reply_text("✅ Auto-poster woken up, checking for a new link now.")
+
 async def setscrapemode(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user = update.effective_user
     message = update.message
@@ -362,10 +297,28 @@ async def setscrapemode(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
     mode = args[0]
     if set_scraping_mode(mode):
+        await replicas.publish("scraping_mode", mode)
         await message.reply_text(f"✅ Scraping mode set to: {mode}")
     else:
         await message.reply_text(ERROR_GENERIC)
 
+def format_tier_stats():
+    from extractors import get_tier_stats
+    parts = []
+    for stage, tiers in get_tier_stats().items():
+        parts.append(f"{stage}: " + " ".join(f"{tier}={count}" for tier, count in tiers.items()))
+    return " | ".join(parts) or "none yet"
+
+def format_token_health():
+    from token_pool import token_pool
+    return html.escape("\n".join(token_pool.summary_lines()) or "none configured")
+
+def format_replica():
+    if not replicas.enabled:
+        return "single instance"
+    role = "leader" if replicas.is_leader("auto_poster") else "follower"
+    return html.escape(f"{replicas.replica_id} ({role}, {replicas.backend.describe()})")
+
 async def stats(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user = update.effective_user
     message = update.message
@@ -377,37 +330,97 @@ async def stats(update: Update, context: ContextTypes.DEFAULT_TYPE):
     from auto_posting import auto_post_min, auto_post_max
     import platform
     import time
-    import os
     stats_msg = (
         f"<b>Bot Stats & Settings</b>\n"
         f"<b>Scraping Mode:</b> <code>{get_scraping_mode()}</code>\n"
         f"<b>Auto-post interval:</b> <code>{auto_post_min}-{auto_post_max} sec</code>\n"
+        f"<b>Next auto-post:</b> <code>{scheduler.describe()}</code>\n"
+        f"<b>Polling policy:</b> <code>{scheduler.policy.describe()}</code>\n"
+        f"<b>Replica:</b> <code>{format_replica()}</code>\n"
         f"<b>Python version:</b> <code>{platform.python_version()}</code>\n"
         f"<b>Platform:</b> <code>{platform.system()} {platform.release()}</code>\n"
-        f"<b>Uptime:</b> <code>{int(time.time() - os.getpid())} sec (PID as start)</code>\n"
+        f"<b>Uptime:</b> <code>{timedelta(seconds=int(metrics.uptime()))}</code>\n"
         f"<b>Channel ID:</b> <code>{CHANNEL_ID}</code>\n"
+        f"<b>Sources / channels:</b> <code>{len(registry.sources)} / {len(registry.channels)}</code>\n"
         f"<b>Admin ID:</b> <code>{BOT_ADMIN_ID}</code>\n"
+        f"<b>Extractor hits:</b> <code>{format_tier_stats()}</code>\n"
+        f"<b>Scrape.do tokens:</b>\n<code>{format_token_health()}</code>\n"
     )
     if message and hasattr(message, 'reply_text'):
         await message.reply_text(stats_msg, parse_mode="HTML")
 
+# --- Readiness ---
+# /health is liveness: the process and its event loop answer. /ready stays 503
+# until the bot can actually do its job, with the time since process start at
+# which each step got there; platforms should route and gate on /ready.
+READY_STEPS = ("telegram", "storage", "updates")
+startup_steps = {}  # step: seconds since process start
+
+def mark_ready(step):
+    if step in startup_steps:
+        return
+    startup_steps[step] = metrics.uptime()
+    logger.info(f"[Startup] {step} ready after {startup_steps[step]:.2f}s")
+    if is_ready():
+        logger.info(f"[Startup] Ready after {startup_steps[step]:.2f}s")
+
+def is_ready():
+    return all(step in startup_steps for step in READY_STEPS)
+
+Gauge("bot_ready", "1 once Telegram, storage and update delivery are up", collect=lambda: float(is_ready()))
+
+async def wait_until_serving(app):
+    # Application.start() is the last step of both run_polling and run_webhook
+    while not app.running:
+        await asyncio.sleep(0.05)
+    mark_ready("updates")
+
 # --- Health & Root Endpoints ---
 async def health_check(request): return web.Response(text="OK")
+async def ready_check(request):
+    lines = [f"{step}: {startup_steps[step]:.2f}s" if step in startup_steps else f"{step}: waiting" for step in READY_STEPS]
+    return web.Response(status=200 if is_ready() else 503, text="\n".join(["READY" if is_ready() else "STARTING", *lines]))
 async def root(request): return web.Response(text="Bot is up!")
+async def metrics_endpoint(request):
+    return web.Response(body=metrics.render().encode("utf-8"), headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"})
+
+# --- Telegram webhook endpoint ---
+# Telegram POSTs each update here with the secret we registered; the update is
+# queued for the Application and acknowledged right away.
+async def telegram_webhook(request):
+    secret = request.headers.get("X-Telegram-Bot-Api-Secret-Token", "")
+    # As bytes: compare_digest rejects non-ASCII str with a TypeError (aiohttp
+    # hands undecodable header bytes over as surrogate escapes)
+    if not hmac.compare_digest(secret.encode("utf-8", "surrogateescape"), WEBHOOK_SECRET.encode("utf-8")):
+        logger.warning(f"[Webhook] Rejected update with a wrong secret token from {request.remote}")
+        return web.Response(status=403)
+    tg_app = request.app["tg_app"]
+    try:
+        update = Update.de_json(await request.json(), tg_app.bot)
+    except Exception as e:
+        logger.warning(f"[Webhook] Rejected a malformed update from {request.remote}: {e}")
+        return web.Response(status=400)
+    await tg_app.update_queue.put(update)
+    return web.Response()
 
-async def start_health_server():
+async def start_health_server(tg_app=None, port=PORT):
     app = web.Application()
     app.router.add_get("/health", health_check)
+    app.router.add_get("/ready", ready_check)
     app.router.add_get("/", root)
+    app.router.add_get("/metrics", metrics_endpoint)
+    if tg_app is not None:
+        app["tg_app"] = tg_app
+        app.router.add_post(WEBHOOK_PATH, telegram_webhook)
     runner = web.AppRunner(app)
     await runner.setup()
-    site = web.TCPSite(runner, "0.0.0.0", 8080)
+    site = web.TCPSite(runner, "0.0.0.0", port)
     await site.start()
-    logger.info("Health server running on :8080")
+    logger.info(f"Health server running on :{port}" + (f", webhook at {WEBHOOK_PATH}" if tg_app is not None else ""))
+    return runner
 
 # --- Register handlers in main() ---
 async def now(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    global last_posted_link
     user = update.effective_user
     message = update.message
     if not (user and user.id == BOT_ADMIN_ID):
@@ -417,73 +430,180 @@ async def now(update: Update, context: ContextTypes.DEFAULT_TYPE):
     args = context.args if context.args else []
     if not args or not message or not hasattr(message, 'reply_text'):
         if message and hasattr(message, 'reply_text'):
-            await message.reply_text("Usage: /now <canva_link>")
+            await message.reply_text("Usage: /now <canva_link> [force]")
         return
     canva_link = args[0]
     if not canva_link.startswith("https://www.canva.com/brand/join?token="):
         await message.reply_text("Invalid Canva link format.")
         return
-    # Start with 0 votes, then gradually add fake working votes only
-    fake_working = 0
-    fake_not_working = 0
-    emoji_pair = secrets.choice(EMOJI_PAIRS)
-    msg, keyboard, _ = format_canva_post_message(canva_link, working_votes=fake_working, not_working_votes=fake_not_working, emoji_pair=emoji_pair)
-    sent_msg = await context.bot.send_message(chat_id=CHANNEL_ID, text=msg, parse_mode="HTML", reply_markup=keyboard)
-    vote_data[sent_msg.message_id] = {'working': fake_working, 'not_working': fake_not_working, 'voters': set(), 'emoji_pair': emoji_pair}
-    last_posted_link = canva_link
+    # Posted to every channel that doesn't have it yet; start with 0 votes, then gradually add fake working votes only
+    force = len(args) > 1 and args[1].lower() == "force"
+    targets = [channel for channel in registry.channels if force or channel.is_new(canva_link)]
+    if not targets:
+        await message.reply_text("ℹ️ This link was already posted. Use /now <canva_link> force to post it again.")
+        return
+    # One failing channel (e.g. the bot was removed from it) must not cost the others their bumps
+    results = await asyncio.gather(*(post_link(context.bot, channel, canva_link) for channel in targets), return_exceptions=True)
+    sent_msgs, failed = [], []
+    for channel, result in zip(targets, results):
+        if isinstance(result, Exception):
+            logger.error(f"[now] Could not post {canva_link} to {channel.chat_id}: {result}")
+            failed.append(str(channel.chat_id))
+        else:
+            sent_msgs.append(result)
     if message and hasattr(message, 'reply_text'):
-        await message.reply_text("✅ Link posted to channel.")
-    log_important(f"Manual /now post: {canva_link}")
+        skipped = len(registry.channels) - len(targets)
+        note = f" ({skipped} already had it)" if skipped else ""
+        if failed:
+            note += f"\n❌ Failed for {', '.join(failed)}, see the logs."
+        if sent_msgs:
+            await message.reply_text(("✅ Link posted to channel." if len(sent_msgs) == 1 else f"✅ Link posted to {len(sent_msgs)} channels.") + note)
+        else:
+            await message.reply_text("❌ Could not post the link." + note)
+    if sent_msgs:
+        log_important(f"Manual /now post: {canva_link}")
+    if failed:
+        log_important(f"ERROR in /now for {', '.join(failed)}: {canva_link}")
     # Gradually increase working votes only
-    async def gradual_working_bump(msg_id, link, emoji_pair):
+    async def gradual_working_bump(chat_id, msg_id):
         target = random.randint(10, 20)
         for _ in range(target):
             await asyncio.sleep(random.randint(10, 30))
-            if msg_id in vote_data:
-                vote_data[msg_id]['working'] += 1
-                msg, keyboard, _ = format_canva_post_message(link, working_votes=vote_data[msg_id]['working'], not_working_votes=vote_data[msg_id]['not_working'], emoji_pair=emoji_pair)
-                try:
-                    await context.bot.edit_message_reply_markup(chat_id=CHANNEL_ID, message_id=msg_id, reply_markup=keyboard)
-                except Exception:
-                    pass
-    asyncio.create_task(gradual_working_bump(sent_msg.message_id, canva_link, emoji_pair))
+            if vote_store.add_counts(chat_id, msg_id, working=1) is not None:
+                queue_vote_edit(context.bot, chat_id, msg_id)
     # Not working votes never exceed working votes
-    async def not_working_guard(msg_id, link, emoji_pair):
+    async def not_working_guard(chat_id, msg_id):
         while True:
             await asyncio.sleep(random.randint(120, 240))
-            if msg_id not in vote_data:
+            votes = await vote_store.fetch(chat_id, msg_id)
+            if votes is None:
                 break
-            votes = vote_data[msg_id]
-            if votes['not_working'] > votes['working']:
-                votes['not_working'] = votes['working']
-                msg, keyboard, _ = format_canva_post_message(link, working_votes=votes['working'], not_working_votes=votes['not_working'], emoji_pair=emoji_pair)
-                try:
-                    await context.bot.edit_message_reply_markup(chat_id=CHANNEL_ID, message_id=msg_id, reply_markup=keyboard)
-                except Exception:
-                    pass
+            if votes.not_working > votes.working:
+                vote_store.set_counts(chat_id, msg_id, not_working=votes.working)
+                queue_vote_edit(context.bot, chat_id, msg_id)
             # Stop guard if no risk
-            if votes['not_working'] <= votes['working']:
+            if votes.not_working <= votes.working:
                 break
-    asyncio.create_task(not_working_guard(sent_msg.message_id, canva_link, emoji_pair))
+    for sent_msg in sent_msgs:
+        asyncio.create_task(gradual_working_bump(sent_msg.chat_id, sent_msg.message_id))
+        asyncio.create_task(not_working_guard(sent_msg.chat_id, sent_msg.message_id))
 
-def main():
-    app = ApplicationBuilder().token(BOT_TOKEN).build()
+# --- Application lifecycle hooks ---
+# post_init runs before the Application is started, so these are plain asyncio
+# tasks that we cancel ourselves on shutdown
+_background_tasks = []
+
+async def on_startup(app):
+    # Application.initialize() has already called getMe
+    mark_ready("telegram")
+    await init_http_session()
+    # Before replicas.start(): the shared last links it applies are checked against
+    # the history, and the shared interval against the persisted schedule
+    link_history.load()
+    restore_schedule()
+    await replicas.start()
+    vote_store.use_backend(replicas.backend)
+    vote_store.open()
+    mark_ready("storage")
+    # Everything else warms up in the background instead of delaying the first update
+    for coro in (wait_until_serving(app), vote_store.warm(), prewarm_http_pool(),
+                 vote_store.run_flusher(), replicas.run_sync(), metrics.monitor_loop_lag(), loop_watchdog.run()):
+        _background_tasks.append(asyncio.create_task(coro))
+    if link_checker.interval > 0:
+        _background_tasks.append(asyncio.create_task(replicas.run_as_leader("link_checker", link_checker.run)))
+
+async def on_shutdown(app):
+    for task in _background_tasks:
+        task.cancel()
+    _background_tasks.clear()
+    await close_http_session()
+    token_pool.save()
+    await vote_store.close()
+    await replicas.close()
+
+def build_application():
+    builder = ApplicationBuilder().token(BOT_TOKEN)
+    if TELEGRAM_BASE_URL:
+        builder = builder.base_url(TELEGRAM_BASE_URL)
+    app = (
+        builder
+        # Same pool sizes as the library defaults, plus per-method latency/status metrics
+        .request(InstrumentedRequest(connection_pool_size=256))
+        .get_updates_request(InstrumentedRequest(connection_pool_size=1))
+        .post_init(on_startup)
+        .post_shutdown(on_shutdown)
+        .build()
+    )
     app.add_handler(CommandHandler("start", start))
     app.add_handler(CommandHandler("post", post))
     app.add_handler(CommandHandler("now", now))
     app.add_handler(CommandHandler("lastlink", lastlink))
     app.add_handler(CommandHandler("logs", logs))
     app.add_handler(CommandHandler("health", health))
+    app.add_handler(CommandHandler("profile", profile))
+    app.add_handler(CommandHandler("timings", timings))
+    app.add_handler(CommandHandler("looplag", looplag))
+    app.add_handler(CommandHandler("linkstatus", linkstatus))
+    app.add_handler(CommandHandler("checklink", checklink))
     app.add_handler(CommandHandler("restart", restart))
     app.add_handler(CommandHandler("setinterval", setinterval))
+    app.add_handler(CommandHandler("runnow", runnow))
     app.add_handler(CommandHandler("setscrapemode", setscrapemode))
     app.add_handler(CommandHandler("stats", stats))
     app.add_handler(CallbackQueryHandler(help_callback, pattern=r"^help_"))
     app.add_handler(CallbackQueryHandler(vote_callback, pattern=r"^vote_"))
+    return app
+
+def run_auto_poster(app):
+    # Only the replica holding the lease posts; without a shared backend it's always us
+    return replicas.run_as_leader("auto_poster", lambda: auto_posting_task(app.bot))
+
+async def run_webhook(app, port=PORT, stop_event=None):
+    # Same lifecycle as Application.run_polling, but updates arrive on the
+    # aiohttp server; falls back to polling if the webhook can't be registered
+    stop_event = stop_event or asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop_event.set)
+        except (NotImplementedError, RuntimeError):
+            pass
+    # The server comes up first so /health answers while Telegram is still being reached
+    runner = await start_health_server(app, port)
+    await app.initialize()
+    if app.post_init:
+        await app.post_init(app)
+    try:
+        await app.bot.set_webhook(url=WEBHOOK_URL + WEBHOOK_PATH, secret_token=WEBHOOK_SECRET, allowed_updates=Update.ALL_TYPES)
+        logger.info(f"[Webhook] Receiving updates at {WEBHOOK_URL + WEBHOOK_PATH}")
+    except Exception as e:
+        logger.error(f"[Webhook] Could not set webhook ({e}), falling back to polling")
+        await app.updater.start_polling()
+    await app.start()
+    auto_task = asyncio.create_task(run_auto_poster(app))
+    try:
+        await stop_event.wait()
+    finally:
+        auto_task.cancel()
+        if app.updater.running:
+            await app.updater.stop()
+        await app.stop()
+        await runner.cleanup()
+        await app.shutdown()
+        if app.post_shutdown:
+            await app.post_shutdown(app)
+
+def main():
+    app = build_application()
+    if WEBHOOK_URL:
+        asyncio.run(run_webhook(app))
+        return
+    if STATE_BACKEND_URL:
+        logger.warning("[Replicas] STATE_BACKEND_URL is set without WEBHOOK_URL: only one replica can long-poll getUpdates at a time")
     # Start health server and auto-posting
     loop = asyncio.get_event_loop()
-    loop.create_task(start_health_server())
-    loop.create_task(auto_posting_task(app.bot))
+    loop.create_task(start_health_server(port=PORT))
+    loop.create_task(run_auto_poster(app))
     logger.info("Starting polling…")
     app.run_polling()
 
@@ -1,4 +1,6 @@
+import hashlib
 import os
+import socket
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
@@ -23,8 +25,31 @@ ADMIN_GROUP_ID = int(validate_env_var("ADMIN_GROUP_ID"))
 # Bot admin ID
 BOT_ADMIN_ID = int(validate_env_var("BOT_ADMIN_ID"))
 
+# Multi-replica mode: replicas share votes and admin settings through this
+# backend and elect one leader to run the auto-poster. Empty = single instance.
+# sqlite:///state.db (replicas on one host/volume) or redis://host:6379/0
+STATE_BACKEND_URL = os.getenv("STATE_BACKEND_URL", "")
+REPLICA_ID = os.getenv("REPLICA_ID", "") or f"{socket.gethostname()}-{os.getpid()}"
+LEADER_LEASE_TTL = float(os.getenv("LEADER_LEASE_TTL", "15"))
+STATE_SYNC_INTERVAL = float(os.getenv("STATE_SYNC_INTERVAL", "2"))
+
+# Default path of a local state or log file. Replicas sharing a backend may run
+# in one directory, and rewriting or rotating a file one of them appends to
+# would lose lines, so with STATE_BACKEND_URL set each replica gets its own
+# (link_history.jsonl -> link_history.replica-1.jsonl)
+def local_path(name):
+    if not STATE_BACKEND_URL:
+        return name
+    root, ext = os.path.splitext(name)
+    return f"{root}.{REPLICA_ID}{ext}"
+
 # Add a path for important events log
-IMPORTANT_LOG_PATH = "important.log"
+IMPORTANT_LOG_PATH = os.getenv("IMPORTANT_LOG_PATH", local_path("important.log"))
+
+# Main log file; both logs rotate once they reach LOG_MAX_BYTES
+LOG_PATH = os.getenv("LOG_PATH", local_path("bot.log"))
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", str(1024 * 1024)))
+LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", "3"))
 
 # Scrape.do API tokens (comma-separated in env)
 def get_scrapedo_tokens():
@@ -32,3 +57,109 @@ def get_scrapedo_tokens():
     return [token.strip() for token in tokens.split(",") if token.strip()]
 
 SCRAPEDO_TOKENS = get_scrapedo_tokens()
+
+# Page carrying the current team link, and the Scrape.do endpoint (overridable
+# so benchmarks can point the bot at local stand-ins)
+MAIN_URL = os.getenv("MAIN_URL", "https://bingotingo.com/best-social-media-platforms/")
+SCRAPEDO_API_URL = os.getenv("SCRAPEDO_API_URL", "http://api.scrape.do")
+
+# Registry of sources and target channels (JSON file, see registry.py); empty =
+# scrape MAIN_URL and post to CHANNEL_ID. Sources are scraped concurrently, at
+# most SOURCE_PARALLELISM at a time; new links fan out to the channels with
+# at most FANOUT_PARALLELISM sends in flight and CHAT_SEND_INTERVAL seconds
+# between posts to the same chat.
+SOURCES_CONFIG = os.getenv("SOURCES_CONFIG", "")
+SOURCE_PARALLELISM = max(1, int(os.getenv("SOURCE_PARALLELISM", "4")))
+FANOUT_PARALLELISM = max(1, int(os.getenv("FANOUT_PARALLELISM", "10")))
+CHAT_SEND_INTERVAL = float(os.getenv("CHAT_SEND_INTERVAL", "3"))
+
+# Bot API base URL (empty = api.telegram.org), e.g. a local Bot API server
+TELEGRAM_BASE_URL = os.getenv("TELEGRAM_BASE_URL", "")
+
+# Webhook mode: set WEBHOOK_URL to the public base URL of the :8080 server to
+# receive updates there instead of long polling (polling is used when unset or
+# if registering the webhook fails). The secret defaults to one derived from
+# the bot token, so every replica behind a load balancer agrees on it.
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "").rstrip("/")
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/telegram/webhook")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET") or hashlib.sha256(f"webhook:{BOT_TOKEN}".encode("utf-8")).hexdigest()
+
+# Port of the health/metrics/webhook server (PaaS platforms set PORT)
+PORT = int(os.getenv("PORT", "8080"))
+
+# Shared HTTP client pool used by the scrapers
+HTTP_POOL_LIMIT = int(os.getenv("HTTP_POOL_LIMIT", "20"))
+HTTP_POOL_LIMIT_PER_HOST = int(os.getenv("HTTP_POOL_LIMIT_PER_HOST", "4"))
+HTTP_DNS_CACHE_TTL = int(os.getenv("HTTP_DNS_CACHE_TTL", "300"))
+HTTP_KEEPALIVE_TIMEOUT = int(os.getenv("HTTP_KEEPALIVE_TIMEOUT", "60"))
+HTTP_TIMEOUT = int(os.getenv("HTTP_TIMEOUT", "30"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "20"))
+# Seconds to spend opening pooled connections to the scrape targets after startup; 0 = off
+HTTP_PREWARM_TIMEOUT = float(os.getenv("HTTP_PREWARM_TIMEOUT", "5"))
+
+# Scrape retries (retry_policy.py): timeouts, resets, 429 and 5xx are retried up
+# to SCRAPE_RETRY_ATTEMPTS times with jittered exponential backoff; one scrape
+# (an auto-post cycle or /post) gives up after SCRAPE_DEADLINE seconds
+SCRAPE_RETRY_ATTEMPTS = max(1, int(os.getenv("SCRAPE_RETRY_ATTEMPTS", "3")))
+SCRAPE_RETRY_BASE_DELAY = float(os.getenv("SCRAPE_RETRY_BASE_DELAY", "0.5"))
+SCRAPE_RETRY_MAX_DELAY = float(os.getenv("SCRAPE_RETRY_MAX_DELAY", "5"))
+SCRAPE_DEADLINE = float(os.getenv("SCRAPE_DEADLINE", "45"))
+
+# 'both' scraping mode: seconds before Scrape.do is launched next to the direct
+# fetch (0 = race them right away), and how many Scrape.do tokens run at once
+HEDGE_DELAY = float(os.getenv("HEDGE_DELAY", "3"))
+SCRAPEDO_PARALLELISM = max(1, int(os.getenv("SCRAPEDO_PARALLELISM", "2")))
+
+# Memo of redirect page -> resolved Canva link
+REDIRECT_MEMO_SIZE = int(os.getenv("REDIRECT_MEMO_SIZE", "256"))
+REDIRECT_MEMO_TTL = int(os.getenv("REDIRECT_MEMO_TTL", str(6 * 3600)))
+
+# Scrape.do token pool: health state file and circuit breaker settings
+TOKEN_POOL_STATE_PATH = os.getenv("TOKEN_POOL_STATE_PATH", local_path("token_pool.json"))
+TOKEN_FAILURE_THRESHOLD = int(os.getenv("TOKEN_FAILURE_THRESHOLD", "3"))
+TOKEN_COOLDOWN = int(os.getenv("TOKEN_COOLDOWN", "600"))
+
+# Persistent vote store (SQLite, WAL mode)
+VOTE_DB_PATH = os.getenv("VOTE_DB_PATH", local_path("votes.db"))
+VOTE_CACHE_SIZE = int(os.getenv("VOTE_CACHE_SIZE", "200"))  # posts kept in memory
+VOTE_RETENTION = int(os.getenv("VOTE_RETENTION", "2000"))  # posts kept on disk
+VOTE_FLUSH_INTERVAL = float(os.getenv("VOTE_FLUSH_INTERVAL", "1"))
+
+# Seconds to collect vote clicks on one message before editing its buttons
+EDIT_DEBOUNCE = float(os.getenv("EDIT_DEBOUNCE", "1.5"))
+
+# Vote callback caches: rendered keyboards and per-message post metadata
+KEYBOARD_CACHE_SIZE = int(os.getenv("KEYBOARD_CACHE_SIZE", "1024"))
+MESSAGE_INDEX_SIZE = int(os.getenv("MESSAGE_INDEX_SIZE", "500"))
+
+# Auto-post scheduler state (next due time and interval survive restarts)
+SCHEDULER_STATE_PATH = os.getenv("SCHEDULER_STATE_PATH", local_path("scheduler_state.json"))
+
+# Posted links per channel, kept across restarts for dedupe (empty path = memory only)
+LINK_HISTORY_PATH = os.getenv("LINK_HISTORY_PATH", local_path("link_history.jsonl"))
+LINK_HISTORY_SIZE = max(1, int(os.getenv("LINK_HISTORY_SIZE", "200")))
+
+# Seconds a freshly scraped link is reused by get_latest_canva_link callers
+SCRAPE_RESULT_TTL = float(os.getenv("SCRAPE_RESULT_TTL", "5"))
+
+# Auto-post polling policy: 'adaptive' learns when the source changes and polls
+# densely around those windows (within the /setinterval bounds), 'uniform' picks
+# a random delay between min and max
+POLLING_POLICY = os.getenv("POLLING_POLICY", "adaptive")
+CHANGE_HISTORY_PATH = os.getenv("CHANGE_HISTORY_PATH", local_path("link_changes.json"))
+
+# Liveness checks of posted links: every LINK_CHECK_INTERVAL seconds (0 = off)
+# the recent links are probed, at most LINK_CHECK_CONCURRENCY at a time, and
+# each verdict is trusted for LINK_CHECK_TTL seconds. A page containing one of
+# LINK_DEAD_MARKERS (comma-separated, case-insensitive) counts as expired.
+LINK_CHECK_INTERVAL = float(os.getenv("LINK_CHECK_INTERVAL", "300"))
+LINK_CHECK_TTL = float(os.getenv("LINK_CHECK_TTL", "240"))
+LINK_CHECK_CONCURRENCY = max(1, int(os.getenv("LINK_CHECK_CONCURRENCY", "4")))
+LINK_CHECK_RECENT = int(os.getenv("LINK_CHECK_RECENT", "20"))  # recently posted links to keep checking
+LINK_CHECK_TIMEOUT = float(os.getenv("LINK_CHECK_TIMEOUT", "10"))
+LINK_DEAD_MARKERS = [marker.strip().lower() for marker in os.getenv(
+    "LINK_DEAD_MARKERS", "link has expired,invite has expired,invitation has expired,no longer valid,link is invalid").split(",") if marker.strip()]
+
+# Event loop stalls longer than this (seconds) are attributed to the blocking coroutine (/looplag)
+LOOP_BLOCK_THRESHOLD = float(os.getenv("LOOP_BLOCK_THRESHOLD", "0.1"))
@@ -0,0 +1,95 @@
+import asyncio
+import logging
+from collections import OrderedDict
+
+from telegram.error import BadRequest, RetryAfter
+
+from config import EDIT_DEBOUNCE
+
+logger = logging.getLogger("edit_queue")
+
+LAST_SENT_LIMIT = 500  # messages whose last rendered markup we remember
+
+# --- Coalescing edit pipeline for vote buttons ---
+# All edit requests for a message that arrive within EDIT_DEBOUNCE seconds are
+# merged into one edit rendered with the latest counts, and consecutive edits
+# of a message start at least EDIT_DEBOUNCE seconds apart. Flood-control
+# (RetryAfter) pauses every edit for that chat, and edits whose markup matches
+# the last one sent are skipped.
+class EditCoalescer:
+    def __init__(self, window=EDIT_DEBOUNCE):
+        self.window = window
+        self._pending = {}  # (chat_id, message_id): (bot, render)
+        self._tasks = {}
+        self._last_sent = OrderedDict()  # (chat_id, message_id): markup dict
+        self._blocked_until = {}  # chat_id: loop time until which edits must wait
+        self.stats = {"requested": 0, "sent": 0, "skipped": 0, "retry_after": 0, "failed": 0}
+
+    def request(self, bot, chat_id, message_id, render):
+        # `render` is awaited right before sending and must return the markup
+        key = (chat_id, message_id)
+        self.stats["requested"] += 1
+        self._pending[key] = (bot, render)
+        if key not in self._tasks:
+            self._tasks[key] = asyncio.create_task(self._run(key))
+
+    async def _run(self, key):
+        chat_id, message_id = key
+        loop = asyncio.get_running_loop()
+        next_send = loop.time() + self.window
+        try:
+            while key in self._pending:
+                delay = next_send - loop.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                await self._wait_flood(chat_id)
+                bot, render = self._pending.pop(key)
+                markup = await render()
+                if markup is None:
+                    continue
+                rendered = markup.to_dict()
+                if self._last_sent.get(key) == rendered:
+                    self.stats["skipped"] += 1
+                    continue
+                next_send = loop.time() + self.window
+                try:
+                    await bot.edit_message_reply_markup(chat_id=chat_id, message_id=message_id, reply_markup=markup)
+                    self._remember(key, rendered)
+                    self.stats["sent"] += 1
+                except RetryAfter as e:
+                    self.stats["retry_after"] += 1
+                    delay = e.retry_after.total_seconds() if hasattr(e.retry_after, "total_seconds") else e.retry_after
+                    logger.warning(f"[EditQueue] Flood control for chat {chat_id}, waiting {delay}s")
+                    self._blocked_until[chat_id] = asyncio.get_running_loop().time() + delay
+                    # Retry with whatever counts are current by then
+                    self._pending.setdefault(key, (bot, render))
+                except BadRequest as e:
+                    if "not modified" in str(e).lower():
+                        self._remember(key, rendered)
+                        self.stats["skipped"] += 1
+                    else:
+                        self.stats["failed"] += 1
+                        logger.warning(f"[EditQueue] Edit failed for {chat_id}/{message_id}: {e}")
+                except Exception as e:
+                    self.stats["failed"] += 1
+                    logger.warning(f"[EditQueue] Edit failed for {chat_id}/{message_id}: {e}")
+        finally:
+            self._tasks.pop(key, None)
+
+    async def _wait_flood(self, chat_id):
+        until = self._blocked_until.get(chat_id)
+        if until is None:
+            return
+        delay = until - asyncio.get_running_loop().time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        else:
+            self._blocked_until.pop(chat_id, None)
+
+    def _remember(self, key, rendered):
+        self._last_sent[key] = rendered
+        self._last_sent.move_to_end(key)
+        while len(self._last_sent) > LAST_SENT_LIMIT:
+            self._last_sent.popitem(last=False)
+
+edit_queue = EditCoalescer()
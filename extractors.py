@@ -0,0 +1,162 @@
+import html as html_lib
+import importlib.util
+import re
+from collections import Counter
+
+# --- Link extractors ---
+# Each stage tries its tiers in order and stops at the first hit:
+#   regex - precompiled targeted patterns (also used while streaming)
+#   fast  - optional C parser backend (selectolax or lxml, if installed)
+#   bs4   - the original BeautifulSoup logic, last resort
+TIERS = ("regex", "fast", "bs4")
+
+# (stage, tier) -> number of links found by that tier; (stage, "miss") when none did
+tier_hits = Counter()
+
+def record_hit(stage, tier):
+    tier_hits[(stage, tier)] += 1
+
+def get_tier_stats():
+    stats = {}
+    for (stage, tier), count in sorted(tier_hits.items()):
+        stats.setdefault(stage, {})[tier] = count
+    return stats
+
+# --- Tier 1: precompiled matchers ---
+SU_BUTTON_RE = re.compile(r'<a\b[^>]*\bclass\s*=\s*["\'](?:[^"\']*\s)?su-button(?=[\s"\'])[^>]*>', re.I)
+HREF_RE = re.compile(r'\bhref\s*=\s*["\']([^"\']+)["\']', re.I)
+CANVA_HREF_RE = re.compile(r'<a\b[^>]*\bhref\s*=\s*["\'](https://www\.canva\.com/brand/[^"\']+)["\']', re.I)
+CANVA_LINK_RE = re.compile(r'https://www.canva.com/brand/join\?token=[^"\'\s<>]+')
+CANVA_PREFIX = 'https://www.canva.com/brand/'
+
+# Matchers also run on a partial body while it streams in (final=False). A
+# match that runs up to the end of the buffer may continue in the next chunk,
+# so it only counts once more text follows it or the body is complete.
+def _complete(m, text, final):
+    return final or m.end() < len(text)
+
+def match_su_button(text, pos=0, final=True):
+    m = SU_BUTTON_RE.search(text, pos)
+    if m and _complete(m, text, final):
+        href = HREF_RE.search(m.group(0))
+        if href:
+            return html_lib.unescape(href.group(1))
+    return None
+
+def match_canva_link(text, pos=0, final=True):
+    m = CANVA_HREF_RE.search(text, pos)
+    if m and _complete(m, text, final):
+        return html_lib.unescape(m.group(1))
+    m = CANVA_LINK_RE.search(text, pos)
+    if m and _complete(m, text, final):
+        return m.group(0)
+    return None
+
+# The parsers below are only needed when the regex tier misses, so they are
+# imported inside the functions that use them instead of at startup (bs4 alone
+# adds ~25 ms to the bot's import time)
+def _installed(name):
+    return importlib.util.find_spec(name) is not None
+
+# --- Tier 2: optional fast parser backend ---
+FAST_PARSER = "selectolax" if _installed("selectolax") else "lxml" if _installed("lxml") else None
+
+def fast_su_button(html):
+    if FAST_PARSER == "selectolax":
+        from selectolax.parser import HTMLParser
+        node = HTMLParser(html).css_first("a.su-button")
+        return node.attributes.get("href") if node is not None else None
+    if FAST_PARSER == "lxml":
+        import lxml.html
+        nodes = lxml.html.fromstring(html).xpath('//a[contains(concat(" ", normalize-space(@class), " "), " su-button ")][@href]')
+        return nodes[0].get("href") if nodes else None
+    return None
+
+def fast_canva_link(html):
+    if FAST_PARSER == "selectolax":
+        from selectolax.parser import HTMLParser
+        for node in HTMLParser(html).css("a[href]"):
+            href = node.attributes.get("href")
+            if href and href.startswith(CANVA_PREFIX):
+                return href
+        return None
+    if FAST_PARSER == "lxml":
+        import lxml.html
+        for href in lxml.html.fromstring(html).xpath("//a/@href"):
+            if href.startswith(CANVA_PREFIX):
+                return str(href)
+        return None
+    return None
+
+# --- Tier 3: BeautifulSoup ---
+def bs4_su_button(html):
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(html, "html.parser")
+    btn = soup.select_one("a.su-button")
+    if btn and btn.get("href"):
+        return btn["href"]
+    return None
+
+def bs4_canva_link(html):
+    import bs4
+    soup = bs4.BeautifulSoup(html, "html.parser")
+    for a in soup.find_all('a'):
+        if isinstance(a, bs4.element.Tag):
+            href = a.get('href')
+            if isinstance(href, str) and href.startswith(CANVA_PREFIX):
+                return href
+    # Try to find any Canva link in the HTML, even if not in <a> tags
+    canva_match = CANVA_LINK_RE.search(html)
+    if canva_match:
+        return canva_match.group(0)
+    return None
+
+MAIN_TIERS = {"regex": match_su_button, "fast": fast_su_button, "bs4": bs4_su_button}
+REDIRECT_TIERS = {"regex": match_canva_link, "fast": fast_canva_link, "bs4": bs4_canva_link}
+
+def _run_tiers(stage, tiers, html, skip):
+    for tier in TIERS:
+        if tier in skip or (tier == "fast" and FAST_PARSER is None):
+            continue
+        try:
+            link = tiers[tier](html)
+        except Exception:
+            link = None
+        if link:
+            record_hit(stage, tier)
+            return link
+    record_hit(stage, "miss")
+    return None
+
+# `skip` lets callers that already ran the regex tier (the streaming reader)
+# go straight to the parser tiers.
+def extract_redirect_url(html, skip=()):
+    return _run_tiers("main", MAIN_TIERS, html, skip)
+
+def extract_canva_link(html, skip=()):
+    return _run_tiers("redirect", REDIRECT_TIERS, html, skip)
+
+# --- Per-source extraction rules ---
+# A rule is (matcher, extract): matcher(text, pos, final) runs while the source
+# page streams in, extract(html) is the parser fallback once the whole page is read.
+#   su_button  - the page links to a redirect page via a.su-button (the original source)
+#   canva_link - the Canva link is on the page itself
+#   regex      - custom `pattern`; group 1 (or the whole match) is a redirect page or Canva link
+# Whatever the rule finds is followed to its redirect page unless it already is a Canva link.
+def make_rule(rule, pattern=None):
+    if rule == "su_button":
+        return match_su_button, lambda html: extract_redirect_url(html, skip=("regex",))
+    if rule == "canva_link":
+        return match_canva_link, lambda html: extract_canva_link(html, skip=("regex",))
+    if rule == "regex":
+        if not pattern:
+            raise ValueError("The regex rule needs a pattern")
+        compiled = re.compile(pattern, re.I)
+        def match_pattern(text, pos=0, final=True):
+            m = compiled.search(text, pos)
+            if m and _complete(m, text, final):
+                return html_lib.unescape(m.group(1) if compiled.groups else m.group(0))
+            return None
+        # The matcher already scanned the whole page; there is no parser fallback
+        return match_pattern, lambda html: None
+    raise ValueError(f"Unknown extraction rule: {rule}")
@@ -0,0 +1,162 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict, namedtuple
+
+import aiohttp
+
+from config import LINK_CHECK_INTERVAL, LINK_CHECK_TTL, LINK_CHECK_CONCURRENCY, LINK_CHECK_RECENT, LINK_CHECK_TIMEOUT, LINK_DEAD_MARKERS
+from metrics import Counter
+from scrape_links import get_http_session, get_stealth_headers
+import registry
+
+logger = logging.getLogger("link_checker")
+
+LINK_CHECKS = Counter("bot_link_checks_total", "Liveness probes of posted links per verdict", ("verdict",))
+
+PROBE_BYTES = 64 * 1024  # the markers are near the top of the page; the rest is never read
+DEAD_STATUSES = (404, 410)
+UNKNOWN_TTL = 60  # timeouts, 5xx and bot walls are retried sooner than real verdicts
+NUDGE_MIN_AGE = 60  # "not working" votes re-probe a link at most this often
+
+# state: "alive", "dead" or "unknown" (could not tell); checked_at is monotonic
+Verdict = namedtuple("Verdict", "state detail checked_at")
+
+def classify(status, text, markers=LINK_DEAD_MARKERS):
+    if status in DEAD_STATUSES:
+        return "dead", f"HTTP {status}"
+    lowered = text.lower()
+    for marker in markers:
+        if marker in lowered:
+            return "dead", f"page says '{marker}'"
+    if 200 <= status < 300:
+        return "alive", f"HTTP {status}"
+    # 403/429 (bot protection, rate limits) and 5xx say nothing about the link
+    return "unknown", f"HTTP {status}"
+
+# --- Link liveness checker ---
+# Probes recently posted links in the background (bounded concurrency, one
+# probe per link at a time) and caches each verdict for LINK_CHECK_TTL. When
+# the link a channel currently shows turns out dead, on_dead(link) is awaited
+# once for it; auto_posting uses that to re-scrape right away.
+class LinkChecker:
+    def __init__(self, interval=LINK_CHECK_INTERVAL, ttl=LINK_CHECK_TTL, concurrency=LINK_CHECK_CONCURRENCY, recent=LINK_CHECK_RECENT, timeout=LINK_CHECK_TIMEOUT):
+        self.interval = interval  # 0 = no background sweeps or vote-triggered probes
+        self.ttl = ttl
+        self.recent = recent
+        self.timeout = timeout
+        self.on_dead = None
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._verdicts = {}  # link: Verdict
+        self._inflight = {}  # link: future of the probe in flight
+        self._watched = OrderedDict()  # link: None, most recently posted last
+        self._reported = set()  # dead links on_dead already ran for
+        self._tasks = set()
+
+    def watch(self, link):
+        self._watched[link] = None
+        self._watched.move_to_end(link)
+        while len(self._watched) > self.recent:
+            old, _ = self._watched.popitem(last=False)
+            self._verdicts.pop(old, None)
+
+    def links(self):
+        # Watched links plus whatever each channel currently shows (known after a restart too)
+        current = [channel.last_posted_link for channel in registry.channels if channel.last_posted_link]
+        return list(dict.fromkeys([*self._watched, *current]))
+
+    def _fresh(self, verdict):
+        ttl = self.ttl if verdict.state != "unknown" else min(self.ttl, UNKNOWN_TTL)
+        return time.monotonic() - verdict.checked_at < ttl
+
+    def verdict(self, link):
+        # Cached verdict if still fresh, else None (never probes)
+        verdict = self._verdicts.get(link)
+        if verdict is not None and self._fresh(verdict):
+            return verdict
+        return None
+
+    def is_dead(self, link):
+        verdict = self.verdict(link)
+        return verdict is not None and verdict.state == "dead"
+
+    async def check(self, link, force=False):
+        if not force:
+            verdict = self.verdict(link)
+            if verdict is not None:
+                return verdict
+        if link not in self._inflight:
+            self._inflight[link] = asyncio.ensure_future(self._probe(link))
+            self._inflight[link].add_done_callback(lambda _: self._inflight.pop(link, None))
+        return await asyncio.shield(self._inflight[link])
+
+    async def _probe(self, link):
+        async with self._semaphore:
+            session = await get_http_session()
+            try:
+                async with session.get(link, headers=get_stealth_headers(), timeout=aiohttp.ClientTimeout(total=self.timeout)) as resp:
+                    body = await resp.content.read(PROBE_BYTES)
+                    state, detail = classify(resp.status, body.decode(resp.charset or "utf-8", errors="replace"))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                state, detail = "unknown", f"{type(e).__name__}: {e}" if str(e) else type(e).__name__
+        verdict = Verdict(state, detail, time.monotonic())
+        self._verdicts[link] = verdict
+        LINK_CHECKS.inc(verdict=state)
+        if state == "dead":
+            logger.warning(f"[LinkChecker] Dead link ({detail}): {link}")
+        return verdict
+
+    async def _act(self, link, verdict):
+        current = {channel.last_posted_link for channel in registry.channels}
+        if verdict.state != "dead" or link not in current or link in self._reported:
+            return
+        self._reported.add(link)
+        logger.warning(f"[LinkChecker] A channel is showing a dead link, re-scraping now: {link}")
+        if self.on_dead is not None:
+            await self.on_dead(link)
+
+    async def sweep(self):
+        links = self.links()
+        verdicts = await asyncio.gather(*(self.check(link) for link in links))
+        for link, verdict in zip(links, verdicts):
+            await self._act(link, verdict)
+        return dict(zip(links, verdicts))
+
+    async def recheck(self, link):
+        # Probe now, ignoring the cache
+        verdict = await self.check(link, force=True)
+        await self._act(link, verdict)
+        return verdict
+
+    def nudge(self, link):
+        # A user reported the link as not working: re-probe it now unless it was just checked
+        verdict = self._verdicts.get(link)
+        if self.interval <= 0 or link in self._inflight or (verdict is not None and time.monotonic() - verdict.checked_at < NUDGE_MIN_AGE):
+            return
+        task = asyncio.create_task(self.recheck(link))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def run(self):
+        while True:
+            try:
+                await self.sweep()
+            except Exception as e:
+                logger.error(f"[LinkChecker] Sweep failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    def report(self):
+        lines = []
+        now = time.monotonic()
+        for link in reversed(self.links()):
+            verdict = self._verdicts.get(link)
+            if verdict is None:
+                lines.append(f"?  not checked yet  {link}")
+            else:
+                stale = "" if self._fresh(verdict) else ", stale"
+                lines.append(f"{verdict.state:<7} {verdict.detail} ({int(now - verdict.checked_at)}s ago{stale})  {link}")
+        return "\n".join(lines) or "No posted links to check yet."
+
+link_checker = LinkChecker()
@@ -0,0 +1,128 @@
+import json
+import logging
+import os
+import time
+from collections import deque, namedtuple
+from urllib.parse import parse_qs, urlsplit
+
+from config import LINK_HISTORY_PATH, LINK_HISTORY_SIZE
+
+logger = logging.getLogger("link_history")
+
+# chat_id: the channel's configured id; message_id: None when the post was made
+# by another replica (only the link is shared); posted_at: unix time
+PostedLink = namedtuple("PostedLink", "chat_id link message_id posted_at")
+
+def link_key(link):
+    # Canva invites are the same invite whatever the referrer/utm parameters
+    # say, so they are keyed by their token; anything else by its URL without
+    # fragment, trailing slash or host case
+    parts = urlsplit(link.strip())
+    token = parse_qs(parts.query).get("token")
+    if token and parts.netloc.lower().endswith("canva.com"):
+        return "canva:" + token[0]
+    return f"{parts.scheme.lower()}://{parts.netloc.lower()}{parts.path.rstrip('/')}" + (f"?{parts.query}" if parts.query else "")
+
+# --- Posted link history ---
+# Per channel, the last LINK_HISTORY_SIZE posts in a ring (oldest first) plus
+# an index of link_key -> latest post, so "already posted here?" is one dict
+# lookup. Every post is appended as one JSON line to LINK_HISTORY_PATH; the
+# file is replayed on startup and rewritten with only the kept entries once it
+# has grown to twice that. An empty path keeps the history in memory only.
+class LinkHistory:
+    def __init__(self, path=LINK_HISTORY_PATH, size=LINK_HISTORY_SIZE):
+        self.path = path
+        self.size = size
+        self._rings = {}  # chat_id: deque of PostedLink
+        self._index = {}  # (chat_id, link_key): PostedLink
+        self._lines = 0  # lines in the file since it was last rewritten
+        self._loaded = False
+
+    def get(self, chat_id, link):
+        return self._index.get((chat_id, link_key(link)))
+
+    def has_posted(self, chat_id, link):
+        return (chat_id, link_key(link)) in self._index
+
+    def last(self, chat_id):
+        ring = self._rings.get(chat_id)
+        return ring[-1] if ring else None
+
+    def recent(self, chat_id, n=10):
+        # Most recent first
+        ring = self._rings.get(chat_id, ())
+        return [ring[-i] for i in range(1, min(n, len(ring)) + 1)]
+
+    def record(self, chat_id, link, message_id=None, posted_at=None):
+        last = self.last(chat_id)
+        if message_id is None and last is not None and link_key(last.link) == link_key(link):
+            return last  # a replica echoing the post we already have
+        entry = PostedLink(chat_id, link, message_id, posted_at or time.time())
+        self._add(entry)
+        self._append(entry)
+        return entry
+
+    def clear(self, chat_id):
+        for entry in self._rings.pop(chat_id, ()):
+            self._index.pop((chat_id, link_key(entry.link)), None)
+
+    def _add(self, entry):
+        ring = self._rings.setdefault(entry.chat_id, deque())
+        ring.append(entry)
+        self._index[(entry.chat_id, link_key(entry.link))] = entry
+        while len(ring) > self.size:
+            old = ring.popleft()
+            key = (old.chat_id, link_key(old.link))
+            if self._index.get(key) is old:
+                del self._index[key]
+
+    # --- Persistence ---
+    def load(self):
+        if self._loaded or not self.path:
+            return
+        self._loaded = True
+        start = time.perf_counter()
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    self._lines += 1
+                    try:
+                        self._add(PostedLink(*json.loads(line)))
+                    except (ValueError, TypeError):
+                        continue  # a line cut short by a crash
+        except FileNotFoundError:
+            return
+        except Exception as e:
+            logger.error(f"[LinkHistory] Could not load {self.path}: {e}")
+            return
+        kept = sum(len(ring) for ring in self._rings.values())
+        logger.info(f"[LinkHistory] Loaded {kept} posts in {len(self._rings)} chats from {self.path} in {(time.perf_counter() - start) * 1000:.1f} ms")
+        self._maybe_compact()
+
+    def _append(self, entry):
+        if not self.path:
+            return
+        try:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(list(entry)) + "\n")
+            self._lines += 1
+        except Exception as e:
+            logger.error(f"[LinkHistory] Could not save to {self.path}: {e}")
+            return
+        self._maybe_compact()
+
+    def _maybe_compact(self):
+        kept = sum(len(ring) for ring in self._rings.values())
+        if self._lines <= 2 * max(kept, self.size):
+            return
+        tmp_path = self.path + ".tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                for entry in sorted((e for ring in self._rings.values() for e in ring), key=lambda e: e.posted_at):
+                    f.write(json.dumps(list(entry)) + "\n")
+            os.replace(tmp_path, self.path)
+            self._lines = kept
+        except Exception as e:
+            logger.error(f"[LinkHistory] Could not rewrite {self.path}: {e}")
+
+link_history = LinkHistory()
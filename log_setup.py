@@ -0,0 +1,78 @@
+import atexit
+import logging
+import os
+import queue
+import sys
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+from config import LOG_PATH, IMPORTANT_LOG_PATH, LOG_MAX_BYTES, LOG_BACKUP_COUNT
+
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+# Admin-facing event log behind /logs; kept out of bot.log and stdout
+important_logger = logging.getLogger("important")
+important_logger.propagate = False
+
+_listener = None
+
+# --- Queue-based logging ---
+# Loggers only put records on an in-memory queue; a QueueListener thread does
+# the formatting and the file/stdout writes, so disk I/O never runs on the
+# event loop. Files rotate by size instead of being rewritten at startup.
+def setup_logging(level=logging.INFO):
+    global _listener
+    if _listener is not None:
+        return
+    formatter = logging.Formatter(LOG_FORMAT)
+    bot_file = RotatingFileHandler(LOG_PATH, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT, encoding="utf-8")
+    bot_file.setFormatter(formatter)
+    stdout = logging.StreamHandler(sys.stdout)
+    stdout.setFormatter(formatter)
+    important_file = RotatingFileHandler(IMPORTANT_LOG_PATH, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT, encoding="utf-8")
+    important_file.setFormatter(logging.Formatter('%(message)s'))
+    # Routes each record to its handlers: important events only to their own file
+    important_file.addFilter(lambda record: record.name == "important")
+    bot_file.addFilter(lambda record: record.name != "important")
+    stdout.addFilter(lambda record: record.name != "important")
+
+    log_queue = queue.SimpleQueue()
+    root = logging.getLogger()
+    root.handlers.clear()
+    root.addHandler(QueueHandler(log_queue))
+    root.setLevel(level)
+    important_logger.handlers.clear()
+    important_logger.addHandler(QueueHandler(log_queue))
+    important_logger.setLevel(logging.INFO)
+
+    _listener = QueueListener(log_queue, bot_file, stdout, important_file, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+
+def stop_logging():
+    # Drains the queue and closes the files; call before os._exit
+    global _listener
+    if _listener is None:
+        return
+    _listener.stop()
+    for handler in _listener.handlers:
+        handler.close()
+    _listener = None
+
+def log_important(event: str):
+    important_logger.info(event)
+
+# --- Log tail ---
+def tail_lines(path, n=20, block_size=4096):
+    # Reads backwards from the end of the file until n lines are found, so the
+    # cost depends on n, not on the size of the log
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        pos = f.tell()
+        data = b""
+        while pos > 0 and data.count(b"\n") <= n:
+            step = min(block_size, pos)
+            pos -= step
+            f.seek(pos)
+            data = f.read(step) + data
+    lines = data.decode("utf-8", errors="replace").splitlines()
+    return lines[-n:]
@@ -0,0 +1,170 @@
+import asyncio
+import functools
+import time
+from bisect import bisect_left
+
+from telegram.request import HTTPXRequest
+
+# --- Minimal Prometheus metrics ---
+# Plain dicts keyed by label values: an update is a dict lookup and an add on
+# the event loop thread, cheap enough for every callback and scrape. /metrics
+# renders the text exposition format on demand.
+PROCESS_START = time.time()
+_registry = []
+
+def uptime():
+    return time.time() - PROCESS_START
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs += [f'{name}="{value}"' for name, value in extra]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self.values = {}
+        _registry.append(self)
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels[name] for name in self.labels)
+        self.values[key] = self.values.get(key, 0) + amount
+
+    def samples(self):
+        for key, value in self.values.items():
+            yield self.name, _format_labels(self.labels, key), value
+
+class Gauge(Counter):
+    # Value comes from `collect` at scrape time (returns a number, or a
+    # {label values: number} dict when the gauge has labels)
+    kind = "gauge"
+
+    def __init__(self, name, help_text, labels=(), collect=None):
+        super().__init__(name, help_text, labels)
+        self.collect = collect
+
+    def set(self, value, **labels):
+        self.values[tuple(labels[name] for name in self.labels)] = value
+
+    def samples(self):
+        if self.collect is not None:
+            collected = self.collect()
+            self.values = collected if isinstance(collected, dict) else {(): collected}
+        yield from super().samples()
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+class Histogram(Counter):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = tuple(labels[name] for name in self.labels)
+        series = self.values.get(key)
+        if series is None:
+            # per-bucket counts (+Inf last), sum, count
+            series = self.values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    def samples(self):
+        for key, (counts, total, count) in self.values.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                yield f"{self.name}_bucket", _format_labels(self.labels, key, (("le", _format_value(bound)),)), cumulative
+            yield f"{self.name}_sum", _format_labels(self.labels, key), total
+            yield f"{self.name}_count", _format_labels(self.labels, key), count
+
+def render():
+    lines = []
+    for metric in _registry:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        for name, labels, value in metric.samples():
+            lines.append(f"{name}{labels} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+# --- Metrics ---
+SCRAPE_SECONDS = Histogram("bot_scrape_seconds", "Scrape latency per stage (main, redirect) and mode (direct, scrapedo)", ("stage", "mode", "result"))
+SCRAPEDO_REQUESTS = Counter("bot_scrapedo_requests_total", "Scrape.do requests per token (sha256 id) and outcome", ("token", "result"))
+TELEGRAM_API_SECONDS = Histogram("bot_telegram_api_seconds", "Telegram Bot API call latency per method", ("method",))
+TELEGRAM_API_RESPONSES = Counter("bot_telegram_api_responses_total", "Telegram Bot API responses per method and HTTP status (429 = flood control)", ("method", "status"))
+VOTE_CALLBACK_SECONDS = Histogram("bot_vote_callback_seconds", "vote_callback handling time; _count is callback throughput", ("result",))
+LOOP_LAG_SECONDS = Histogram("bot_event_loop_lag_seconds", "How late the event loop woke a periodic timer", buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5))
+Gauge("bot_asyncio_tasks", "Pending asyncio tasks on the bot's event loop", collect=lambda: len(asyncio.all_tasks()))
+Gauge("bot_uptime_seconds", "Seconds since the bot process started", collect=uptime)
+Gauge("bot_process_start_time_seconds", "Unix time the bot process started", collect=lambda: PROCESS_START)
+
+# --- Instrumentation helpers ---
+def observe_scrape(stage, mode):
+    # Times a scrape stage; result is "ok" when it returned a link
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            result = "cancelled"
+            try:
+                link = await func(*args, **kwargs)
+                result = "ok" if link else "none"
+                return link
+            except Exception:
+                result = "error"
+                raise
+            finally:
+                SCRAPE_SECONDS.observe(time.perf_counter() - start, stage=stage, mode=mode, result=result)
+        return wrapper
+    return decorator
+
+def observe_handler(histogram):
+    # Times an update handler; result is "error" if it raised
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            result = "error"
+            try:
+                value = await func(*args, **kwargs)
+                result = "ok"
+                return value
+            finally:
+                histogram.observe(time.perf_counter() - start, result=result)
+        return wrapper
+    return decorator
+
+class InstrumentedRequest(HTTPXRequest):
+    # python-telegram-bot transport that records latency and status per API method
+    async def do_request(self, url, method, *args, **kwargs):
+        api_method = url.rsplit("/", 1)[-1]
+        start = time.perf_counter()
+        status = "error"
+        try:
+            code, payload = await super().do_request(url, method, *args, **kwargs)
+            status = str(code)
+            return code, payload
+        finally:
+            TELEGRAM_API_SECONDS.observe(time.perf_counter() - start, method=api_method)
+            TELEGRAM_API_RESPONSES.inc(method=api_method, status=status)
+
+async def monitor_loop_lag(interval=0.5):
+    loop = asyncio.get_running_loop()
+    while True:
+        expected = loop.time() + interval
+        await asyncio.sleep(interval)
+        LOOP_LAG_SECONDS.observe(max(0.0, loop.time() - expected))
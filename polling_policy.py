@@ -0,0 +1,135 @@
+import json
+import logging
+import os
+import random
+import statistics
+
+from config import POLLING_POLICY, CHANGE_HISTORY_PATH
+
+logger = logging.getLogger("polling_policy")
+
+# --- Polling policies ---
+# A policy picks the delay until the next auto-post check. Both honor the
+# admin's /setinterval bounds; they only differ in where inside them they land.
+class UniformPolicy:
+    name = "uniform"
+
+    def next_delay(self, now, min_sec, max_sec):
+        return random.randint(min_sec, max_sec)
+
+    def record_change(self, ts):
+        pass
+
+    def describe(self):
+        return self.name
+
+# Learns when the source link changes (time of day and gaps between changes)
+# and polls densely around likely change windows, sparsely elsewhere. Until
+# MIN_CHANGES have been seen it behaves like UniformPolicy.
+class AdaptivePolicy(UniformPolicy):
+    name = "adaptive"
+    BINS = 48  # half-hour time-of-day bins (UTC)
+    MIN_CHANGES = 5
+    MAX_HISTORY = 500
+    LOOKAHEAD_STEP = 60  # seconds between probes when scanning for a likely window
+    WINDOW_INTENSITY = 2.0  # intensity at which a time counts as a likely change window
+
+    def __init__(self, path=CHANGE_HISTORY_PATH):
+        self.path = path
+        self.changes = []  # unix timestamps of detected link changes, oldest first
+
+    def record_change(self, ts):
+        self.changes.append(ts)
+        del self.changes[:-self.MAX_HISTORY]
+        self.save()
+
+    def _bin(self, ts):
+        return int((ts % 86400) // (86400 / self.BINS))
+
+    def _tod_weights(self):
+        # Relative change rate per bin, smoothed with the neighbouring bins;
+        # 1.0 means "as likely as an average half hour"
+        counts = [1.0] * self.BINS
+        for ts in self.changes:
+            counts[self._bin(ts)] += 1
+        smoothed = [(counts[i - 1] + 2 * counts[i] + counts[(i + 1) % self.BINS]) / 4 for i in range(self.BINS)]
+        mean = sum(smoothed) / self.BINS
+        return [c / mean for c in smoothed]
+
+    def _gap_weight(self, since_last, gaps):
+        # Dense polling once we are inside the usual gap range, sparse right
+        # after a change when another one is unlikely
+        if len(gaps) < 2:
+            return 1.0
+        q1, _, q3 = statistics.quantiles(gaps, n=4)
+        if since_last < q1 * 0.5:
+            return 0.5
+        if q1 <= since_last <= q3:
+            return 1.5
+        return 1.0
+
+    def intensity(self, ts, weights=None, gaps=None):
+        weights = weights if weights is not None else self._tod_weights()
+        if gaps is None:
+            gaps = [b - a for a, b in zip(self.changes, self.changes[1:]) if b > a]
+        since_last = ts - self.changes[-1] if self.changes else 0
+        return weights[self._bin(ts)] * self._gap_weight(since_last, gaps)
+
+    def next_delay(self, now, min_sec, max_sec):
+        if len(self.changes) < self.MIN_CHANGES or max_sec <= min_sec:
+            return super().next_delay(now, min_sec, max_sec)
+        weights = self._tod_weights()
+        gaps = [b - a for a, b in zip(self.changes, self.changes[1:]) if b > a]
+        # Poll at the slow end of the interval unless a change is more likely
+        # than average right now...
+        rate = self.intensity(now, weights, gaps)
+        delay = min(max(max_sec / max(rate, 1.0), min_sec), max_sec)
+        # ...and cut it short if a likely window opens before then
+        t = now + min_sec
+        while t < now + delay:
+            if self.intensity(t, weights, gaps) >= self.WINDOW_INTENSITY:
+                delay = t - now
+                break
+            t += self.LOOKAHEAD_STEP
+        jitter = random.uniform(0.9, 1.1)
+        return int(min(max(delay * jitter, min_sec), max_sec))
+
+    def describe(self):
+        if len(self.changes) < self.MIN_CHANGES:
+            return f"{self.name} (learning, {len(self.changes)}/{self.MIN_CHANGES} changes seen)"
+        return f"{self.name} ({len(self.changes)} changes learned)"
+
+    # --- Persistence ---
+    def load(self):
+        if not self.path:
+            return
+        try:
+            with open(self.path, "r") as f:
+                self.changes = sorted(json.load(f))[-self.MAX_HISTORY:]
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.error(f"[PollingPolicy] Could not load change history from {self.path}: {e}")
+
+    def save(self):
+        if not self.path:
+            return
+        tmp_path = self.path + ".tmp"
+        try:
+            with open(tmp_path, "w") as f:
+                json.dump(self.changes, f)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            logger.error(f"[PollingPolicy] Could not save change history to {self.path}: {e}")
+
+POLICIES = {"uniform": UniformPolicy, "adaptive": AdaptivePolicy}
+
+def make_policy(name=POLLING_POLICY):
+    policy_cls = POLICIES.get(name)
+    if policy_cls is None:
+        logger.warning(f"[PollingPolicy] Unknown policy {name!r}, using uniform")
+        policy_cls = UniformPolicy
+    policy = policy_cls()
+    if hasattr(policy, "load"):
+        policy.load()
+    return policy
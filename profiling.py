@@ -0,0 +1,261 @@
+import asyncio
+import contextvars
+import inspect
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter, deque
+from datetime import datetime, timezone
+
+import aiohttp
+
+from config import LOOP_BLOCK_THRESHOLD
+
+logger = logging.getLogger("profiling")
+
+SAMPLE_INTERVAL = 0.005  # seconds between profiler samples
+TRACE_HISTORY = 50  # scrape runs kept for /timings
+STALL_HISTORY = 200  # loop stalls kept for /looplag
+
+def _describe(code):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+# --- Sampling profiler ---
+# A background thread looks at the event loop thread's stack every
+# SAMPLE_INTERVAL seconds; the loop itself is never paused or traced, so the
+# cost is a few microseconds per sample. Samples where the loop sits in the
+# selector waiting for I/O are counted as idle.
+_profile_lock = threading.Lock()
+
+_ASYNCIO_DIR = os.path.dirname(asyncio.__file__)
+
+def _is_idle(frame):
+    return frame.f_code.co_name in ("select", "poll", "control") and "selectors" in frame.f_code.co_filename
+
+def sample_stacks(thread_id, seconds, interval=SAMPLE_INTERVAL):
+    # Blocking; run it in a worker thread (asyncio.to_thread)
+    own, cumulative = Counter(), Counter()
+    samples = idle = 0
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        frame = sys._current_frames().get(thread_id)
+        if frame is not None:
+            samples += 1
+            if _is_idle(frame):
+                idle += 1
+            else:
+                own[_describe(frame.f_code)] += 1
+                seen = set()
+                while frame is not None:
+                    key = _describe(frame.f_code)
+                    # Event loop plumbing is in every stack; leave it out of the totals
+                    if key not in seen and not frame.f_code.co_filename.startswith(_ASYNCIO_DIR):
+                        seen.add(key)
+                        cumulative[key] += 1
+                    frame = frame.f_back
+        time.sleep(interval)
+    return samples, idle, own, cumulative
+
+async def profile_loop(seconds, top=10):
+    if not _profile_lock.acquire(blocking=False):
+        return "A profile is already running."
+    try:
+        samples, idle, own, cumulative = await asyncio.to_thread(sample_stacks, threading.get_ident(), seconds)
+    finally:
+        _profile_lock.release()
+    if not samples:
+        return "No samples collected."
+    busy = samples - idle
+    lines = [f"{samples} samples over {seconds}s, loop busy {busy * 100 / samples:.1f}%"]
+    if busy:
+        lines.append("")
+        lines.append("Top functions (own time):")
+        lines += [f"{count * 100 / samples:5.1f}%  {name}" for name, count in own.most_common(top)]
+        lines.append("")
+        lines.append("Top functions (incl. callees):")
+        lines += [f"{count * 100 / samples:5.1f}%  {name}" for name, count in cumulative.most_common(top)]
+    return "\n".join(lines)
+
+# --- Per-stage scrape timings ---
+# Each get_latest_canva_link run gets a ScrapeTrace (carried in a contextvar, so
+# hedged and parallel requests started from it report into the same trace).
+# Every HTTP request records DNS/connect via aiohttp's TraceConfig, time to
+# first byte, body download, regex scanning and fallback parser time.
+class RequestTiming:
+    __slots__ = ("stage", "via", "status", "dns", "connect", "ttfb", "download", "regex", "parse",
+                 "_start", "_dns_start", "_connect_start", "_headers_at")
+
+    def __init__(self, stage, via):
+        self.stage = stage
+        self.via = via
+        self.status = None
+        self.dns = self.connect = self.ttfb = self.download = self.regex = self.parse = 0.0
+        self._start = time.perf_counter()
+        self._dns_start = self._connect_start = self._headers_at = None
+
+    def headers_received(self):
+        self._headers_at = time.perf_counter()
+        # connect already includes the DNS lookup (aiohttp resolves while creating the connection)
+        self.ttfb = self._headers_at - self._start - self.connect
+
+    def finish(self, status):
+        self.status = status
+        if self._headers_at is not None:
+            self.download = max(0.0, time.perf_counter() - self._headers_at - self.regex)
+
+    def describe(self):
+        ms = lambda value: f"{value * 1000:.0f}"
+        return (
+            f"{self.stage}/{self.via} {self.status}: dns {ms(self.dns)} connect {ms(max(0.0, self.connect - self.dns))} "
+            f"ttfb {ms(self.ttfb)} download {ms(self.download)} regex {ms(self.regex)} parse {ms(self.parse)} ms"
+        )
+
+class ScrapeTrace:
+    def __init__(self):
+        self.started = time.time()
+        self._start = time.perf_counter()
+        self.total = None
+        self.result = None
+        self.notes = []
+        self.requests = []
+
+    def describe(self):
+        started = datetime.fromtimestamp(self.started, tz=timezone.utc).strftime("%Y-%m-%d %H:%M:%S UTC")
+        total = f"{self.total:.2f}s" if self.total is not None else "running"
+        notes = f" ({', '.join(self.notes)})" if self.notes else ""
+        lines = [f"{started}, {total}, {self.result or 'no link'}{notes}"]
+        lines += [f"  {timing.describe()}" for timing in self.requests]
+        return "\n".join(lines)
+
+_current_trace = contextvars.ContextVar("scrape_trace", default=None)
+recent_traces = deque(maxlen=TRACE_HISTORY)
+
+def start_trace():
+    trace = ScrapeTrace()
+    recent_traces.append(trace)
+    _current_trace.set(trace)
+    return trace
+
+def finish_trace(trace, link):
+    trace.total = time.perf_counter() - trace._start
+    trace.result = "ok" if link else None
+
+def trace_note(note):
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.notes.append(note)
+
+def new_request_timing(stage, via):
+    timing = RequestTiming(stage, via)
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.requests.append(timing)
+    return timing
+
+def format_recent_traces(count):
+    traces = list(recent_traces)[-count:]
+    if not traces:
+        return "No scrapes recorded yet."
+    return "\n\n".join(trace.describe() for trace in reversed(traces))
+
+async def _on_dns_start(session, ctx, params):
+    if isinstance(ctx.trace_request_ctx, RequestTiming):
+        ctx.trace_request_ctx._dns_start = time.perf_counter()
+
+async def _on_dns_end(session, ctx, params):
+    timing = ctx.trace_request_ctx
+    if isinstance(timing, RequestTiming) and timing._dns_start is not None:
+        timing.dns += time.perf_counter() - timing._dns_start
+
+async def _on_connect_start(session, ctx, params):
+    if isinstance(ctx.trace_request_ctx, RequestTiming):
+        ctx.trace_request_ctx._connect_start = time.perf_counter()
+
+async def _on_connect_end(session, ctx, params):
+    timing = ctx.trace_request_ctx
+    if isinstance(timing, RequestTiming) and timing._connect_start is not None:
+        timing.connect += time.perf_counter() - timing._connect_start
+
+def make_trace_config():
+    trace_config = aiohttp.TraceConfig()
+    trace_config.on_dns_resolvehost_start.append(_on_dns_start)
+    trace_config.on_dns_resolvehost_end.append(_on_dns_end)
+    trace_config.on_connection_create_start.append(_on_connect_start)
+    trace_config.on_connection_create_end.append(_on_connect_end)
+    return trace_config
+
+# --- Event loop stall watchdog ---
+# A coroutine bumps a heartbeat every `interval`; a watchdog thread notices when
+# the heartbeat goes stale for longer than LOOP_BLOCK_THRESHOLD and looks at the
+# loop thread's stack to see which coroutine is holding it.
+def _blocking_coroutine(frame):
+    # Innermost coroutine frame (the task step that is running synchronously)
+    # plus the function it is stuck in
+    leaf = _describe(frame.f_code)
+    while frame is not None:
+        if frame.f_code.co_flags & (inspect.CO_COROUTINE | inspect.CO_ITERABLE_COROUTINE | inspect.CO_ASYNC_GENERATOR):
+            return _describe(frame.f_code), leaf
+        frame = frame.f_back
+    return "(no coroutine, loop callback)", leaf
+
+class LoopWatchdog:
+    def __init__(self, threshold=LOOP_BLOCK_THRESHOLD, interval=0.05):
+        self.threshold = threshold
+        self.interval = interval
+        self.stalls = deque(maxlen=STALL_HISTORY)  # (wall time, seconds, coroutine, leaf)
+        self.totals = Counter()  # coroutine: seconds blocked
+        self.worst = {}  # coroutine: longest single stall
+        self._beat = time.monotonic()
+        self._thread = None
+        self._thread_id = None
+        self._stop = threading.Event()
+
+    async def run(self):
+        self._thread_id = threading.get_ident()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._thread.start()
+        try:
+            while True:
+                self._beat = time.monotonic()
+                await asyncio.sleep(self.interval)
+        finally:
+            self._stop.set()
+
+    def _watch(self):
+        stalled_since = None
+        culprit = None
+        while not self._stop.wait(self.interval / 2):
+            stale = time.monotonic() - self._beat - self.interval
+            if stale > self.threshold:
+                if stalled_since is None:
+                    stalled_since = self._beat + self.interval
+                    frame = sys._current_frames().get(self._thread_id)
+                    culprit = _blocking_coroutine(frame) if frame is not None else ("(unknown)", "(unknown)")
+            elif stalled_since is not None:
+                self._record(self._beat - stalled_since, *culprit)
+                stalled_since = culprit = None
+
+    def _record(self, seconds, coroutine, leaf):
+        seconds = max(seconds, self.threshold)
+        self.stalls.append((time.time(), seconds, coroutine, leaf))
+        self.totals[coroutine] += seconds
+        self.worst[coroutine] = max(self.worst.get(coroutine, 0.0), seconds)
+        logger.warning(f"[LoopWatchdog] Event loop blocked {seconds * 1000:.0f}ms in {coroutine} -> {leaf}")
+
+    def report(self, top=10):
+        if not self.stalls:
+            return f"No event loop stalls over {self.threshold * 1000:.0f}ms recorded."
+        lines = [f"Stalls over {self.threshold * 1000:.0f}ms: {len(self.stalls)} recent", "", "Longest blockers (total / worst):"]
+        for coroutine, total in self.totals.most_common(top):
+            lines.append(f"{total:6.2f}s / {self.worst[coroutine]:.2f}s  {coroutine}")
+        lines.append("")
+        lines.append("Last stalls:")
+        for ts, seconds, coroutine, leaf in list(self.stalls)[-5:]:
+            when = datetime.fromtimestamp(ts, tz=timezone.utc).strftime("%H:%M:%S")
+            lines.append(f"{when} {seconds * 1000:.0f}ms {coroutine} -> {leaf}")
+        return "\n".join(lines)
+
+loop_watchdog = LoopWatchdog()
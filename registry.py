@@ -0,0 +1,129 @@
+import asyncio
+import json
+import logging
+
+from config import SOURCES_CONFIG, MAIN_URL, CHANNEL_ID, CHAT_SEND_INTERVAL
+from extractors import make_rule
+from link_history import link_history
+from scrape_cache import MainPageCache, main_page_cache
+
+logger = logging.getLogger("registry")
+
+# --- Sources ---
+# A page to scrape and the rule that finds the link on it (see
+# extractors.make_rule). Each source has its own conditional-request cache
+# and single-flight state, so sources are scraped independently.
+class Source:
+    def __init__(self, name, url, rule="su_button", pattern=None, page_cache=None):
+        self.name = name
+        self.url = url
+        self.rule = rule
+        self.matcher, self.extract = make_rule(rule, pattern)
+        self.page_cache = page_cache or MainPageCache()
+        self.inflight = None  # future of the scrape in flight
+        self.last_scrape = None  # (link, monotonic time)
+
+    def __repr__(self):
+        return f"Source({self.name}, {self.url}, {self.rule})"
+
+# --- Per-chat pacing ---
+# Sends to one chat are spaced at least `interval` seconds apart (Telegram
+# throttles bursts into a single chat); different chats don't wait on each other.
+class ChatRateLimiter:
+    def __init__(self, interval=CHAT_SEND_INTERVAL):
+        self.interval = interval
+        self._lock = asyncio.Lock()
+        self._next_at = 0.0
+
+    async def __aenter__(self):
+        await self._lock.acquire()
+        loop = asyncio.get_running_loop()
+        delay = self._next_at - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return self
+
+    async def __aexit__(self, *exc):
+        # max(): a pause() taken inside the block outlasts the normal spacing
+        self._next_at = max(self._next_at, asyncio.get_running_loop().time() + self.interval)
+        self._lock.release()
+
+    def pause(self, seconds):
+        # Flood control (RetryAfter) for this chat
+        self._next_at = max(self._next_at, asyncio.get_running_loop().time() + seconds)
+
+# --- Channels ---
+# A target chat and the sources it subscribes to (in priority order). What was
+# posted there lives in link_history, so each channel is deduplicated on its
+# own, by every posting path, across restarts.
+class Channel:
+    def __init__(self, chat_id, sources):
+        self.chat_id = chat_id
+        self.sources = tuple(sources)
+        self.limiter = ChatRateLimiter()
+
+    @property
+    def last_post(self):
+        return link_history.last(self.chat_id)
+
+    @property
+    def last_posted_link(self):
+        post = self.last_post
+        return post.link if post else None
+
+    def is_new(self, link):
+        return not link_history.has_posted(self.chat_id, link)
+
+    def remember(self, link, message_id=None):
+        link_history.record(self.chat_id, link, message_id)
+
+    @property
+    def setting_key(self):
+        # Shared-state key for this channel's last posted link (replicas.py)
+        return f"last_posted_link:{self.chat_id}"
+
+    def __repr__(self):
+        return f"Channel({self.chat_id}, {list(self.sources)})"
+
+# --- Registry ---
+# SOURCES_CONFIG names a JSON file:
+#   {"sources": [{"name": "bingotingo", "url": "https://...", "rule": "su_button"},
+#                {"name": "other", "url": "https://...", "rule": "regex", "pattern": "href=\"(/go/[^\"]+)\""}],
+#    "channels": [{"chat_id": "@main_channel", "sources": ["bingotingo", "other"]},
+#                 {"chat_id": -1001234567890, "sources": ["other"]}]}
+# A channel without "sources" subscribes to all of them. Without a file the
+# registry is MAIN_URL -> CHANNEL_ID, as before.
+def load_registry(path=SOURCES_CONFIG):
+    if not path:
+        source = Source("main", MAIN_URL, page_cache=main_page_cache)
+        return {source.name: source}, [Channel(CHANNEL_ID, [source.name])]
+    with open(path, "r") as f:
+        data = json.load(f)
+    loaded = {}
+    for entry in data.get("sources", []):
+        if entry["name"] in loaded:
+            raise ValueError(f"Duplicate source name in {path}: {entry['name']}")
+        loaded[entry["name"]] = Source(entry["name"], entry["url"], entry.get("rule", "su_button"), entry.get("pattern"))
+    if not loaded:
+        raise ValueError(f"No sources defined in {path}")
+    targets = []
+    for entry in data.get("channels", []):
+        names = entry.get("sources") or list(loaded)
+        unknown = [name for name in names if name not in loaded]
+        if unknown:
+            raise ValueError(f"Channel {entry['chat_id']} subscribes to unknown sources: {unknown}")
+        targets.append(Channel(entry["chat_id"], names))
+    if not targets:
+        targets.append(Channel(CHANNEL_ID, list(loaded)))
+    logger.info(f"[Registry] {len(loaded)} sources, {len(targets)} channels from {path}")
+    return loaded, targets
+
+sources, channels = load_registry()
+
+def default_source():
+    return next(iter(sources.values()))
+
+def subscribed_sources():
+    # Sources at least one channel subscribes to, in registry order
+    wanted = {name for channel in channels for name in channel.sources}
+    return [source for name, source in sources.items() if name in wanted]
@@ -0,0 +1,409 @@
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from config import STATE_BACKEND_URL, REPLICA_ID, LEADER_LEASE_TTL, STATE_SYNC_INTERVAL, VOTE_RETENTION
+from metrics import Gauge
+
+logger = logging.getLogger("replicas")
+
+SHARED_VOTE_TTL = 30 * 86400  # Redis backend: vote keys expire after this many seconds
+
+# --- Shared state backends ---
+# Both backends offer the same small async API:
+#   settings:  get_settings() -> {key: json}, set_setting(key, json)
+#   leases:    acquire_lease(name, owner, ttl) (also renews), release_lease(name, owner)
+#   votes:     add_vote(...) -> (added, working, not_working), get_counts(...),
+#              apply_ops([...]) for queued create/set/add writes from VoteStore;
+#              posts are keyed by (chat_id, message_id) as in vote_store.py
+STATE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS settings (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS leases (
+    name TEXT PRIMARY KEY,
+    owner TEXT NOT NULL,
+    expires REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS votes (
+    chat_id INTEGER NOT NULL,
+    message_id INTEGER NOT NULL,
+    working INTEGER NOT NULL DEFAULT 0,
+    not_working INTEGER NOT NULL DEFAULT 0,
+    good_emoji TEXT,
+    bad_emoji TEXT,
+    PRIMARY KEY (chat_id, message_id)
+);
+CREATE TABLE IF NOT EXISTS voters (
+    chat_id INTEGER NOT NULL,
+    message_id INTEGER NOT NULL,
+    user_id INTEGER NOT NULL,
+    PRIMARY KEY (chat_id, message_id, user_id)
+) WITHOUT ROWID;
+"""
+
+VOTE_COLUMNS = {"vote_working": "working", "vote_not_working": "not_working"}
+
+@contextmanager
+def _transaction(conn):
+    # BEGIN IMMEDIATE takes the write lock up front, so read-then-write
+    # sequences (leases, vote checks) can't interleave between replicas
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
+
+class SqliteStateBackend:
+    # One SQLite file (WAL) shared by replicas on the same host or volume.
+    # Calls run on a worker thread; old posts are pruned beyond VOTE_RETENTION.
+    def __init__(self, path, retention=VOTE_RETENTION):
+        self.path = path
+        self.retention = retention
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def describe(self):
+        return f"sqlite:{self.path}"
+
+    def _run(self, fn, *args):
+        with self._lock:
+            if self._conn is None:
+                self._conn = sqlite3.connect(self.path, timeout=10, isolation_level=None, check_same_thread=False)
+                self._conn.execute("PRAGMA journal_mode=WAL")
+                self._conn.execute("PRAGMA synchronous=NORMAL")
+                self._conn.executescript(STATE_SCHEMA)
+            return fn(self._conn, *args)
+
+    async def _call(self, fn, *args):
+        return await asyncio.to_thread(self._run, fn, *args)
+
+    # Settings
+    async def get_settings(self):
+        return await self._call(lambda conn: dict(conn.execute("SELECT key, value FROM settings")))
+
+    async def set_setting(self, key, value):
+        await self._call(lambda conn: conn.execute(
+            "INSERT INTO settings (key, value) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET value = excluded.value", (key, value)))
+
+    # Leases
+    @staticmethod
+    def _acquire(conn, name, owner, ttl):
+        now = time.time()
+        with _transaction(conn):
+            row = conn.execute("SELECT owner, expires FROM leases WHERE name = ?", (name,)).fetchone()
+            if row is not None and row[0] != owner and row[1] > now:
+                return False
+            conn.execute(
+                "INSERT INTO leases (name, owner, expires) VALUES (?, ?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET owner = excluded.owner, expires = excluded.expires",
+                (name, owner, now + ttl),
+            )
+        return True
+
+    async def acquire_lease(self, name, owner, ttl):
+        return await self._call(self._acquire, name, owner, ttl)
+
+    async def release_lease(self, name, owner):
+        await self._call(lambda conn: conn.execute("DELETE FROM leases WHERE name = ? AND owner = ?", (name, owner)))
+
+    # Votes
+    @staticmethod
+    def _add_vote(conn, key, user_id, action, emoji_pair):
+        with _transaction(conn):
+            conn.execute("INSERT OR IGNORE INTO votes (chat_id, message_id, good_emoji, bad_emoji) VALUES (?, ?, ?, ?)", (*key, *emoji_pair))
+            added = conn.execute("INSERT OR IGNORE INTO voters (chat_id, message_id, user_id) VALUES (?, ?, ?)", (*key, user_id)).rowcount == 1
+            column = VOTE_COLUMNS.get(action)
+            if added and column:
+                conn.execute(f"UPDATE votes SET {column} = {column} + 1 WHERE chat_id = ? AND message_id = ?", key)
+            working, not_working = conn.execute("SELECT working, not_working FROM votes WHERE chat_id = ? AND message_id = ?", key).fetchone()
+        return added, working, not_working
+
+    async def add_vote(self, key, user_id, action, emoji_pair):
+        return await self._call(self._add_vote, key, user_id, action, emoji_pair)
+
+    async def get_counts(self, key):
+        return await self._call(lambda conn: conn.execute(
+            "SELECT working, not_working FROM votes WHERE chat_id = ? AND message_id = ?", key).fetchone())
+
+    def _apply_ops(self, conn, ops):
+        created = False
+        with _transaction(conn):
+            for op, key, *args in ops:
+                if op == "create":
+                    emoji_pair, working, not_working = args
+                    conn.execute(
+                        "INSERT OR IGNORE INTO votes (chat_id, message_id, working, not_working, good_emoji, bad_emoji) VALUES (?, ?, ?, ?, ?, ?)",
+                        (*key, working, not_working, *emoji_pair))
+                    created = True
+                elif op == "set":
+                    working, not_working = args
+                    conn.execute(
+                        "UPDATE votes SET working = COALESCE(?, working), not_working = COALESCE(?, not_working) WHERE chat_id = ? AND message_id = ?",
+                        (working, not_working, *key))
+                elif op == "add":
+                    working, not_working = args
+                    conn.execute("UPDATE votes SET working = working + ?, not_working = not_working + ? WHERE chat_id = ? AND message_id = ?",
+                                 (working, not_working, *key))
+            if created:
+                # rowid follows insertion order across chats
+                cutoff = conn.execute("SELECT rowid FROM votes ORDER BY rowid DESC LIMIT 1 OFFSET ?", (self.retention,)).fetchone()
+                if cutoff is not None:
+                    conn.execute("DELETE FROM votes WHERE rowid <= ?", (cutoff[0],))
+                    conn.execute("DELETE FROM voters WHERE NOT EXISTS (SELECT 1 FROM votes "
+                                 "WHERE votes.chat_id = voters.chat_id AND votes.message_id = voters.message_id)")
+
+    async def apply_ops(self, ops):
+        await self._call(self._apply_ops, ops)
+
+    async def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+# Lease and vote updates run as Lua scripts so each one is atomic on the server
+_ACQUIRE_LUA = """
+local owner = redis.call('GET', KEYS[1])
+if owner == false or owner == ARGV[1] then
+    redis.call('SET', KEYS[1], ARGV[1], 'PX', ARGV[2])
+    return 1
+end
+return 0
+"""
+_RELEASE_LUA = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+_ADD_VOTE_LUA = """
+if redis.call('HSETNX', KEYS[1], 'working', 0) == 1 then
+    redis.call('HSET', KEYS[1], 'not_working', 0, 'good', ARGV[4], 'bad', ARGV[5])
+end
+local added = redis.call('SADD', KEYS[2], ARGV[1])
+if added == 1 and ARGV[2] ~= '' then
+    redis.call('HINCRBY', KEYS[1], ARGV[2], 1)
+end
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+redis.call('EXPIRE', KEYS[2], ARGV[3])
+local counts = redis.call('HMGET', KEYS[1], 'working', 'not_working')
+return {added, tonumber(counts[1]) or 0, tonumber(counts[2]) or 0}
+"""
+
+class RedisStateBackend:
+    # Any Redis-compatible server (Redis, Valkey, KeyDB, ...); needs the
+    # optional `redis` package. Vote keys expire after SHARED_VOTE_TTL.
+    def __init__(self, url, prefix="supreme:", vote_ttl=SHARED_VOTE_TTL):
+        try:
+            import redis.asyncio as redis_asyncio
+        except ImportError:
+            raise RuntimeError("STATE_BACKEND_URL points at Redis but the 'redis' package is not installed (pip install redis)")
+        self.url = url
+        self.prefix = prefix
+        self.vote_ttl = vote_ttl
+        self._redis = redis_asyncio.from_url(url, decode_responses=True)
+        self._acquire = self._redis.register_script(_ACQUIRE_LUA)
+        self._release = self._redis.register_script(_RELEASE_LUA)
+        self._add_vote = self._redis.register_script(_ADD_VOTE_LUA)
+
+    def describe(self):
+        return f"redis:{self.url.split('@')[-1]}"  # without credentials
+
+    def _votes_key(self, key):
+        chat_id, message_id = key
+        return f"{self.prefix}votes:{chat_id}:{message_id}"
+
+    def _voters_key(self, key):
+        chat_id, message_id = key
+        return f"{self.prefix}voters:{chat_id}:{message_id}"
+
+    async def get_settings(self):
+        return await self._redis.hgetall(f"{self.prefix}settings")
+
+    async def set_setting(self, key, value):
+        await self._redis.hset(f"{self.prefix}settings", key, value)
+
+    async def acquire_lease(self, name, owner, ttl):
+        return bool(await self._acquire(keys=[f"{self.prefix}lease:{name}"], args=[owner, int(ttl * 1000)]))
+
+    async def release_lease(self, name, owner):
+        await self._release(keys=[f"{self.prefix}lease:{name}"], args=[owner])
+
+    async def add_vote(self, key, user_id, action, emoji_pair):
+        added, working, not_working = await self._add_vote(
+            keys=[self._votes_key(key), self._voters_key(key)],
+            args=[user_id, VOTE_COLUMNS.get(action, ""), self.vote_ttl, *emoji_pair],
+        )
+        return added == 1, working, not_working
+
+    async def get_counts(self, key):
+        working, not_working = await self._redis.hmget(self._votes_key(key), "working", "not_working")
+        if working is None:
+            return None
+        return int(working), int(not_working or 0)
+
+    async def apply_ops(self, ops):
+        async with self._redis.pipeline(transaction=True) as pipe:
+            for op, post, *args in ops:
+                key = self._votes_key(post)
+                if op == "create":
+                    emoji_pair, working, not_working = args
+                    pipe.hsetnx(key, "working", working)
+                    pipe.hsetnx(key, "not_working", not_working)
+                    pipe.hset(key, mapping={"good": emoji_pair[0], "bad": emoji_pair[1]})
+                    pipe.expire(key, self.vote_ttl)
+                elif op == "set":
+                    working, not_working = args
+                    fields = {name: value for name, value in (("working", working), ("not_working", not_working)) if value is not None}
+                    if fields:
+                        pipe.hset(key, mapping=fields)
+                elif op == "add":
+                    working, not_working = args
+                    pipe.hincrby(key, "working", working)
+                    pipe.hincrby(key, "not_working", not_working)
+            await pipe.execute()
+
+    async def close(self):
+        await self._redis.aclose()
+
+def open_backend(url):
+    # sqlite:///relative.db, sqlite:////absolute/path.db, redis://host:6379/0
+    if url.startswith("sqlite:///"):
+        return SqliteStateBackend(url[len("sqlite:///"):])
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisStateBackend(url)
+    raise ValueError(f"Unsupported STATE_BACKEND_URL: {url}")
+
+# --- Replica coordination ---
+# Off unless STATE_BACKEND_URL is set; then every replica shares votes and
+# admin settings through the backend, and lease-guarded tasks (the auto-poster)
+# run on exactly one of them. Settings are polled every STATE_SYNC_INTERVAL.
+class ReplicaCoordinator:
+    def __init__(self, replica_id=REPLICA_ID, lease_ttl=LEADER_LEASE_TTL, sync_interval=STATE_SYNC_INTERVAL):
+        self.backend = None
+        self.replica_id = replica_id
+        self.lease_ttl = lease_ttl
+        self.sync_interval = sync_interval
+        self._handlers = {}  # setting key: [(apply, on_start)]
+        self._applied = {}  # setting key: last JSON value seen or published
+        self._leases = {}  # lease name: held (bool)
+        self._ready = asyncio.Event()
+        self._closing = False
+
+    @property
+    def enabled(self):
+        return self.backend is not None
+
+    async def start(self, url=STATE_BACKEND_URL):
+        if url:
+            self.backend = open_backend(url)
+            await self.sync(initial=True)
+            logger.info(f"[Replicas] {self.replica_id} sharing state via {self.backend.describe()}")
+        self._ready.set()
+
+    async def close(self):
+        self._closing = True
+        if self.backend is None:
+            return
+        for name, held in self._leases.items():
+            if held:
+                try:
+                    await self.backend.release_lease(name, self.replica_id)
+                    logger.info(f"[Replicas] Released lease '{name}'")
+                except Exception as e:
+                    logger.warning(f"[Replicas] Could not release lease '{name}': {e}")
+        await self.backend.close()
+
+    # --- Settings ---
+    def on_setting(self, key, apply, on_start=True):
+        # `apply(value)` runs when another replica publishes `key`; on_start=False
+        # for one-shot triggers that should not fire on the initial sync
+        self._handlers.setdefault(key, []).append((apply, on_start))
+
+    async def publish(self, key, value):
+        if self.backend is None:
+            return
+        encoded = json.dumps(value)
+        self._applied[key] = encoded  # already applied locally by the caller
+        try:
+            await self.backend.set_setting(key, encoded)
+        except Exception as e:
+            logger.error(f"[Replicas] Could not publish {key}: {e}")
+
+    async def sync(self, initial=False):
+        for key, encoded in (await self.backend.get_settings()).items():
+            if self._applied.get(key) == encoded:
+                continue
+            self._applied[key] = encoded
+            for apply, on_start in self._handlers.get(key, ()):
+                if initial and not on_start:
+                    continue
+                try:
+                    apply(json.loads(encoded))
+                except Exception as e:
+                    logger.error(f"[Replicas] Could not apply {key}={encoded}: {e}")
+
+    async def run_sync(self):
+        if self.backend is None:
+            return
+        while not self._closing:
+            await asyncio.sleep(self.sync_interval)
+            try:
+                await self.sync()
+            except Exception as e:
+                logger.warning(f"[Replicas] Settings sync failed: {e}")
+
+    # --- Leader election ---
+    def is_leader(self, name):
+        return self.backend is None or self._leases.get(name, False)
+
+    async def run_as_leader(self, name, factory):
+        # Runs factory() while this replica holds the `name` lease, renewing it
+        # every lease_ttl / 3; steps down as soon as a renewal fails. Without a
+        # backend there is nobody to coordinate with, so it just runs.
+        await self._ready.wait()
+        if self.backend is None:
+            await factory()
+            return
+        self._leases[name] = False
+        task = None
+        try:
+            while not self._closing:
+                try:
+                    held = await self.backend.acquire_lease(name, self.replica_id, self.lease_ttl)
+                except Exception as e:
+                    logger.warning(f"[Replicas] Lease '{name}' renewal failed: {e}")
+                    held = False
+                if held and (task is None or task.done()):
+                    if task is None:
+                        logger.info(f"[Replicas] {self.replica_id} is now leader for '{name}'")
+                        # Catch up on settings (last posted link, interval) before acting
+                        try:
+                            await self.sync()
+                        except Exception as e:
+                            logger.warning(f"[Replicas] Settings sync failed: {e}")
+                    else:
+                        logger.error(f"[Replicas] '{name}' task exited, restarting it")
+                    task = asyncio.create_task(factory())
+                elif not held and task is not None:
+                    logger.warning(f"[Replicas] {self.replica_id} lost lease '{name}', stepping down")
+                    task.cancel()
+                    task = None
+                self._leases[name] = held
+                await asyncio.sleep(self.lease_ttl / 3)
+        finally:
+            if task is not None:
+                task.cancel()
+
+replicas = ReplicaCoordinator()
+
+REPLICA_LEADER = Gauge("bot_replica_leader", "1 while this replica holds the named lease", ("lease",),
+                       collect=lambda: {(name,): int(held) for name, held in replicas._leases.items()})
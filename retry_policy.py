@@ -0,0 +1,102 @@
+import asyncio
+import logging
+import random
+import time
+
+import aiohttp
+
+from config import HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT, HTTP_TIMEOUT, SCRAPE_RETRY_ATTEMPTS, SCRAPE_RETRY_BASE_DELAY, SCRAPE_RETRY_MAX_DELAY, SCRAPE_DEADLINE
+from metrics import Counter
+
+logger = logging.getLogger("retry_policy")
+
+SCRAPE_RETRIES = Counter("bot_scrape_retries_total", "Scrape requests retried after a retryable failure", ("stage",))
+
+# Worth another try: the server or the path to it had a bad moment
+RETRYABLE_STATUSES = (408, 425, 429, 500, 502, 503, 504)
+
+class RetryableError(Exception):
+    pass
+
+class FatalError(Exception):
+    pass
+
+def check_status(status):
+    # 304 and 2xx pass; a retryable status or any other 4xx/5xx raises
+    if status in RETRYABLE_STATUSES:
+        raise RetryableError(f"HTTP {status}")
+    if isinstance(status, int) and status >= 400:
+        raise FatalError(f"HTTP {status}")
+
+def is_retryable(error):
+    if isinstance(error, (RetryableError, asyncio.TimeoutError)):
+        return True
+    if isinstance(error, aiohttp.ClientResponseError):
+        return error.status in RETRYABLE_STATUSES
+    # Connection refused/reset, DNS hiccups, server disconnects, truncated bodies
+    return isinstance(error, (aiohttp.ClientConnectionError, aiohttp.ClientPayloadError))
+
+def describe(error):
+    return f"{type(error).__name__}: {error}" if str(error) else type(error).__name__
+
+# --- Deadline ---
+# One time budget for a whole operation (an auto-post cycle, a /post), passed
+# down to every stage and request so retries and slow hosts can't run past it.
+class Deadline:
+    def __init__(self, seconds=SCRAPE_DEADLINE):
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self):
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self):
+        return self.remaining() <= 0
+
+    def __repr__(self):
+        return f"Deadline({self.remaining():.1f}s of {self.seconds:.0f}s left)"
+
+# --- Retry policy ---
+# Per request: HTTP_CONNECT_TIMEOUT to connect, HTTP_READ_TIMEOUT between reads
+# and never more than HTTP_TIMEOUT or what is left of the deadline in total.
+# Retryable failures are retried with full-jitter exponential backoff; fatal
+# ones (other 4xx, a page without a link, bad URLs) and anything that would
+# not fit in the deadline are raised right away.
+class RetryPolicy:
+    def __init__(self, attempts=SCRAPE_RETRY_ATTEMPTS, base_delay=SCRAPE_RETRY_BASE_DELAY, max_delay=SCRAPE_RETRY_MAX_DELAY,
+                 connect_timeout=HTTP_CONNECT_TIMEOUT, read_timeout=HTTP_READ_TIMEOUT, total_timeout=HTTP_TIMEOUT):
+        self.attempts = attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.total_timeout = total_timeout
+
+    def backoff(self, attempt):
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def timeout(self, deadline=None):
+        total = self.total_timeout if deadline is None else min(self.total_timeout, deadline.remaining())
+        # aiohttp treats 0 as "no timeout"
+        return aiohttp.ClientTimeout(total=max(total, 0.01), sock_connect=self.connect_timeout, sock_read=self.read_timeout)
+
+    async def call(self, attempt, deadline=None, stage="scrape"):
+        # attempt: coroutine factory, called once per try
+        for n in range(self.attempts):
+            if deadline is not None and deadline.expired():
+                raise asyncio.TimeoutError(f"{stage}: deadline of {deadline.seconds:.0f}s exceeded")
+            try:
+                return await attempt()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if n + 1 >= self.attempts or not is_retryable(e):
+                    raise
+                delay = self.backoff(n)
+                if deadline is not None and delay >= deadline.remaining():
+                    raise
+                SCRAPE_RETRIES.inc(stage=stage)
+                logger.info(f"[Retry] {stage} failed ({describe(e)}), retry {n + 1}/{self.attempts - 1} in {delay:.2f}s")
+                await asyncio.sleep(delay)
+
+retry_policy = RetryPolicy()
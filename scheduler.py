@@ -0,0 +1,114 @@
+import asyncio
+import json
+import logging
+import os
+import random
+import time
+from datetime import datetime, timezone
+
+from config import SCHEDULER_STATE_PATH
+
+logger = logging.getLogger("scheduler")
+
+# --- Auto-post scheduler ---
+# Sleeps exactly until the next jittered due time. Interval changes and manual
+# "run now" triggers wake it through an event instead of polling, and the due
+# time is persisted so a restart continues the current cycle.
+class AutoPostScheduler:
+    def __init__(self, min_sec=900, max_sec=1800, state_path=SCHEDULER_STATE_PATH, clock=time.time, policy=None):
+        self.min_sec = min_sec
+        self.max_sec = max_sec
+        self.state_path = state_path
+        self.clock = clock
+        self.policy = policy  # polling_policy object; None = uniform random delay
+        self.next_due = None  # wall clock seconds
+        self._wake = asyncio.Event()
+        self._run_now = False
+        self._loaded = False
+
+    def next_delay(self):
+        if self.policy is not None:
+            return self.policy.next_delay(self.clock(), self.min_sec, self.max_sec)
+        return random.randint(self.min_sec, self.max_sec)
+
+    def record_change(self):
+        # A new link was detected now; lets the policy learn the change pattern
+        if self.policy is not None:
+            self.policy.record_change(self.clock())
+
+    def schedule_next(self, delay=None):
+        if delay is None:
+            delay = self.next_delay()
+        self.next_due = self.clock() + delay
+        self.save()
+        return delay
+
+    def set_interval(self, min_sec, max_sec):
+        if (min_sec, max_sec) == (self.min_sec, self.max_sec) and self.next_due is not None:
+            # Same interval (e.g. the shared setting re-applied on start or
+            # failover): keep the current, possibly restored, due time
+            return
+        self.min_sec = min_sec
+        self.max_sec = max_sec
+        delay = self.schedule_next()
+        logger.info(f"[Scheduler] Interval set to {min_sec}-{max_sec}s, next run in {delay}s")
+        self._wake.set()
+
+    def run_now(self):
+        self._run_now = True
+        self._wake.set()
+
+    async def wait_until_due(self):
+        # Returns once the due time is reached or run_now() was called
+        while True:
+            if self._run_now:
+                self._run_now = False
+                return "manual"
+            if self.next_due is None:
+                self.schedule_next()
+            delay = self.next_due - self.clock()
+            if delay <= 0:
+                return "due"
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+
+    def describe(self):
+        if self.next_due is None:
+            return "not scheduled"
+        due = datetime.fromtimestamp(self.next_due, tz=timezone.utc).strftime("%Y-%m-%d %H:%M:%S UTC")
+        return f"{due} (in {max(0, int(self.next_due - self.clock()))}s)"
+
+    # --- Persistence ---
+    def load(self):
+        # Only the first call reads the file
+        if self._loaded or not self.state_path:
+            return False
+        self._loaded = True
+        try:
+            with open(self.state_path, "r") as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            return False
+        except Exception as e:
+            logger.error(f"[Scheduler] Could not load state from {self.state_path}: {e}")
+            return False
+        self.min_sec = state.get("min_sec", self.min_sec)
+        self.max_sec = state.get("max_sec", self.max_sec)
+        self.next_due = state.get("next_due")
+        logger.info(f"[Scheduler] Restored schedule, next run {self.describe()}")
+        return True
+
+    def save(self):
+        if not self.state_path:
+            return
+        state = {"min_sec": self.min_sec, "max_sec": self.max_sec, "next_due": self.next_due}
+        tmp_path = self.state_path + ".tmp"
+        try:
+            with open(tmp_path, "w") as f:
+                json.dump(state, f)
+            os.replace(tmp_path, self.state_path)
+        except Exception as e:
+            logger.error(f"[Scheduler] Could not save state to {self.state_path}: {e}")
@@ -0,0 +1,74 @@
+import time
+from collections import OrderedDict
+
+from config import REDIRECT_MEMO_SIZE, REDIRECT_MEMO_TTL
+
+# --- Change detection for MAIN_URL ---
+# Remembers the validators (ETag / Last-Modified) of the last main page
+# response and the su-button fragment's redirect URL, so an unchanged page
+# can short-circuit the rest of the scrape.
+class MainPageCache:
+    def __init__(self):
+        self.etag = None
+        self.last_modified = None
+        self.redirect_url = None
+
+    def conditional_headers(self):
+        headers = {}
+        if self.redirect_url is None:
+            return headers
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+    def update(self, redirect_url, resp_headers=None):
+        # Returns True when the fragment changed since the previous poll
+        changed = redirect_url != self.redirect_url
+        self.redirect_url = redirect_url
+        if resp_headers is not None:
+            self.etag = resp_headers.get("ETag")
+            self.last_modified = resp_headers.get("Last-Modified")
+        return changed
+
+# --- redirect_url -> Canva link memo (TTL + LRU) ---
+class RedirectMemo:
+    def __init__(self, maxsize=REDIRECT_MEMO_SIZE, ttl=REDIRECT_MEMO_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()  # redirect_url: (canva_link, stored_at)
+
+    def get(self, redirect_url):
+        entry = self._entries.get(redirect_url)
+        if entry is None:
+            return None
+        canva_link, stored_at = entry
+        if time.monotonic() - stored_at > self.ttl:
+            del self._entries[redirect_url]
+            return None
+        self._entries.move_to_end(redirect_url)
+        return canva_link
+
+    def put(self, redirect_url, canva_link):
+        self._entries[redirect_url] = (canva_link, time.monotonic())
+        self._entries.move_to_end(redirect_url)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def discard(self, redirect_url):
+        self._entries.pop(redirect_url, None)
+
+    def discard_link(self, canva_link):
+        # Forgets every redirect page memoized to resolve to `canva_link`;
+        # returns their URLs
+        redirect_urls = [url for url, (link, _) in self._entries.items() if link == canva_link]
+        for redirect_url in redirect_urls:
+            self.discard(redirect_url)
+        return redirect_urls
+
+    def __len__(self):
+        return len(self._entries)
+
+main_page_cache = MainPageCache()
+redirect_memo = RedirectMemo()
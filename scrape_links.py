@@ -1,14 +1,25 @@
 import aiohttp
 import asyncio
+import codecs
 import random
-import ssl
-from bs4 import BeautifulSoup
-import bs4
-import requests
+import time
+from collections import namedtuple
 import logging
 import os
+from urllib.parse import urljoin, urlsplit
 from dotenv import load_dotenv
 from config import SCRAPEDO_TOKENS  # <-- import tokens from config
+from config import SCRAPEDO_API_URL, SOURCE_PARALLELISM
+from config import HTTP_POOL_LIMIT, HTTP_POOL_LIMIT_PER_HOST, HTTP_DNS_CACHE_TTL, HTTP_KEEPALIVE_TIMEOUT, HTTP_TIMEOUT, HTTP_PREWARM_TIMEOUT
+from config import HEDGE_DELAY, SCRAPEDO_PARALLELISM, SCRAPE_RESULT_TTL
+from scrape_cache import MainPageCache, redirect_memo
+from token_pool import token_pool, mask_token
+from extractors import match_canva_link, extract_canva_link, record_hit, CANVA_PREFIX
+from metrics import observe_scrape
+from profiling import make_trace_config, new_request_timing, start_trace, finish_trace, trace_note
+from replicas import replicas
+from retry_policy import retry_policy, Deadline, RetryableError, check_status, is_retryable, describe, RETRYABLE_STATUSES
+import registry
 
 load_dotenv()
 
@@ -34,7 +45,141 @@ def get_stealth_headers():
 
 logger = logging.getLogger("scrape_links")
 
-MAIN_URL = "https://bingotingo.com/best-social-media-platforms/"
+
+# --- Shared HTTP client ---
+# One long-lived session for every scrape path: keep-alive pooling, DNS cache
+# and a per-host connection cap. Created on bot startup, closed on shutdown.
+_http_session = None
+
+async def init_http_session():
+    global _http_session
+    if _http_session is None or _http_session.closed:
+        connector = aiohttp.TCPConnector(
+            limit=HTTP_POOL_LIMIT,
+            limit_per_host=HTTP_POOL_LIMIT_PER_HOST,
+            ttl_dns_cache=HTTP_DNS_CACHE_TTL,
+            keepalive_timeout=HTTP_KEEPALIVE_TIMEOUT,
+        )
+        _http_session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=HTTP_TIMEOUT),
+            trace_configs=[make_trace_config()],
+        )
+        logger.info(f"[HTTP] Session ready (limit={HTTP_POOL_LIMIT}, per_host={HTTP_POOL_LIMIT_PER_HOST})")
+    return _http_session
+
+async def get_http_session():
+    if _http_session is None or _http_session.closed:
+        return await init_http_session()
+    return _http_session
+
+async def close_http_session():
+    global _http_session
+    if _http_session is not None and not _http_session.closed:
+        await _http_session.close()
+        logger.info("[HTTP] Session closed")
+    _http_session = None
+
+# --- Connection pre-warming ---
+# Run in the background after startup: a HEAD / to each host the first scrape
+# and link checks will hit resolves DNS and leaves a TCP/TLS connection in the
+# pool, so the first auto-post doesn't pay for the handshakes. Scrape.do only
+# gets a bare HEAD without a token, which costs no credits.
+def prewarm_origins():
+    urls = [source.url for source in registry.subscribed_sources()]
+    if scraping_mode != 'direct' and token_pool.tokens:
+        urls.append(SCRAPEDO_API_URL)
+    urls.append(CANVA_PREFIX)
+    return list(dict.fromkeys(f"{parts.scheme}://{parts.netloc}/" for parts in map(urlsplit, urls)))
+
+async def prewarm_http_pool(timeout=HTTP_PREWARM_TIMEOUT):
+    if timeout <= 0:
+        return {}
+    session = await get_http_session()
+    start = time.perf_counter()
+
+    async def touch(origin):
+        try:
+            async with session.head(origin, headers=get_stealth_headers(), allow_redirects=False, timeout=aiohttp.ClientTimeout(total=timeout)) as resp:
+                return resp.status
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.info(f"[HTTP] Could not pre-warm {origin}: {type(e).__name__}")
+            return None
+
+    origins = prewarm_origins()
+    statuses = dict(zip(origins, await asyncio.gather(*(touch(origin) for origin in origins))))
+    warmed = sum(status is not None for status in statuses.values())
+    logger.info(f"[HTTP] Pre-warmed {warmed}/{len(origins)} hosts in {(time.perf_counter() - start) * 1000:.0f} ms")
+    return statuses
+
+# --- Streaming extraction ---
+# Pages are read chunk by chunk and scanned with the precompiled regex tier;
+# the connection is dropped as soon as the link shows up. Only when the whole
+# body has been read without a match do the parser tiers in extractors run.
+STREAM_CHUNK_SIZE = 16 * 1024
+STREAM_OVERLAP = 4096  # re-scan window so tags split across chunks still match
+
+# link: extracted link or None; html: full body, only kept when nothing matched
+# while streaming; status/headers: from the response (for conditional requests)
+StreamResult = namedtuple("StreamResult", "link html status headers timing")
+
+async def stream_find(url, matcher, params=None, headers=None, stage=None, deadline=None):
+    session = await get_http_session()
+    timing = new_request_timing(stage, "scrapedo" if params and "token" in params else "direct")
+    status = "error"
+    text = ""
+    try:
+        async with session.get(url, params=params, headers=headers, timeout=retry_policy.timeout(deadline), trace_request_ctx=timing) as resp:
+            timing.headers_received()
+            status = resp.status
+            if resp.status == 304:
+                return StreamResult(None, None, resp.status, resp.headers, timing)
+            decoder = codecs.getincrementaldecoder(resp.charset or "utf-8")(errors="replace")
+            async for chunk in resp.content.iter_chunked(STREAM_CHUNK_SIZE):
+                pos = max(0, len(text) - STREAM_OVERLAP)
+                text += decoder.decode(chunk)
+                scan_start = time.perf_counter()
+                link = matcher(text, pos, final=False)
+                timing.regex += time.perf_counter() - scan_start
+                if link:
+                    # Stop downloading: the rest of the page is never read
+                    resp.close()
+                    return StreamResult(link, None, resp.status, resp.headers, timing)
+            text += decoder.decode(b"", final=True)
+        scan_start = time.perf_counter()
+        link = matcher(text, max(0, len(text) - STREAM_OVERLAP))
+        timing.regex += time.perf_counter() - scan_start
+        return StreamResult(link, text, resp.status, resp.headers, timing)
+    except asyncio.CancelledError:
+        status = "cancelled"
+        raise
+    finally:
+        timing.finish(status)
+
+async def stream_source_page(source, url, params=None, headers=None, deadline=None):
+    # First stage: the source page, searched with the source's extraction rule
+    result = await stream_find(url, source.matcher, params=params, headers=headers, stage="main", deadline=deadline)
+    if result.link:
+        record_hit("main", "regex")
+    if result.link or result.html is None:
+        return result
+    parse_start = time.perf_counter()
+    link = source.extract(result.html)
+    result.timing.parse += time.perf_counter() - parse_start
+    return result._replace(link=link)
+
+async def stream_canva_link(url, params=None, headers=None, deadline=None):
+    result = await stream_find(url, match_canva_link, params=params, headers=headers, stage="redirect", deadline=deadline)
+    if result.link:
+        record_hit("redirect", "regex")
+    if result.link or result.html is None:
+        return result
+    parse_start = time.perf_counter()
+    link = extract_canva_link(result.html, skip=("regex",))
+    result.timing.parse += time.perf_counter() - parse_start
+    return result._replace(link=link)
 
 # Scraping mode: 'scrapedo', 'direct', or 'both'
 scraping_mode = 'direct'  # default
@@ -50,111 +195,187 @@ def set_scraping_mode(mode):
 def get_scraping_mode():
     return scraping_mode
 
-def get_canva_link_scrapedo_main():
+replicas.on_setting("scraping_mode", set_scraping_mode)
+
+# --- Concurrency helpers ---
+async def first_valid(factories, limit=None):
+    # Run coroutine factories with at most `limit` in flight, return the first
+    # truthy result and cancel whatever is still running.
+    factories = iter(factories)
+    pending = set()
+    try:
+        while True:
+            while limit is None or len(pending) < limit:
+                factory = next(factories, None)
+                if factory is None:
+                    break
+                pending.add(asyncio.create_task(factory()))
+            if not pending:
+                return None
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if not task.cancelled() and task.exception() is None and task.result():
+                    return task.result()
+    finally:
+        for task in pending:
+            task.cancel()
+
+async def hedged(primary, backup, delay):
+    # Start `primary`; launch `backup` after `delay` seconds (or as soon as
+    # primary gives up) and return whichever yields a valid result first.
+    primary_task = asyncio.create_task(primary())
+    try:
+        if delay > 0:
+            done, _ = await asyncio.wait({primary_task}, timeout=delay)
+            if done and not primary_task.cancelled() and primary_task.exception() is None and primary_task.result():
+                return primary_task.result()
+        async def primary_result():
+            return await primary_task
+        return await first_valid([primary_result, backup])
+    finally:
+        primary_task.cancel()
+
+# --- Scrape.do scraping ---
+# Tokens come from the health-scored pool (token_pool.py): fast, healthy keys
+# first, keys with an open circuit breaker are skipped until their cool-down ends.
+# One round tries the tokens (SCRAPEDO_PARALLELISM at a time) until one returns
+# a link; when none did and some failed retryably, retry_policy backs off and
+# runs another round with the re-ordered pool, within the deadline.
+async def _scrapedo_main_with_token(token, source, deadline=None, failures=None):
+    api_url = SCRAPEDO_API_URL
+    start = time.monotonic()
+    try:
+        params = {
+            "token": token,
+            "url": source.url
+        }
+        result = await stream_source_page(source, api_url, params=params, deadline=deadline)
+        token_pool.record_response(token, result.status, time.monotonic() - start, result.headers)
+        if result.link:
+            return result.link
+        if result.status in RETRYABLE_STATUSES and failures is not None:
+            failures.append(f"HTTP {result.status}")
+    except Exception as e:
+        token_pool.record_failure(token, type(e).__name__, time.monotonic() - start)
+        logger.error(f"[Scrape.do] Exception with token {mask_token(token)}: {describe(e)}")
+        if is_retryable(e) and failures is not None:
+            failures.append(describe(e))
+    return None
+
+async def _scrapedo_rounds(with_token, deadline, stage):
+    async def attempt():
+        failures = []
+        link = await first_valid([lambda t=token: with_token(t, failures) for token in token_pool.ordered()], limit=SCRAPEDO_PARALLELISM)
+        if link is None and failures:
+            raise RetryableError(f"{len(failures)} token(s) failed, last: {failures[-1]}")
+        return link
+    try:
+        return await retry_policy.call(attempt, deadline, stage)
+    except Exception as e:
+        logger.error(f"[Scrape.do] {stage} gave up: {describe(e)}")
+        return None
+
+@observe_scrape("main", "scrapedo")
+async def get_canva_link_scrapedo_main(source, deadline=None):
     if not SCRAPEDO_TOKENS:
         logger.error("[Scrape.do] No API tokens set in environment variable SCRAPEDO_TOKENS.")
         return None
-    api_url = "http://api.scrape.do"
-    tokens = SCRAPEDO_TOKENS[:]
-    random.shuffle(tokens)
-    for token in tokens:
-        try:
-            params = {
-                "token": token,
-                "url": MAIN_URL
-            }
-            resp = requests.get(api_url, params=params, timeout=30)
-            html = resp.text
-            soup = BeautifulSoup(html, "html.parser")
-            btn = soup.select_one("a.su-button")
-            if btn and btn.get("href"):
-                return btn["href"]
-        except Exception as e:
-            logger.error(f"[Scrape.do] Exception with token {token}: {e}")
+    return await _scrapedo_rounds(lambda token, failures: _scrapedo_main_with_token(token, source, deadline, failures), deadline, "main")
+
+async def _scrapedo_redirect_with_token(token, redirect_url, deadline=None, failures=None):
+    api_url = SCRAPEDO_API_URL
+    params = {
+        "token": token,
+        "url": redirect_url
+    }
+    start = time.monotonic()
+    try:
+        result = await stream_canva_link(api_url, params=params, deadline=deadline)
+        token_pool.record_response(token, result.status, time.monotonic() - start, result.headers)
+        html = result.html or ""
+        if result.link:
+            return result.link
+        if result.status in RETRYABLE_STATUSES and failures is not None:
+            failures.append(f"HTTP {result.status}")
+        logger.error(f"[Scrape.do] No Canva link found in redirect page. HTML snippet: {html[:500]}")
+    except Exception as e:
+        token_pool.record_failure(token, type(e).__name__, time.monotonic() - start)
+        logger.error(f"[Scrape.do] Exception in fetch_canva_link_from_redirect with token {mask_token(token)}: {describe(e)}")
+        if is_retryable(e) and failures is not None:
+            failures.append(describe(e))
     return None
 
-async def fetch_canva_link_from_redirect(redirect_url):
+@observe_scrape("redirect", "scrapedo")
+async def fetch_canva_link_from_redirect(redirect_url, deadline=None):
     if not SCRAPEDO_TOKENS:
         logger.error("[Scrape.do] No API tokens set in environment variable SCRAPEDO_TOKENS.")
         return None
-    api_url = "http://api.scrape.do"
-    tokens = SCRAPEDO_TOKENS[:]
-    random.shuffle(tokens)
-    for token in tokens:
-        params = {
-            "token": token,
-            "url": redirect_url
-        }
-        try:
-            def fetch_html():
-                resp = requests.get(api_url, params=params, timeout=30)
-                return resp.text
-            html = await asyncio.to_thread(fetch_html)
-            soup = BeautifulSoup(html, "html.parser")
-            found = False
-            for a in soup.find_all('a'):
-                if isinstance(a, bs4.element.Tag):
-                    href = a.get('href')
-                    if isinstance(href, str) and href.startswith('https://www.canva.com/brand/'):
-                        return href
-            # Try to find any Canva link in the HTML, even if not in <a> tags
-            import re
-            canva_match = re.search(r'https://www.canva.com/brand/join\?token=[^"\'\s<>]+', html)
-            if canva_match:
-                return canva_match.group(0)
-            logger.error(f"[Scrape.do] No Canva link found in redirect page. HTML snippet: {html[:500]}")
-        except Exception as e:
-            logger.error(f"[Scrape.do] Exception in fetch_canva_link_from_redirect with token {token}: {e}")
-    return None
+    return await _scrapedo_rounds(lambda token, failures: _scrapedo_redirect_with_token(token, redirect_url, deadline, failures), deadline, "redirect")
 
 # --- Direct scraping fallback (non-Scrape.do) ---
-def get_canva_link_direct_main():
+# Each fetch goes through retry_policy: retryable failures are tried again
+# after a backoff as long as the deadline allows
+@observe_scrape("main", "direct")
+async def get_canva_link_direct_main(source, deadline=None):
+    page_cache = source.page_cache
+
+    async def attempt():
+        headers = get_stealth_headers()
+        headers.update(page_cache.conditional_headers())
+        result = await stream_source_page(source, source.url, headers=headers, deadline=deadline)
+        if result.status == 304 and page_cache.redirect_url:
+            logger.info(f"[Direct] {source.name} page not modified (304), reusing last redirect link")
+            trace_note("main page 304")
+            return page_cache.redirect_url
+        check_status(result.status)
+        if result.link:
+            if not page_cache.update(result.link, result.headers):
+                logger.info(f"[Direct] {source.name} page fragment unchanged since last poll")
+            return result.link
+        return None
+
     try:
-        resp = requests.get(MAIN_URL, headers=get_stealth_headers(), timeout=30)
-        html = resp.text
-        soup = BeautifulSoup(html, "html.parser")
-        btn = soup.select_one("a.su-button")
-        if btn and btn.get("href"):
-            return btn["href"]
+        return await retry_policy.call(attempt, deadline, "main")
     except Exception as e:
-        logger.error(f"[Direct] Exception: {e}")
+        logger.error(f"[Direct] Exception: {describe(e)}")
     return None
 
-async def fetch_canva_link_from_redirect_direct(redirect_url):
+@observe_scrape("redirect", "direct")
+async def fetch_canva_link_from_redirect_direct(redirect_url, deadline=None):
+    async def attempt():
+        result = await stream_canva_link(redirect_url, headers=get_stealth_headers(), deadline=deadline)
+        check_status(result.status)
+        if not result.link:
+            logger.error(f"[Direct] No Canva link found in redirect page. HTML snippet: {(result.html or '')[:500]}")
+        return result.link
+
     try:
-        def fetch_html():
-            resp = requests.get(redirect_url, headers=get_stealth_headers(), timeout=30)
-            return resp.text
-        html = await asyncio.to_thread(fetch_html)
-        soup = BeautifulSoup(html, "html.parser")
-        for a in soup.find_all('a'):
-            if isinstance(a, bs4.element.Tag):
-                href = a.get('href')
-                if isinstance(href, str) and href.startswith('https://www.canva.com/brand/'):
-                    return href
-        # Regex fallback
-        import re
-        canva_match = re.search(r'https://www.canva.com/brand/join\?token=[^"\'\s<>]+', html)
-        if canva_match:
-            return canva_match.group(0)
-        logger.error(f"[Direct] No Canva link found in redirect page. HTML snippet: {html[:500]}")
+        return await retry_policy.call(attempt, deadline, "redirect")
     except Exception as e:
-        logger.error(f"[Direct] Exception in fetch_canva_link_from_redirect: {e}")
+        logger.error(f"[Direct] Exception in fetch_canva_link_from_redirect: {describe(e)}")
     return None
 
 # --- Main scraping logic (mode aware) ---
-def get_latest_redirect_link_via_api():
+# 'both' is hedged: direct starts first, Scrape.do joins after HEDGE_DELAY
+# seconds (0 = immediately) and the first valid link wins.
+async def get_latest_redirect_link_via_api(source, deadline=None):
     mode = get_scraping_mode()
-    if mode in ('direct', 'both'):
-        link = get_canva_link_direct_main()
+    if mode == 'both':
+        link = await hedged(lambda: get_canva_link_direct_main(source, deadline), lambda: get_canva_link_scrapedo_main(source, deadline), HEDGE_DELAY)
+        if link:
+            logger.info("[Scraper] Success with hedged direct/Scrape.do scraping")
+            return link
+        logger.error("[Scraper] Neither direct nor Scrape.do returned a link.")
+        return None
+    if mode == 'direct':
+        link = await get_canva_link_direct_main(source, deadline)
         if link:
             logger.info("[Scraper] Success with direct scraping")
             return link
-        elif mode == 'direct':
-            logger.error("[Scraper] Direct scraping returned no link.")
-            return None
-    if mode in ('scrapedo', 'both'):
-        link = get_canva_link_scrapedo_main()
+        logger.error("[Scraper] Direct scraping returned no link.")
+        return None
+    if mode == 'scrapedo':
+        link = await get_canva_link_scrapedo_main(source, deadline)
         if link:
             logger.info("[Scraper] Success with Scrape.do")
             return link
@@ -162,25 +383,99 @@ def get_latest_redirect_link_via_api():
             logger.error("[Scraper] Scrape.do returned no link.")
     return None
 
-async def fetch_canva_link_from_redirect_mode(redirect_url):
+async def fetch_canva_link_from_redirect_mode(redirect_url, deadline=None):
     mode = get_scraping_mode()
-    if mode in ('direct', 'both'):
-        link = await fetch_canva_link_from_redirect_direct(redirect_url)
-        if link:
-            return link
-    if mode in ('scrapedo', 'both'):
-        link = await fetch_canva_link_from_redirect(redirect_url)
-        if link:
-            return link
+    if mode == 'both':
+        return await hedged(
+            lambda: fetch_canva_link_from_redirect_direct(redirect_url, deadline),
+            lambda: fetch_canva_link_from_redirect(redirect_url, deadline),
+            HEDGE_DELAY,
+        )
+    if mode == 'direct':
+        return await fetch_canva_link_from_redirect_direct(redirect_url, deadline)
+    if mode == 'scrapedo':
+        return await fetch_canva_link_from_redirect(redirect_url, deadline)
     return None
 
 # --- Async wrapper for bot usage ---
-async def get_latest_canva_link():
+# Single-flight per source: concurrent callers (/post, auto-poster) share one
+# in-flight scrape, and a link found in the last SCRAPE_RESULT_TTL seconds is reused.
+# Every caller gets an answer within its own deadline (default SCRAPE_DEADLINE):
+# None if the scrape hasn't finished by then, which keeps running for the others.
+def _finish_scrape(source, future):
+    source.inflight = None
+    if not future.cancelled() and future.exception() is None and future.result():
+        source.last_scrape = (future.result(), time.monotonic())
+
+async def get_latest_canva_link(source=None, deadline=None):
+    # `source`: a registry.Source or its name; defaults to the first source
+    deadline = deadline or Deadline()
+    if source is None:
+        source = registry.default_source()
+    elif isinstance(source, str):
+        source = registry.sources[source]
+    if source.last_scrape is not None and time.monotonic() - source.last_scrape[1] < SCRAPE_RESULT_TTL:
+        logger.info(f"[Scraper] Reusing {source.name} link from a scrape that just finished")
+        return source.last_scrape[0]
+    if source.inflight is None:
+        source.inflight = asyncio.ensure_future(_scrape_latest_canva_link(source, deadline))
+        source.inflight.add_done_callback(lambda future: _finish_scrape(source, future))
+    else:
+        logger.info(f"[Scraper] Joining {source.name} scrape already in flight")
+    # shield: a cancelled or timed out caller must not cancel the scrape other callers wait on
     try:
-        redirect_url = await asyncio.to_thread(get_latest_redirect_link_via_api)
+        return await asyncio.wait_for(asyncio.shield(source.inflight), timeout=deadline.remaining())
+    except asyncio.TimeoutError:
+        logger.error(f"[Scraper] No {source.name} link within the {deadline.seconds:.0f}s deadline")
+        return None
+
+# --- Dead links ---
+# The link checker found `link` expired. The next scrape must not get it back
+# from a cache: the redirect pages memoized to resolve to it are forgotten,
+# and so are the page validators and recent result of every source that led
+# to it, so its page and redirect page are fetched again.
+def forget_dead_link(link):
+    redirect_urls = redirect_memo.discard_link(link)
+    for source in registry.sources.values():
+        cached = source.page_cache.redirect_url and urljoin(source.url, source.page_cache.redirect_url)
+        recent = source.last_scrape[0] if source.last_scrape is not None else None
+        if link in (cached, recent) or cached in redirect_urls:
+            source.page_cache = MainPageCache()
+            source.last_scrape = None
+            logger.info(f"[Scraper] Forgot cached {source.name} results leading to dead link {link}")
+
+async def scrape_sources(selected=None, limit=SOURCE_PARALLELISM, deadline=None):
+    # Scrapes the given sources (default: every subscribed one) concurrently,
+    # at most `limit` at a time, all within one deadline; returns {source name: link or None}
+    selected = registry.subscribed_sources() if selected is None else selected
+    deadline = deadline or Deadline()
+    semaphore = asyncio.Semaphore(limit)
+    async def scrape(source):
+        async with semaphore:
+            return source.name, await get_latest_canva_link(source, deadline)
+    return dict(await asyncio.gather(*(scrape(source) for source in selected)))
+
+async def _scrape_latest_canva_link(source, deadline):
+    trace = start_trace()
+    if len(registry.sources) > 1:
+        trace_note(source.name)
+    canva_link = None
+    try:
+        redirect_url = await get_latest_redirect_link_via_api(source, deadline)
         if redirect_url:
-            canva_link = await fetch_canva_link_from_redirect_mode(redirect_url)
+            redirect_url = urljoin(source.url, redirect_url)
+            if redirect_url.startswith(CANVA_PREFIX):
+                # The rule found the Canva link on the source page itself
+                canva_link = redirect_url
+                return canva_link
+            canva_link = redirect_memo.get(redirect_url)
             if canva_link:
+                logger.info("[Scraper] Known redirect link, skipping redirect page fetch")
+                trace_note("redirect memo hit")
+                return canva_link
+            canva_link = await fetch_canva_link_from_redirect_mode(redirect_url, deadline)
+            if canva_link:
+                redirect_memo.put(redirect_url, canva_link)
                 return canva_link
             else:
                 logger.warning(f"[Scraper] Redirect page did not yield Canva link.")
@@ -188,12 +483,20 @@ async def get_latest_canva_link():
     except Exception as e:
         logger.error(f"[Scraper] Exception in get_latest_canva_link: {e}")
         return None
+    finally:
+        finish_trace(trace, canva_link)
 
 # Entry point for manual testing
+async def _manual_run():
+    try:
+        return await get_latest_canva_link()
+    finally:
+        await close_http_session()
+
 def main():
     logging.basicConfig(level=logging.INFO)
     try:
-        link = asyncio.run(get_latest_canva_link())
+        link = asyncio.run(_manual_run())
         print(f"✅ Canva Link: {link}")
     except Exception as e:
         print(f"🔥 Fatal Error: {e}")
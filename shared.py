@@ -1,10 +1,11 @@
 import secrets
 import random
+from collections import OrderedDict, namedtuple
+from functools import lru_cache
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup
-
-# --- Shared Voting Data ---
-vote_data = {}  # message_id: {'working': int, 'not_working': int, 'voters': set, 'emoji_pair': tuple}
-last_posted_link = None
+from vote_store import vote_store
+from edit_queue import edit_queue
+from config import KEYBOARD_CACHE_SIZE, MESSAGE_INDEX_SIZE
 
 # --- Emoji Pairs ---
 EMOJI_PAIRS = [
@@ -29,14 +30,59 @@ def format_canva_post_message(latest_link, working_votes=None, not_working_votes
         working_votes = 0
     if not_working_votes is None:
         not_working_votes = 0
-    keyboard = InlineKeyboardMarkup([
+    keyboard = build_vote_keyboard(emoji_pair, working_votes, not_working_votes)
+    return msg, keyboard, emoji_pair
+
+# --- Cached vote keyboards ---
+SHARE_ROW = (
+    InlineKeyboardButton("\U0001F4E3 Share Channel", url="https://t.me/share/url?url=https://t.me/CanvaProInviteLinks&text=\u2705 Unlock daily Canva Pro team links! Totally free, always fresh. \u2764\uFE0F"),
+    InlineKeyboardButton("Join Backup \u26A0\uFE0F", url="https://t.me/+ejp2_sjBtJczY2I9")
+)
+
+@lru_cache(maxsize=KEYBOARD_CACHE_SIZE)
+def build_vote_keyboard(emoji_pair, working_votes, not_working_votes):
+    # InlineKeyboardMarkup is immutable, so one instance can be reused for every
+    # message showing the same emoji pair and counts
+    good_emoji, bad_emoji = emoji_pair
+    return InlineKeyboardMarkup([
         [
             InlineKeyboardButton(f"{good_emoji} Working ({working_votes})", callback_data=f"vote_working|{good_emoji}|{bad_emoji}"),
             InlineKeyboardButton(f"{bad_emoji} Not Working ({not_working_votes})", callback_data=f"vote_not_working|{good_emoji}|{bad_emoji}")
         ],
-        [
-            InlineKeyboardButton("\U0001F4E3 Share Channel", url="https://t.me/share/url?url=https://t.me/CanvaProInviteLinks&text=\u2705 Unlock daily Canva Pro team links! Totally free, always fresh. \u2764\uFE0F"),
-            InlineKeyboardButton("Join Backup \u26A0\uFE0F", url="https://t.me/+ejp2_sjBtJczY2I9")
-        ]
+        SHARE_ROW
     ])
-    return msg, keyboard, emoji_pair
+
+# --- Per-message index of post-time data ---
+# Filled when a post is sent, so callbacks never have to re-parse the message.
+MessageMeta = namedtuple("MessageMeta", "link emoji_pair")
+message_index = OrderedDict()  # (chat_id, message_id): MessageMeta, most recent last
+
+def index_message(chat_id, message_id, link, emoji_pair):
+    key = (chat_id, message_id)
+    message_index[key] = MessageMeta(link, tuple(emoji_pair))
+    message_index.move_to_end(key)
+    while len(message_index) > MESSAGE_INDEX_SIZE:
+        message_index.popitem(last=False)
+
+def get_message_meta(chat_id, message_id, message_text=None, emoji_pair=None):
+    meta = message_index.get((chat_id, message_id))
+    if meta is None and message_text and emoji_pair:
+        # Posts from before a restart: recover the link from the message text once
+        lines = message_text.split('\n')
+        link = next((line.strip() for line in lines if line.startswith('https://www.canva.com/')), None)
+        if link is None and len(lines) > 1:
+            link = lines[1].strip()
+        index_message(chat_id, message_id, link or "[link hidden]", emoji_pair)
+        meta = message_index[(chat_id, message_id)]
+    return meta
+
+# --- Vote button updates ---
+def queue_vote_edit(bot, chat_id, msg_id):
+    # Rendered when the coalesced edit is actually sent, so it shows the latest
+    # counts (including votes other replicas took)
+    async def render():
+        votes = await vote_store.fetch(chat_id, msg_id)
+        if votes is None:
+            return None
+        return build_vote_keyboard(votes.emoji_pair, votes.working, votes.not_working)
+    edit_queue.request(bot, chat_id, msg_id, render)
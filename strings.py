@@ -3,12 +3,18 @@
 HELP_MSG = (
     "<b>Admin Commands:</b>\n"
     "/post - Scrape & post the latest link\n"
-    "/now &lt;canva_link&gt; - Manually post a Canva link to the channel (with natural voting)\n"
+    "/now &lt;canva_link&gt; [force] - Manually post a Canva link to the channel (with natural voting; force reposts an already posted link)\n"
     "/setinterval &lt;min_seconds&gt; &lt;max_seconds&gt; - Set auto-post interval (e.g. /setinterval 300 400)\n"
+    "/runnow - Run the auto-poster check right away\n"
     "/help - This menu\n"
-    "/lastlink - Show the last posted Canva link\n"
+    "/lastlink - Show the last posted Canva links per channel\n"
     "/logs - Show recent important logs\n"
     "/health - Check bot health\n"
+    "/profile [seconds] - Sample the event loop and show the hottest functions\n"
+    "/timings [n] - Per-stage timings of the last n scrapes\n"
+    "/looplag - Coroutines that blocked the event loop longest\n"
+    "/linkstatus - Liveness verdicts of recently posted links\n"
+    "/checklink [link] - Check the current (or given) link right now\n"
     "/restart - Restart the bot (Koyeb will auto-restart)\n"
     "/setscrapemode &lt;code&gt;scrapedo&lt;/code&gt;|&lt;code&gt;direct&lt;/code&gt;|&lt;code&gt;both&lt;/code&gt; - Enable/disable scraping methods.\n"
     "/stats - Show bot stats and current settings.\n"
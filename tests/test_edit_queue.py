@@ -0,0 +1,59 @@
+# Edit pacing of the vote button coalescer under a steady stream of votes.
+#
+#   python -m unittest discover -s tests
+import asyncio
+import math
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+for key, value in {"BOT_TOKEN": "123456:TEST", "CHANNEL_ID": "-1001234567890", "ADMIN_GROUP_ID": "1", "BOT_ADMIN_ID": "1",
+                   "SCHEDULER_STATE_PATH": "", "CHANGE_HISTORY_PATH": "", "LINK_HISTORY_PATH": ""}.items():
+    os.environ.setdefault(key, value)
+
+from edit_queue import EditCoalescer
+
+class Markup:
+    def __init__(self, count):
+        self.count = count
+
+    def to_dict(self):
+        return {"count": self.count}
+
+class SlowBot:
+    # Records the edits per message and answers each after `latency` seconds
+    def __init__(self, latency):
+        self.latency = latency
+        self.edits = {}
+
+    async def edit_message_reply_markup(self, chat_id, message_id, reply_markup):
+        self.edits[message_id] = self.edits.get(message_id, 0) + 1
+        await asyncio.sleep(self.latency)
+
+class PacingTest(unittest.IsolatedAsyncioTestCase):
+    async def test_edits_are_spaced_by_the_window(self):
+        window, duration, latency = 0.2, 1.0, 0.05
+        bot = SlowBot(latency)
+        coalescer = EditCoalescer(window=window)
+        votes = 0
+
+        async def render():
+            return Markup(votes)
+
+        loop = asyncio.get_running_loop()
+        end = loop.time() + duration
+        while loop.time() < end:
+            votes += 1
+            for message_id in (1, 2):
+                coalescer.request(bot, -100, message_id, render)
+            await asyncio.sleep(0.005)
+        while coalescer._tasks:
+            await asyncio.sleep(0.01)
+
+        for message_id in (1, 2):
+            self.assertGreater(bot.edits[message_id], 1)
+            self.assertLessEqual(bot.edits[message_id], math.ceil(duration / window) + 1)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,90 @@
+# Streaming extraction on bodies that arrive in several chunks.
+#
+#   python -m unittest discover -s tests
+import asyncio
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+for key, value in {"BOT_TOKEN": "123456:TEST", "CHANNEL_ID": "-1001234567890", "ADMIN_GROUP_ID": "1", "BOT_ADMIN_ID": "1",
+                   "SCHEDULER_STATE_PATH": "", "CHANGE_HISTORY_PATH": "", "LINK_HISTORY_PATH": ""}.items():
+    os.environ.setdefault(key, value)
+
+from aiohttp import web
+
+import scrape_links
+from extractors import make_rule, match_canva_link
+
+CANVA_LINK = "https://www.canva.com/brand/join?token=U0NSSVBUX09OTFlfVE9LRU4"
+
+class ChunkedServer:
+    # Serves `chunks` as separate writes with a pause in between, so the
+    # client reads them as separate chunks
+    def __init__(self, chunks):
+        self.chunks = chunks
+
+    async def page(self, request):
+        resp = web.StreamResponse(headers={"Content-Type": "text/html; charset=utf-8"})
+        await resp.prepare(request)
+        for chunk in self.chunks:
+            await resp.write(chunk.encode())
+            await asyncio.sleep(0.05)
+        await resp.write_eof()
+        return resp
+
+    async def __aenter__(self):
+        app = web.Application()
+        app.router.add_get("/", self.page)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        port = self.runner.addresses[0][1]
+        return f"http://127.0.0.1:{port}/"
+
+    async def __aexit__(self, *exc):
+        await self.runner.cleanup()
+
+class StreamFindTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        await scrape_links.init_http_session()
+
+    async def asyncTearDown(self):
+        await scrape_links.close_http_session()
+
+    async def find(self, chunks, matcher=match_canva_link):
+        async with ChunkedServer(chunks) as url:
+            return await scrape_links.stream_find(url, matcher)
+
+    async def test_bare_link_split_across_chunks(self):
+        split = len(CANVA_LINK) - 10
+        result = await self.find(["<p>Join: " + CANVA_LINK[:split], CANVA_LINK[split:] + " today</p>"])
+        self.assertEqual(result.link, CANVA_LINK)
+
+    async def test_bare_link_at_end_of_body(self):
+        split = len(CANVA_LINK) - 10
+        result = await self.find(["<p>Join: " + CANVA_LINK[:split], CANVA_LINK[split:]])
+        self.assertEqual(result.link, CANVA_LINK)
+
+    async def test_href_split_across_chunks(self):
+        result = await self.find([f'<a href="{CANVA_LINK[:30]}', f'{CANVA_LINK[30:]}">join</a>'])
+        self.assertEqual(result.link, CANVA_LINK)
+
+    async def test_source_rules_split_across_chunks(self):
+        split = len(CANVA_LINK) - 10
+        chunks = ["<p>Join: " + CANVA_LINK[:split], CANVA_LINK[split:] + " today</p>"]
+        for rule, pattern in (("canva_link", None), ("regex", r"https://www\.canva\.com/brand/\S+"), ("regex", r"Join: (\S+)")):
+            matcher, _ = make_rule(rule, pattern)
+            result = await self.find(chunks, matcher)
+            self.assertEqual(result.link, CANVA_LINK, (rule, pattern))
+
+class MatcherTest(unittest.TestCase):
+    def test_match_at_end_of_partial_buffer_waits(self):
+        text = "Join: " + CANVA_LINK
+        self.assertIsNone(match_canva_link(text, final=False))
+        self.assertEqual(match_canva_link(text + "\n", final=False), CANVA_LINK)
+        self.assertEqual(match_canva_link(text), CANVA_LINK)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,178 @@
+import hashlib
+import json
+import logging
+import os
+import random
+import time
+
+from config import SCRAPEDO_TOKENS, TOKEN_POOL_STATE_PATH, TOKEN_FAILURE_THRESHOLD, TOKEN_COOLDOWN
+from metrics import Gauge, SCRAPEDO_REQUESTS
+
+logger = logging.getLogger("token_pool")
+
+# Scrape.do reports the key's remaining balance on every response
+CREDITS_HEADER = "Scrape.do-Remaining-Credits"
+EWMA_ALPHA = 0.3
+SAVE_INTERVAL = 30  # seconds between state writes
+
+def token_id(token):
+    # Stable key for the state file, so raw keys are never written to disk
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()[:16]
+
+def mask_token(token):
+    return f"{token[:4]}…{token[-4:]}" if len(token) > 8 else "…"
+
+class TokenHealth:
+    FIELDS = ("successes", "failures", "latency_ewma", "last_error", "credits", "consecutive_failures", "open_until")
+
+    def __init__(self):
+        self.successes = 0
+        self.failures = 0
+        self.latency_ewma = None
+        self.last_error = None
+        self.credits = None
+        self.consecutive_failures = 0
+        self.open_until = 0.0  # wall clock; circuit is open while now < open_until
+
+    def success_rate(self):
+        # Laplace smoothing so fresh tokens start at 0.5 instead of 0 or 1
+        return (self.successes + 1) / (self.successes + self.failures + 2)
+
+    def score(self):
+        latency = self.latency_ewma if self.latency_ewma is not None else 5.0
+        return self.success_rate() / max(latency, 0.05)
+
+    def is_open(self, now):
+        return now < self.open_until
+
+    def to_dict(self):
+        return {field: getattr(self, field) for field in self.FIELDS}
+
+    @classmethod
+    def from_dict(cls, data):
+        health = cls()
+        for field in cls.FIELDS:
+            if field in data:
+                setattr(health, field, data[field])
+        return health
+
+# --- Health-scored Scrape.do token pool ---
+# Tracks success rate, latency EWMA, last error and remaining credits per key,
+# orders keys by health and opens a circuit breaker (with cool-down) after
+# repeated failures. State survives restarts via a small JSON file.
+class TokenPool:
+    def __init__(self, tokens, path=TOKEN_POOL_STATE_PATH, failure_threshold=TOKEN_FAILURE_THRESHOLD, cooldown=TOKEN_COOLDOWN):
+        self.tokens = list(tokens)
+        self.path = path
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.health = {token: TokenHealth() for token in self.tokens}
+        self._last_save = 0.0
+        self.load()
+
+    def ordered(self):
+        # Healthy tokens by descending score (random tie-break); open circuits
+        # are skipped until their cool-down has passed (then half-open).
+        now = time.time()
+        tokens = [t for t in self.tokens if not self.health[t].is_open(now)]
+        random.shuffle(tokens)
+        tokens.sort(key=lambda t: self.health[t].score(), reverse=True)
+        if not tokens and self.tokens:
+            logger.warning("[TokenPool] All Scrape.do tokens are cooling down.")
+        return tokens
+
+    def record_response(self, token, status, latency, headers=None):
+        health = self.health[token]
+        credits = headers.get(CREDITS_HEADER) if headers is not None else None
+        if credits is not None:
+            try:
+                health.credits = int(float(credits))
+            except ValueError:
+                pass
+        if status in (401, 403, 429) or status >= 500:
+            self.record_failure(token, f"HTTP {status}", latency)
+        elif health.credits is not None and health.credits <= 0:
+            self.record_failure(token, "no credits", latency)
+        else:
+            self.record_success(token, latency)
+
+    def record_success(self, token, latency):
+        health = self.health[token]
+        health.successes += 1
+        health.consecutive_failures = 0
+        health.open_until = 0.0
+        self._update_latency(health, latency)
+        SCRAPEDO_REQUESTS.inc(token=token_id(token), result="success")
+        self._maybe_save()
+
+    def record_failure(self, token, error, latency=None):
+        health = self.health[token]
+        health.failures += 1
+        health.consecutive_failures += 1
+        health.last_error = error
+        SCRAPEDO_REQUESTS.inc(token=token_id(token), result="failure")
+        if latency is not None:
+            self._update_latency(health, latency)
+        if health.consecutive_failures >= self.failure_threshold or error == "no credits":
+            health.open_until = time.time() + self.cooldown
+            logger.warning(f"[TokenPool] Circuit open for {mask_token(token)} ({error}), cooling down {self.cooldown}s")
+        self._maybe_save()
+
+    def _update_latency(self, health, latency):
+        if health.latency_ewma is None:
+            health.latency_ewma = latency
+        else:
+            health.latency_ewma = EWMA_ALPHA * latency + (1 - EWMA_ALPHA) * health.latency_ewma
+
+    # --- Persistence ---
+    def load(self):
+        try:
+            with open(self.path, "r") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return
+        except Exception as e:
+            logger.error(f"[TokenPool] Could not load state from {self.path}: {e}")
+            return
+        by_id = {token_id(t): t for t in self.tokens}
+        for key, saved in data.items():
+            if key in by_id:
+                self.health[by_id[key]] = TokenHealth.from_dict(saved)
+
+    def save(self):
+        data = {token_id(t): h.to_dict() for t, h in self.health.items()}
+        tmp_path = self.path + ".tmp"
+        try:
+            with open(tmp_path, "w") as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.path)
+            self._last_save = time.monotonic()
+        except Exception as e:
+            logger.error(f"[TokenPool] Could not save state to {self.path}: {e}")
+
+    def _maybe_save(self):
+        if time.monotonic() - self._last_save >= SAVE_INTERVAL:
+            self.save()
+
+    # --- Reporting ---
+    def summary_lines(self):
+        now = time.time()
+        lines = []
+        for token in self.tokens:
+            h = self.health[token]
+            state = f"open {int(h.open_until - now)}s" if h.is_open(now) else "ok"
+            latency = f"{h.latency_ewma:.2f}s" if h.latency_ewma is not None else "-"
+            credits = h.credits if h.credits is not None else "?"
+            total = h.successes + h.failures
+            rate = f"{h.successes * 100 // total}%" if total else "-"
+            lines.append(
+                f"{mask_token(token)}: {state}, {rate} ok "
+                f"({h.successes}/{total}), {latency}, credits {credits}, "
+                f"last error: {h.last_error or '-'}"
+            )
+        return lines
+
+token_pool = TokenPool(SCRAPEDO_TOKENS)
+
+Gauge("bot_scrapedo_credits", "Remaining Scrape.do credits per token, as last reported by the API", ("token",),
+      collect=lambda: {(token_id(t),): h.credits for t, h in token_pool.health.items() if h.credits is not None})
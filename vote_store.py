@@ -0,0 +1,334 @@
+import asyncio
+import itertools
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from config import VOTE_DB_PATH, VOTE_CACHE_SIZE, VOTE_RETENTION, VOTE_FLUSH_INTERVAL
+
+logger = logging.getLogger("vote_store")
+
+# Posts are keyed by (chat_id, message_id): Telegram message ids are only
+# unique within one chat, and the bot can post to several channels.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS posts (
+    chat_id INTEGER NOT NULL,
+    message_id INTEGER NOT NULL,
+    working INTEGER NOT NULL DEFAULT 0,
+    not_working INTEGER NOT NULL DEFAULT 0,
+    good_emoji TEXT,
+    bad_emoji TEXT,
+    created_at REAL,
+    PRIMARY KEY (chat_id, message_id)
+);
+CREATE INDEX IF NOT EXISTS posts_created_at ON posts (created_at);
+CREATE TABLE IF NOT EXISTS voters (
+    chat_id INTEGER NOT NULL,
+    message_id INTEGER NOT NULL,
+    user_id INTEGER NOT NULL,
+    PRIMARY KEY (chat_id, message_id, user_id)
+) WITHOUT ROWID;
+"""
+
+PRUNE_INTERVAL = 600  # seconds between retention sweeps
+
+class VoteEntry:
+    __slots__ = ("working", "not_working", "emoji_pair", "voters")
+
+    def __init__(self, emoji_pair, working=0, not_working=0, voters=None):
+        self.working = working
+        self.not_working = not_working
+        self.emoji_pair = emoji_pair
+        self.voters = voters if voters is not None else set()
+
+# --- Durable vote store ---
+# SQLite (WAL) on disk, a bounded LRU of recent posts in memory. Callbacks only
+# touch memory; changes are queued and written in batches by run_flusher() on a
+# worker thread. Old posts are pruned from disk beyond VOTE_RETENTION.
+# With a shared backend (multi-replica mode, see replicas.py) the backend owns
+# the counts: votes are counted there atomically, other writes are queued and
+# applied by the same flusher, and memory only caches entries for rendering.
+class VoteStore:
+    def __init__(self, path=VOTE_DB_PATH, cache_size=VOTE_CACHE_SIZE, retention=VOTE_RETENTION):
+        self.path = path
+        self.cache_size = cache_size
+        self.retention = retention
+        self._entries = OrderedDict()  # (chat_id, message_id): VoteEntry, most recent last
+        self._dirty_posts = set()
+        self._new_voters = []
+        self._deleted = set()
+        self._conn = None
+        self._lock = threading.Lock()  # the connection is shared with the flush thread
+        self._reader = None  # event loop only; WAL lets it read while a flush writes
+        self._last_prune = 0.0
+        self.backend = None
+        self._backend_ops = []  # queued ("create" | "set" | "add", (chat_id, message_id), ...) writes
+
+    def use_backend(self, backend):
+        self.backend = backend
+
+    def open(self):
+        if self._conn is not None or self.backend is not None:
+            return
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(SCHEMA)
+        self._reader = sqlite3.connect(self.path)
+        self._reader.execute("PRAGMA query_only=ON")
+        logger.info(f"[VoteStore] Opened {self.path}")
+
+    # Startup housekeeping, off the critical path: callbacks that arrive before
+    # it finishes just load their post from disk (_load)
+    async def warm(self):
+        if self._conn is None:
+            return
+        start = time.perf_counter()
+        entries = await asyncio.to_thread(self._read_recent)
+        # Entries touched in the meantime are newer than what was read
+        merged = OrderedDict((key, entry) for key, entry in entries.items() if key not in self._entries and key not in self._deleted)
+        merged.update(self._entries)
+        self._entries = merged
+        self._trim()
+        logger.info(f"[VoteStore] Loaded {len(entries)} posts from {self.path} in {(time.perf_counter() - start) * 1000:.0f} ms")
+
+    def _read_recent(self):
+        with self._lock:
+            recent = "SELECT chat_id, message_id FROM posts ORDER BY created_at DESC LIMIT ?"
+            rows = self._conn.execute(
+                "SELECT chat_id, message_id, working, not_working, good_emoji, bad_emoji FROM posts "
+                f"WHERE (chat_id, message_id) IN ({recent}) ORDER BY created_at",
+                (self.cache_size,),
+            ).fetchall()
+            entries = {(row[0], row[1]): VoteEntry((row[4], row[5]), row[2], row[3]) for row in rows}
+            voters = self._conn.execute(
+                f"SELECT chat_id, message_id, user_id FROM voters WHERE (chat_id, message_id) IN ({recent})",
+                (self.cache_size,),
+            ).fetchall()
+        for chat_id, message_id, user_id in voters:
+            entries[(chat_id, message_id)].voters.add(user_id)
+        return entries  # oldest first
+
+    # --- Hot path (memory only) ---
+    def create(self, chat_id, message_id, emoji_pair, working=0, not_working=0):
+        key = (chat_id, message_id)
+        entry = VoteEntry(emoji_pair, working, not_working)
+        self._remember(key, entry)
+        if self.backend is not None:
+            self._backend_ops.append(("create", key, tuple(emoji_pair), working, not_working))
+            return entry
+        self._dirty_posts.add(key)
+        self._deleted.discard(key)
+        return entry
+
+    def get(self, chat_id, message_id):
+        key = (chat_id, message_id)
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+            return entry
+        entry = self._load(key)
+        if entry is not None:
+            self._remember(key, entry)
+        return entry
+
+    def get_or_create(self, chat_id, message_id, emoji_pair):
+        entry = self.get(chat_id, message_id)
+        if entry is None:
+            entry = self.create(chat_id, message_id, emoji_pair)
+        return entry
+
+    def has_voted(self, chat_id, message_id, user_id):
+        entry = self.get(chat_id, message_id)
+        return entry is not None and user_id in entry.voters
+
+    def record_vote(self, chat_id, message_id, user_id, action, emoji_pair):
+        # Returns False if the user already voted on this message
+        entry = self.get_or_create(chat_id, message_id, emoji_pair)
+        if user_id in entry.voters:
+            return False
+        entry.voters.add(user_id)
+        if action == "vote_working":
+            entry.working += 1
+        elif action == "vote_not_working":
+            entry.not_working += 1
+        self._new_voters.append((chat_id, message_id, user_id))
+        self._dirty_posts.add((chat_id, message_id))
+        return True
+
+    async def vote(self, chat_id, message_id, user_id, action, emoji_pair):
+        # record_vote(), or counted atomically by the shared backend so votes
+        # arriving at different replicas all land
+        if self.backend is None:
+            return self.record_vote(chat_id, message_id, user_id, action, emoji_pair)
+        entry = self.get_or_create(chat_id, message_id, emoji_pair)
+        added, entry.working, entry.not_working = await self.backend.add_vote((chat_id, message_id), user_id, action, tuple(emoji_pair))
+        entry.voters.add(user_id)
+        return added
+
+    async def fetch(self, chat_id, message_id):
+        # get() with the latest counts from the shared backend, if any
+        entry = self.get(chat_id, message_id)
+        if entry is not None and self.backend is not None:
+            try:
+                counts = await self.backend.get_counts((chat_id, message_id))
+            except Exception as e:
+                logger.warning(f"[VoteStore] Could not refresh {chat_id}/{message_id} from the shared backend: {e}")
+                counts = None
+            if counts is not None:
+                entry.working, entry.not_working = counts
+        return entry
+
+    def set_counts(self, chat_id, message_id, working=None, not_working=None):
+        entry = self.get(chat_id, message_id)
+        if entry is None:
+            return None
+        if working is not None:
+            entry.working = working
+        if not_working is not None:
+            entry.not_working = not_working
+        if self.backend is not None:
+            self._backend_ops.append(("set", (chat_id, message_id), working, not_working))
+        else:
+            self._dirty_posts.add((chat_id, message_id))
+        return entry
+
+    def add_counts(self, chat_id, message_id, working=0, not_working=0):
+        # Increment rather than overwrite, so concurrent votes on other replicas aren't lost
+        entry = self.get(chat_id, message_id)
+        if entry is None:
+            return None
+        if self.backend is None:
+            return self.set_counts(chat_id, message_id, entry.working + working, entry.not_working + not_working)
+        entry.working += working
+        entry.not_working += not_working
+        self._backend_ops.append(("add", (chat_id, message_id), working, not_working))
+        return entry
+
+    def get_counts(self, chat_id, message_id):
+        entry = self.get(chat_id, message_id)
+        if entry is None:
+            return 0, 0
+        return entry.working, entry.not_working
+
+    def evict(self, chat_id, message_id):
+        key = (chat_id, message_id)
+        self._entries.pop(key, None)
+        self._dirty_posts.discard(key)
+        self._deleted.add(key)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _remember(self, key, entry):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        self._trim()
+
+    def _trim(self):
+        excess = len(self._entries) - self.cache_size
+        if excess <= 0:
+            return
+        # Unflushed entries stay in memory until the next flush has written them
+        for old_key in list(itertools.islice(self._entries, excess)):
+            if old_key not in self._dirty_posts:
+                del self._entries[old_key]
+
+    # A cache miss reads through the read connection without taking _lock, so
+    # a callback never waits for a flush (or a prune) in progress
+    def _load(self, key):
+        if self._reader is None or key in self._deleted:
+            return None
+        row = self._reader.execute(
+            "SELECT working, not_working, good_emoji, bad_emoji FROM posts WHERE chat_id = ? AND message_id = ?", key
+        ).fetchone()
+        if row is None:
+            return None
+        voters = {r[0] for r in self._reader.execute(
+            "SELECT user_id FROM voters WHERE chat_id = ? AND message_id = ?", key)}
+        return VoteEntry((row[2], row[3]), row[0], row[1], voters)
+
+    # --- Batched writes ---
+    def _take_batch(self):
+        posts = []
+        for key in self._dirty_posts:
+            entry = self._entries.get(key)
+            if entry is not None:
+                posts.append((*key, entry.working, entry.not_working, entry.emoji_pair[0], entry.emoji_pair[1], time.time()))
+        voters, deleted = self._new_voters, list(self._deleted)
+        self._dirty_posts = set()
+        self._new_voters = []
+        self._deleted = set()
+        return posts, voters, deleted
+
+    def _write_batch(self, posts, voters, deleted, prune):
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT INTO posts (chat_id, message_id, working, not_working, good_emoji, bad_emoji, created_at) VALUES (?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(chat_id, message_id) DO UPDATE SET working = excluded.working, not_working = excluded.not_working",
+                posts,
+            )
+            self._conn.executemany("INSERT OR IGNORE INTO voters (chat_id, message_id, user_id) VALUES (?, ?, ?)", voters)
+            for key in deleted:
+                self._conn.execute("DELETE FROM posts WHERE chat_id = ? AND message_id = ?", key)
+                self._conn.execute("DELETE FROM voters WHERE chat_id = ? AND message_id = ?", key)
+            if prune:
+                cutoff = self._conn.execute(
+                    "SELECT created_at FROM posts ORDER BY created_at DESC LIMIT 1 OFFSET ?", (self.retention,)
+                ).fetchone()
+                if cutoff is not None:
+                    self._conn.execute("DELETE FROM posts WHERE created_at <= ?", (cutoff[0],))
+                    self._conn.execute(
+                        "DELETE FROM voters WHERE NOT EXISTS (SELECT 1 FROM posts "
+                        "WHERE posts.chat_id = voters.chat_id AND posts.message_id = voters.message_id)"
+                    )
+
+    async def _flush_backend(self):
+        ops, self._backend_ops = self._backend_ops, []
+        try:
+            await self.backend.apply_ops(ops)
+        except Exception as e:
+            logger.error(f"[VoteStore] Shared backend write failed ({len(ops)} ops): {e}")
+            self._backend_ops = ops + self._backend_ops
+            return
+        self._trim()
+
+    async def flush(self):
+        if self.backend is not None and self._backend_ops:
+            return await self._flush_backend()
+        if self._conn is None or not (self._dirty_posts or self._new_voters or self._deleted):
+            return
+        posts, voters, deleted = self._take_batch()
+        prune = time.monotonic() - self._last_prune >= PRUNE_INTERVAL
+        if prune:
+            self._last_prune = time.monotonic()
+        try:
+            await asyncio.to_thread(self._write_batch, posts, voters, deleted, prune)
+        except Exception as e:
+            logger.error(f"[VoteStore] Flush failed ({len(posts)} posts, {len(voters)} voters): {e}")
+            # Put the work back so the next flush retries it
+            self._dirty_posts.update(p[:2] for p in posts)
+            self._new_voters = voters + self._new_voters
+            self._deleted.update(deleted)
+            return
+        self._trim()
+
+    async def run_flusher(self, interval=VOTE_FLUSH_INTERVAL):
+        while True:
+            await asyncio.sleep(interval)
+            await self.flush()
+
+    async def close(self):
+        await self.flush()
+        if self._reader is not None:
+            self._reader.close()
+            self._reader = None
+        if self._conn is not None:
+            with self._lock:
+                self._conn.close()
+            self._conn = None
+
+vote_store = VoteStore()